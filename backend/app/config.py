@@ -9,15 +9,20 @@ class Settings(BaseSettings):
     
     # Database
     DATABASE_URL: str = ""
+    DB_POOL_SIZE: int = 20  # Async pool; a chat turn holds 1 connection at a time (2 with FAQ_SEARCH_BACKEND=pgvector)
+    DB_MAX_OVERFLOW: int = 20  # Extra connections opened under bursts, closed when returned
+    ASYNC_DB_STATEMENT_CACHE_SIZE: int = 0  # asyncpg prepared statement cache; 0 for transaction-mode poolers (port 6543)
     
     # Groq API
     GROQ_API_KEY: str = ""
     GROQ_MODEL: str = "llama-3.3-70b-versatile"  # Fast and powerful (updated model)
+    GROQ_BASE_URL: str = "https://api.groq.com/openai/v1"  # Any OpenAI-compatible endpoint works
     
     # Application
     BACKEND_HOST: str = "0.0.0.0"
     BACKEND_PORT: int = 8000
     CORS_ORIGINS: str = "http://localhost:7860,http://localhost:3000"
+    STARTUP_WARM_UP_IN_BACKGROUND: bool = True  # Serve /health at once; /ready answers 200 once warm-up is done
     
     # LLM Settings
     MAX_CONTEXT_MESSAGES: int = 10  # Number of previous messages to include
@@ -25,8 +30,142 @@ class Settings(BaseSettings):
     MAX_TOKENS: int = 1024
     TEMPERATURE: float = 0.7
     
+    # Confidence scoring of LLM answers
+    CONFIDENCE_SCORER: str = "heuristic"  # "heuristic" (phrases) or "embedding" (groundedness in retrieved FAQs; one extra model pass per answer)
+    CONFIDENCE_SIMILARITY_LOW: float = 0.15  # Cosine similarity scored as confidence 0
+    CONFIDENCE_SIMILARITY_HIGH: float = 0.55  # Cosine similarity scored as confidence 1
+    CONFIDENCE_GROUNDING_WEIGHT: float = 0.7  # Weight of answer-FAQ similarity vs. answer-question similarity
+    CONFIDENCE_UNCERTAIN_CAP: float = 0.3  # Max confidence when the answer admits it doesn't know
+    
+    # Prompt token budget
+    PROMPT_TOKEN_BUDGET: int = 3000  # Max input tokens per LLM call (system + FAQs + history + message)
+    PROMPT_ITEM_MAX_TOKENS: int = 400  # Longer FAQ answers / history messages are truncated when over budget
+    TOKENIZER_ENCODING: str = "cl100k_base"  # tiktoken encoding; a regex approximation is used without tiktoken
+    TOKEN_COUNT_CACHE_SIZE: int = 4096  # Token counts cached per distinct message text
+    
+    # Rolling conversation summary (older messages folded into sessions.summary)
+    SUMMARY_ENABLED: bool = True
+    SUMMARY_EVERY_N_TURNS: int = 3  # Fold once this many turns have built up past the recent tail
+    SUMMARY_RECENT_MESSAGES: int = 4  # Raw messages always kept after the summary
+    SUMMARY_MAX_FOLD_MESSAGES: int = 40  # Messages folded per summarization call
+    SUMMARY_MAX_CONCURRENCY: int = 2  # Background summarizations running at once
+    SUMMARY_MAX_PENDING: int = 100  # Sessions waiting for a summarizer; more are skipped
+    SUMMARY_MAX_TOKENS: int = 200
+    
+    # Per-request deadline (the frontend gives up after 30 s)
+    CHAT_DEADLINE_SECONDS: float = 25.0  # Default budget when the client sends none
+    CHAT_DEADLINE_MAX_SECONDS: float = 60.0  # Cap on client-supplied budgets
+    CHAT_DEADLINE_HEADER: str = "X-Request-Timeout"  # Client budget in seconds
+    CHAT_DEADLINE_RESERVE_SECONDS: float = 1.0  # Kept back to write the turn and reply
+    
+    # LLM HTTP transport
+    LLM_HTTP2: bool = True
+    LLM_MAX_CONNECTIONS: int = 100
+    LLM_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    LLM_KEEPALIVE_EXPIRY: float = 30.0  # Seconds an idle connection is kept
+    LLM_CONNECT_TIMEOUT: float = 5.0
+    LLM_REQUEST_TIMEOUT: float = 30.0  # Default per-call timeout (seconds)
+    LLM_MAX_RETRIES: int = 2  # Retries on connection errors, 429 and 5xx
+    LLM_RETRY_BASE_DELAY: float = 0.25  # Jittered exponential backoff base (seconds)
+    LLM_RETRY_MAX_DELAY: float = 4.0
+    LLM_HEDGE_ENABLED: bool = False  # Send a second request when the first is slower than p95
+    LLM_HEDGE_MIN_DELAY: float = 1.0  # Never hedge earlier than this (seconds)
+    
+    # LLM backends: JSON list of {"name", "base_url", "model", "api_key"} objects
+    # (api_key defaults to GROQ_API_KEY); empty uses GROQ_BASE_URL/GROQ_MODEL only
+    LLM_BACKENDS: str = ""
+    LLM_ROUTER_EWMA_ALPHA: float = 0.2  # Weight of the newest sample in latency/error EWMAs
+    LLM_ROUTER_FAILURE_THRESHOLD: int = 3  # Consecutive failures before a backend cools down
+    LLM_ROUTER_COOLDOWN_SECONDS: float = 15.0
+    LLM_ROUTER_PROBE_INTERVAL: float = 30.0  # Send a call to a backend unused for this long
+    LLM_ROUTER_BACKEND_RETRIES: int = 0  # Per-backend retries when failover is available
+    
+    # LLM admission control
+    LLM_CONCURRENCY_INITIAL: int = 16  # Starting concurrency limit (adapted by AIMD)
+    LLM_CONCURRENCY_MIN: int = 2
+    LLM_CONCURRENCY_MAX: int = 64
+    LLM_CONCURRENCY_BACKOFF: float = 0.75  # Multiplicative decrease on errors / slow calls
+    LLM_LATENCY_TARGET: float = 5.0  # Calls slower than this (seconds; first token for streams) shrink the limit
+    LLM_QUEUE_MAX: int = 50  # Calls waiting for a slot beyond this are rejected
+    LLM_QUEUE_TIMEOUT: float = 2.0  # Max seconds to wait for a slot
+    LLM_BREAKER_WINDOW: int = 20  # Recent calls considered by the circuit breaker
+    LLM_BREAKER_MIN_CALLS: int = 10
+    LLM_BREAKER_FAILURE_RATIO: float = 0.5  # Failure share that opens the breaker
+    LLM_BREAKER_SLOW_CALL_SECONDS: float = 15.0  # Slower calls count as failures
+    LLM_BREAKER_OPEN_SECONDS: float = 30.0  # Fail fast this long before a trial call
+    
+    # Phrase lists (optional files extending the built-in lists in app/utils/prompts.py;
+    # JSON array or one phrase per line)
+    ESCALATION_KEYWORDS_FILE: str = ""
+    LOW_CONFIDENCE_PHRASES_FILE: str = ""
+    
     # FAQ Settings
     TOP_K_FAQS: int = 3  # Number of relevant FAQs to retrieve
+    FAQ_SEARCH_BACKEND: str = "memory"  # "memory" (in-process index loaded at startup) or "pgvector"
+    
+    # FAQ retrieval mode and the in-process BM25 keyword index (no embedding model)
+    FAQ_RETRIEVAL_MODE: str = "vector"  # "vector" or "hybrid" (vector and BM25 results fused by reciprocal rank)
+    FAQ_LEXICAL_ROUTING_ENABLED: bool = False  # Retrieve with BM25 alone when its match is decisive or the model is cold / overloaded
+    FAQ_LEXICAL_BM25_K1: float = 1.2  # Term frequency saturation
+    FAQ_LEXICAL_BM25_B: float = 0.75  # FAQ length normalization
+    FAQ_LEXICAL_MIN_SCORE: float = 0.3  # Normalized BM25 score (0-1) for an FAQ to count as a match
+    FAQ_LEXICAL_DECISIVE_SCORE: float = 0.6  # Best match at least this...
+    FAQ_LEXICAL_DECISIVE_MARGIN: float = 0.2  # ...and this far ahead of the runner-up skips the model
+    FAQ_LEXICAL_OVERLOAD_QUEUE_DEPTH: int = 64  # Query embeddings queued for the model from which retrieval goes lexical
+    FAQ_HYBRID_CANDIDATES: int = 10  # Results taken from each retriever before fusion
+    FAQ_HYBRID_RRF_K: int = 60  # Reciprocal rank fusion constant (higher flattens rank differences)
+    
+    # Category-partitioned FAQ search (a filtered search only scores that category's FAQs)
+    FAQ_CATEGORY_INFERENCE_ENABLED: bool = False  # Filter by the category inferred from the conversation when none is given
+    FAQ_CATEGORY_INFERENCE_MARGIN: float = 0.05  # Lead in centroid similarity over the runner-up category needed to filter
+    
+    # pgvector ANN index on faqs.embedding (managed by migrate_pgvector.py, reload_faqs.py and startup)
+    PGVECTOR_INDEX: str = "hnsw"  # "hnsw", "ivfflat" or "none" (exact sequential scan)
+    PGVECTOR_INDEX_ON_STARTUP: bool = True  # Create / rebuild indexes at startup; off: only migrate_pgvector.py / reload_faqs.py do
+    PGVECTOR_HNSW_M: int = 16  # Graph links per node (build time)
+    PGVECTOR_HNSW_EF_CONSTRUCTION: int = 64  # Candidate list size while building
+    PGVECTOR_HNSW_EF_SEARCH: int = 40  # Candidate list size per query (recall vs latency; raised to top_k if lower)
+    PGVECTOR_IVFFLAT_LISTS: int = 0  # 0 = rows / 1000 (sqrt(rows) above 1M rows), at least 10
+    PGVECTOR_IVFFLAT_PROBES: int = 10  # Lists scanned per query (recall vs latency)
+    PGVECTOR_CATEGORY_INDEX_MIN_ROWS: int = 10000  # Categories this large get their own partial index (0 = none; smaller ones are scanned exactly)
+    
+    # FAQ direct answers (skip the LLM on near-exact FAQ matches)
+    FAQ_DIRECT_ANSWER_ENABLED: bool = False
+    FAQ_DIRECT_ANSWER_MAX_DISTANCE: float = 0.15  # pgvector cosine distance
+    FAQ_DIRECT_ANSWER_TEMPLATE: str = "{answer}"  # May use {question}, {answer}, {category}
+    
+    # Embedding model backend
+    EMBEDDING_BACKEND: str = "sentence-transformers"  # "sentence-transformers" (torch) or "onnx" (ONNX Runtime, CPU)
+    EMBEDDING_MODEL_NAME: str = "all-MiniLM-L6-v2"
+    EMBEDDING_ONNX_DIR: str = str(Path(__file__).parent.parent / "models" / "all-MiniLM-L6-v2-onnx")  # Written by export_onnx_model.py
+    EMBEDDING_ONNX_QUANTIZED: bool = True  # Use the int8 dynamically quantized model
+    EMBEDDING_ONNX_THREADS: int = 0  # ONNX Runtime intra-op threads (0 = its default)
+    
+    # FAQ embedding generation (startup, reload_faqs.py, FAQ edits)
+    EMBEDDING_GENERATION_CHUNK_SIZE: int = 256  # FAQs read, encoded and committed together
+    EMBEDDING_GENERATION_BATCH_SIZE: int = 64  # Texts per model forward pass within a chunk
+    
+    # On-disk embedding store (FAQ vectors keyed by model + text hash, memory-mapped)
+    EMBEDDING_STORE_ENABLED: bool = True
+    EMBEDDING_STORE_DIR: str = str(Path(__file__).parent.parent / "cache" / "embedding_store")
+    
+    # Query embedding cache (shared by every embedding consumer)
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 10000
+    EMBEDDING_CACHE_MAX_BYTES: int = 16 * 1024 * 1024
+    EMBEDDING_CACHE_TTL_SECONDS: float = 0  # 0 keeps entries until evicted
+    
+    # Embedding micro-batching (concurrent queries share one model call)
+    EMBEDDING_BATCH_ENABLED: bool = True
+    EMBEDDING_BATCH_MAX_SIZE: int = 32  # Texts per encode call
+    EMBEDDING_BATCH_MAX_WAIT_MS: float = 3.0  # Longest a request waits for others to join its batch (0: only batch what queued during the previous encode)
+    
+    # Response cache (first-turn answers keyed on the query embedding)
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_MAX_DISTANCE: float = 0.05  # Cosine distance radius for a hit
+    RESPONSE_CACHE_MAX_ENTRIES: int = 1000
+    RESPONSE_CACHE_MAX_BYTES: int = 16 * 1024 * 1024
+    RESPONSE_CACHE_TTL_SECONDS: int = 3600
     
     class Config:
         # Look for .env in project root
@@ -1,4 +1,7 @@
+from uuid import uuid4
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.config import settings
@@ -14,6 +17,87 @@ engine = create_engine(
 # Session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+# URL query parameters asyncpg.connect() accepts as keywords; sslmode is
+# renamed to ssl (same mode names), connect_timeout and application_name
+# become connect arguments, any other libpq-only parameter would make it fail
+_ASYNCPG_URL_PARAMS = {"ssl", "direct_tls", "target_session_attrs", "krbsrvname", "gsslib", "passfile", "command_timeout"}
+
+
+def _async_database_url(url: str) -> str:
+    """
+    Point a postgresql:// URL at the asyncpg driver
+    
+    libpq query parameters are translated (sslmode=require -> ssl=require)
+    or, when asyncpg has no equivalent, dropped with a warning.
+    """
+    for prefix in ("postgresql+psycopg2://", "postgresql://", "postgres://"):
+        if url.startswith(prefix):
+            url = "postgresql+asyncpg://" + url[len(prefix):]
+            break
+    else:
+        return url
+    
+    parsed = make_url(url)
+    if not parsed.query:
+        return url
+    query = dict(parsed.query)
+    if "sslmode" in query:
+        query.setdefault("ssl", query.pop("sslmode"))
+    query.pop("connect_timeout", None)
+    query.pop("application_name", None)
+    dropped = sorted(set(query) - _ASYNCPG_URL_PARAMS)
+    if dropped:
+        print(f"⚠️  DATABASE_URL parameters not supported by asyncpg, ignored for the async engine: {', '.join(dropped)}")
+    query = {key: value for key, value in query.items() if key in _ASYNCPG_URL_PARAMS}
+    return parsed.set(query=query).render_as_string(hide_password=False)
+
+
+def _async_connect_args(url: str) -> dict:
+    """
+    asyncpg connect arguments for DATABASE_URL
+    
+    Prepared statement caches are off unless ASYNC_DB_STATEMENT_CACHE_SIZE
+    is set: a transaction-mode pooler (such as Supabase's on port 6543) may
+    run the next statement on another server connection, where a cached
+    prepared statement "does not exist".
+    """
+    args = {
+        "statement_cache_size": settings.ASYNC_DB_STATEMENT_CACHE_SIZE,
+        "prepared_statement_cache_size": settings.ASYNC_DB_STATEMENT_CACHE_SIZE
+    }
+    if not settings.ASYNC_DB_STATEMENT_CACHE_SIZE:
+        # Unique names, so statements of different clients sharing a pooled
+        # server connection never collide
+        args["prepared_statement_name_func"] = lambda: f"__asyncpg_{uuid4()}__"
+    query = make_url(url).query if "://" in url else {}
+    if query.get("connect_timeout"):
+        args["timeout"] = float(query["connect_timeout"])
+    if query.get("application_name"):
+        args["server_settings"] = {"application_name": query["application_name"]}
+    return args
+
+
+# Async engine used by the chat pipeline (asyncpg driver); each chat turn
+# holds at most two connections at a time (see ChatPipeline)
+async_engine = create_async_engine(
+    _async_database_url(settings.DATABASE_URL),
+    connect_args=_async_connect_args(settings.DATABASE_URL),
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_pre_ping=True,
+    pool_recycle=3600,
+    echo=False
+)
+
+# Async session factory
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False  # Keep loaded attributes usable after commit
+)
+
 # Base class for models
 Base = declarative_base()
 
@@ -27,6 +111,12 @@ def get_db():
         db.close()
 
 
+async def get_async_db():
+    """Dependency for async FastAPI endpoints to get an async database session"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
 def init_db():
     """Initialize database tables"""
     Base.metadata.create_all(bind=engine)
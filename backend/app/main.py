@@ -2,10 +2,15 @@
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from sqlalchemy import text
 from app.config import settings
-from app.database import init_db, SessionLocal
-from app.routers import chat, sessions, faqs, escalations
+from app.database import init_db, SessionLocal, engine, async_engine
+from app.routers import chat, sessions, faqs, escalations, metrics
+from typing import Dict, Optional
+import asyncio
 import json
+import time
 from pathlib import Path
 
 # Create FastAPI app
@@ -31,28 +36,140 @@ app.include_router(chat.router)
 app.include_router(sessions.router)
 app.include_router(faqs.router)
 app.include_router(escalations.router)
+app.include_router(metrics.router)
 
 
-@app.on_event("startup")
-async def startup_event():
-    """Initialize database and load FAQs on startup"""
-    print("🚀 Starting AI Customer Support Bot...")
+class StartupState:
+    """Progress of the warm-up stages, reported by /ready"""
     
-    # Initialize database tables
-    init_db()
+    def __init__(self):
+        self.ready = False
+        self.error: Optional[str] = None
+        self.stages: Dict[str, float] = {}  # Stage name -> seconds, once finished
+        self.seconds: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
     
-    # Load FAQs from JSON file
+    async def stage(self, name: str, awaitable):
+        """Await one startup step and record its duration"""
+        start = time.perf_counter()
+        result = await awaitable
+        self.stages[name] = round(time.perf_counter() - start, 3)
+        return result
+
+
+# Global instance
+startup_state = StartupState()
+
+
+def prepare_database():
+    """Create tables, load the initial FAQs and the lexical index (which needs no model)"""
+    from app.services.faq_service import faq_service
+    init_db()
     load_initial_faqs()
+    db = SessionLocal()
+    try:
+        faq_service.load_lexical_index(db)
+    finally:
+        db.close()
     
-    # Generate embeddings for FAQs
+
+def index_faqs():
+    """Embed FAQs that have no embedding yet, then load the in-memory index and check the pgvector indexes"""
     from app.services.faq_service import faq_service
+    from app.services.pgvector_index import pgvector_index
     db = SessionLocal()
     try:
         faq_service.generate_and_store_embeddings(db)
+        faq_service.load_index(db)
     finally:
         db.close()
     
-    print("✅ Application started successfully!")
+    # Without the ANN index pgvector searches still work, by sequential scan
+    try:
+        if settings.PGVECTOR_INDEX_ON_STARTUP:
+            pgvector_index.ensure(engine)
+        else:
+            pgvector_index.refresh(engine)
+    except Exception as e:
+        print(f"⚠️  Could not check the pgvector index: {e}")
+    
+
+async def open_async_pool():
+    """Open one pooled asyncpg connection so the first request doesn't"""
+    async with async_engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+
+async def build_llm_clients():
+    """Build the LLM router and its HTTP clients (on the event loop, like requests do)"""
+    from app.services.llm_service import llm_service
+    llm_service.warm_up()
+
+
+async def warm_up():
+    """
+    Run the startup stages, independent ones in parallel
+    
+    Model load, database setup, the async connection pool, the LLM clients
+    and the prompt tokenizer don't depend on each other; embedding the FAQs needs both the
+    model and the tables. Every stage runs to completion even if another
+    fails; the first error is raised afterwards.
+    """
+    from app.services.faq_service import faq_service
+    from app.utils.tokens import load_encoding
+    
+    start = time.perf_counter()
+    try:
+        results = await asyncio.gather(
+            startup_state.stage("embedding_model", asyncio.to_thread(faq_service.warm_up)),
+            startup_state.stage("database", asyncio.to_thread(prepare_database)),
+            startup_state.stage("async_pool", open_async_pool()),
+            startup_state.stage("llm_clients", build_llm_clients()),
+            startup_state.stage("tokenizer", asyncio.to_thread(load_encoding)),
+            return_exceptions=True
+        )
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            raise errors[0]
+        await startup_state.stage("faq_index", asyncio.to_thread(index_faqs))
+    except Exception as e:
+        startup_state.error = f"{type(e).__name__}: {e}"
+        print(f"❌ Warm-up failed: {startup_state.error}")
+        raise
+    finally:
+        startup_state.seconds = round(time.perf_counter() - start, 3)
+    
+    startup_state.ready = True
+    print(f"✅ Application ready in {startup_state.seconds:.1f}s {startup_state.stages}")
+
+
+@app.on_event("startup")
+async def startup_event():
+    """Warm up services (in the background unless STARTUP_WARM_UP_IN_BACKGROUND is off)"""
+    print("🚀 Starting AI Customer Support Bot...")
+    
+    if settings.STARTUP_WARM_UP_IN_BACKGROUND:
+        # /health answers right away; requests arriving before /ready load
+        # what they need lazily
+        startup_state.task = asyncio.create_task(warm_up())
+        startup_state.task.add_done_callback(lambda task: task.cancelled() or task.exception())
+    else:
+        await warm_up()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Finish stream turn writes and background summaries, then close pooled LLM connections and the embedding batcher"""
+    from app.services.llm_service import llm_service
+    from app.services.summarizer import conversation_summarizer
+    from app.services.faq_service import faq_service
+    from app.routers.chat import drain_turn_writes
+    if startup_state.task and not startup_state.task.done():
+        startup_state.task.cancel()
+    await drain_turn_writes()
+    await conversation_summarizer.drain()
+    await llm_service.aclose()
+    await faq_service.batcher.aclose()
 
 
 def load_initial_faqs():
@@ -109,7 +226,10 @@ def root():
             "chat": "/api/chat",
             "sessions": "/api/sessions",
             "faqs": "/api/faqs",
-            "escalations": "/api/escalations"
+            "escalations": "/api/escalations",
+            "metrics": "/api/metrics",
+            "health": "/health",
+            "ready": "/ready"
         }
     }
 
@@ -120,6 +240,19 @@ def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/ready")
+def readiness_check():
+    """Readiness endpoint: 503 until the startup warm-up has finished"""
+    body = {
+        "status": "ready" if startup_state.ready else ("failed" if startup_state.error else "starting"),
+        "stages": startup_state.stages,
+        "seconds": startup_state.seconds
+    }
+    if startup_state.error:
+        body["error"] = startup_state.error
+    return JSONResponse(body, status_code=200 if startup_state.ready else 503)
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
@@ -14,6 +14,8 @@ class Message(Base):
     content = Column(Text, nullable=False)
     timestamp = Column(DateTime, default=datetime.utcnow)
     confidence_score = Column(Float, nullable=True)  # Confidence score for assistant messages
+    route = Column(String, nullable=True)  # How an assistant reply was produced: llm, faq_direct, response_cache, ...
+    latency_ms = Column(Float, nullable=True)  # Time from request to reply for assistant messages
     
     # Relationships
     session = relationship("Session", back_populates="messages")
@@ -14,6 +14,7 @@ class Session(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     status = Column(String, default="active")  # active, escalated, closed
     summary = Column(Text, nullable=True)  # Optional conversation summary
+    summarized_until = Column(Integer, nullable=True)  # Last message id folded into summary
     
     # Relationships
     messages = relationship("Message", back_populates="session", cascade="all, delete-orphan")
@@ -1,22 +1,119 @@
 """Chat endpoints for conversational interaction"""
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db, AsyncSessionLocal
 from app.schemas.chat import ChatRequest, ChatResponse, ConversationHistory, MessageSchema
 from app.models.session import Session as ChatSession
 from app.services.llm_service import llm_service
+from app.services.admission import LLMUnavailableError
+from app.services.chat_pipeline import chat_pipeline
 from app.services.faq_service import faq_service
-from app.services.context_manager import context_manager
 from app.services.escalation_service import escalation_service
-from app.utils.prompts import build_context_prompt
+from app.services.turn_persistence import ChatTurn
+from app.services.response_cache import response_cache
+from app.services.summarizer import conversation_summarizer
+from app.services.confidence import confidence_scorer
+from app.utils.prompts import build_context_prompt, ESCALATION_MATCHER
+from app.utils.deadline import Deadline, DeadlineExceeded
+from app.config import settings
 from datetime import datetime
+from typing import AsyncIterator, Dict, Optional, Set, Tuple
+import asyncio
+import json
+import time
 
 router = APIRouter(prefix="/api", tags=["chat"])
 
+KEYWORD_ESCALATION_RESPONSE = "I understand you'd like to speak with a human representative. Let me connect you right away."
+ESCALATION_NOTICE = "\n\n[This conversation has been escalated to a human agent who will assist you shortly.]"
+DEGRADED_FAQ_RESPONSE = "Our assistant is busy right now, but this answer from our FAQ may help:\n\n{answer}"
+DEGRADED_ESCALATION_RESPONSE = "Our assistant is temporarily unavailable, so I've passed your question to a human agent."
+
+# How an assistant reply was produced (stored on the message for auditing)
+ROUTE_LLM = "llm"
+ROUTE_FAQ_DIRECT = "faq_direct"
+ROUTE_RESPONSE_CACHE = "response_cache"
+ROUTE_KEYWORD_ESCALATION = "keyword_escalation"
+ROUTE_DEGRADED = "degraded"
+
+# Stream turns being written; referenced so they are not garbage-collected
+_turn_writes: Set[asyncio.Task] = set()
+
+
+async def _get_or_create_session(request: ChatRequest, db: AsyncSession) -> int:
+    """Return the request's session id, creating a new session if none was given"""
+    if request.session_id is None:
+        result = await db.execute(
+            insert(ChatSession).values(user_id=request.user_id).returning(ChatSession.id)
+        )
+        session_id = result.scalar_one()
+        await db.commit()
+        return session_id
+    
+    result = await db.execute(select(ChatSession.id).where(ChatSession.id == request.session_id))
+    session_id = result.scalar_one_or_none()
+    
+    # Release the connection; the turn is written later in its own transaction
+    await db.close()
+    
+    if session_id is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return session_id
+
+
+def _find_escalation_keyword(message: str):
+    """Return the first escalation keyword found in the message, if any"""
+    match = ESCALATION_MATCHER.search(message)
+    return match.phrase if match else None
+
+
+async def _escalate_on_keyword(turn: ChatTurn, keyword_match: str, db: AsyncSession, request_start: float):
+    """Escalate immediately and save the turn with the canned hand-off reply"""
+    response_text = KEYWORD_ESCALATION_RESPONSE
+    confidence_score = 0.85
+    
+    # Stage escalation
+    escalation_reason = f"User requested human assistance (keyword: '{keyword_match}')"
+    turn.escalate(escalation_reason)
+    response_text += ESCALATION_NOTICE
+    
+    # Stage assistant message and write the whole turn
+    turn.add_message(
+        "assistant", response_text, confidence_score,
+        route=ROUTE_KEYWORD_ESCALATION, latency_ms=_elapsed_ms(request_start)
+    )
+    await turn.commit(db)
+    
+    return response_text, confidence_score, escalation_reason
+
+
+async def _gather_context(deadline: Deadline, session_id: int, user_message: str, category: Optional[str]) -> Optional[Dict]:
+    """Gather the turn's context within the deadline; None if the budget ran out"""
+    try:
+        return await deadline.run("context", chat_pipeline.gather_context(session_id, user_message, category))
+    except DeadlineExceeded as e:
+        print(f"⏰ {e} (session {session_id})")
+        return None
+
+
+def _context_after_deadline() -> Dict:
+    """Empty context for a turn whose lookups ran out of time"""
+    return {
+        "summary": None,
+        "history": [],
+        "unsummarized_count": 0,
+        "relevant_faqs": [],
+        "query_embedding": None,
+        "repeated_count": 1,
+        "timings": {}
+    }
+
 
 @router.post("/chat", response_model=ChatResponse)
-def send_message(request: ChatRequest, db: Session = Depends(get_db)):
+async def send_message(request: ChatRequest, http_request: Request, db: AsyncSession = Depends(get_async_db)):
     """
     Send a message and get AI response
     
@@ -25,44 +122,27 @@ def send_message(request: ChatRequest, db: Session = Depends(get_db)):
     - Generates AI response using Groq
     - Checks for escalation triggers
     - Saves messages to database
+    - Reports per-stage timings in milliseconds
+    - Answers within the request deadline (X-Request-Timeout header or
+      CHAT_DEADLINE_SECONDS), with a degraded FAQ-based reply if the
+      lookups or the LLM run out of time
     """
+    request_start = time.perf_counter()
+    deadline = Deadline.from_header(http_request.headers.get(settings.CHAT_DEADLINE_HEADER))
+    
     # Create or get session
-    if request.session_id is None:
-        session = ChatSession(user_id=request.user_id)
-        db.add(session)
-        db.commit()
-        db.refresh(session)
-        session_id = session.id
-    else:
-        session_id = request.session_id
-        session = db.query(ChatSession).filter(ChatSession.id == session_id).first()
-        if not session:
-            raise HTTPException(status_code=404, detail="Session not found")
+    session_id = await _get_or_create_session(request, db)
     
-    # Save user message
-    context_manager.save_message(session_id, "user", request.message, db)
+    # Stage user message; the turn is written in one transaction at the end
+    turn = ChatTurn(session_id)
+    turn.add_message("user", request.message)
     
     # Pre-check for escalation keywords (immediate escalation)
-    from app.utils.prompts import ESCALATION_KEYWORDS
-    message_lower = request.message.lower()
-    keyword_match = None
-    for keyword in ESCALATION_KEYWORDS:
-        if keyword in message_lower:
-            keyword_match = keyword
-            break
+    keyword_match = _find_escalation_keyword(request.message)
     
     # If keyword found, provide brief response and escalate immediately
     if keyword_match:
-        response_text = "I understand you'd like to speak with a human representative. Let me connect you right away."
-        confidence_score = 0.85
-        
-        # Create escalation
-        escalation_reason = f"User requested human assistance (keyword: '{keyword_match}')"
-        escalation_service.create_escalation(session_id, escalation_reason, db)
-        response_text += "\n\n[This conversation has been escalated to a human agent who will assist you shortly.]"
-        
-        # Save assistant message
-        context_manager.save_message(session_id, "assistant", response_text, db, confidence_score)
+        response_text, confidence_score, escalation_reason = await _escalate_on_keyword(turn, keyword_match, db, request_start)
         
         return ChatResponse(
             session_id=session_id,
@@ -70,40 +150,85 @@ def send_message(request: ChatRequest, db: Session = Depends(get_db)):
             confidence_score=confidence_score,
             escalated=True,
             escalation_reason=escalation_reason,
-            timestamp=datetime.utcnow()
+            timestamp=datetime.utcnow(),
+            route=ROUTE_KEYWORD_ESCALATION
         )
     
-    # Get conversation history
-    history = context_manager.get_conversation_history(session_id, db)
+    # Get history, relevant FAQs and the repeated-question count concurrently
+    context = await _gather_context(deadline, session_id, request.message, request.category)
+    context_timed_out = context is None
+    if context_timed_out:
+        context = _context_after_deadline()
+    timings = context["timings"]
     
-    # Get relevant FAQs
-    relevant_faqs = faq_service.get_relevant_faqs(request.message, db)
+    # Skip the LLM for near-exact FAQ matches and cached first-turn answers
+    cache_generation = response_cache.generation
+    shortcut = None if context_timed_out else _answer_without_llm(context)
+    prompt_stats = None
+    forced_escalation = None
     
-    # Build prompt with context
-    messages = build_context_prompt(history, relevant_faqs, request.message)
+    if shortcut:
+        response_text, confidence_score, route = shortcut
+    elif context_timed_out:
+        route = ROUTE_DEGRADED
+        response_text, confidence_score, forced_escalation = _degraded_reply(context, "deadline exceeded during context")
+    else:
+        route = ROUTE_LLM
+    
+        # Build prompt with context, trimmed to the token budget
+        messages, prompt_stats = build_context_prompt(
+            context["history"], context["relevant_faqs"], request.message, summary=context["summary"]
+        )
+        _log_prompt_stats(session_id, prompt_stats)
     
-    # Generate response
-    response_text, confidence_score = llm_service.generate_response(messages)
+        # Generate response; fall back to a degraded reply if the LLM is
+        # unavailable or the deadline runs out (the LLM call is then cancelled)
+        llm_start = time.perf_counter()
+        try:
+            response_text, confidence_score = await deadline.run("llm", llm_service.generate_response(messages))
+        except (LLMUnavailableError, DeadlineExceeded) as e:
+            print(f"🚧 No LLM answer, sending degraded reply (session {session_id}): {e}")
+            route = ROUTE_DEGRADED
+            response_text, confidence_score, forced_escalation = _degraded_reply(context, str(e))
+        timings["llm_ms"] = _elapsed_ms(llm_start)
     
-    # Check for repeated questions
-    repeated_count = context_manager.count_repeated_questions(session_id, request.message, db)
+        if route == ROUTE_LLM:
+            confidence_score = await _score_confidence(context, response_text)
     
     # Check if should escalate
-    should_escalate, escalation_reason = escalation_service.should_escalate(
-        request.message,
-        response_text,
-        confidence_score,
-        repeated_count
-    )
+    if forced_escalation:
+        should_escalate, escalation_reason = True, forced_escalation
+    else:
+        should_escalate, escalation_reason = escalation_service.should_escalate(
+            request.message,
+            response_text,
+            confidence_score,
+            context["repeated_count"]
+        )
+    
+    if route == ROUTE_LLM and not should_escalate:
+        _store_cached_response(context, response_text, confidence_score, cache_generation)
     
     escalated = False
     if should_escalate:
-        escalation_service.create_escalation(session_id, escalation_reason, db)
+        turn.escalate(escalation_reason)
         escalated = True
-        response_text += "\n\n[This conversation has been escalated to a human agent who will assist you shortly.]"
+        response_text += ESCALATION_NOTICE
+    
+    # Stage assistant message and write the whole turn
+    turn.add_message(
+        "assistant", response_text, confidence_score,
+        route=route, latency_ms=_elapsed_ms(request_start)
+    )
+    persist_start = time.perf_counter()
+    await turn.commit(db)
+    timings["persist_ms"] = _elapsed_ms(persist_start)
+    
+    # Fold older messages into the session summary in the background
+    conversation_summarizer.maybe_schedule(session_id, context["unsummarized_count"] + 2)
     
-    # Save assistant message
-    context_manager.save_message(session_id, "assistant", response_text, db, confidence_score)
+    timings["total_ms"] = _elapsed_ms(request_start)
+    print(f"⏱️  Chat turn timings (session {session_id}): {timings}")
     
     return ChatResponse(
         session_id=session_id,
@@ -111,25 +236,289 @@ def send_message(request: ChatRequest, db: Session = Depends(get_db)):
         confidence_score=confidence_score,
         escalated=escalated,
         escalation_reason=escalation_reason if escalated else None,
-        timestamp=datetime.utcnow()
+        timestamp=datetime.utcnow(),
+        timings=timings,
+        route=route,
+        prompt_tokens=prompt_stats
+    )
+
+
+def _answer_without_llm(context: Dict):
+    """
+    Return (response, confidence, route) when the LLM can be skipped
+    
+    A near-exact FAQ match is answered from the FAQ itself; a first-turn
+    question seen before is answered from the response cache.
+    """
+    direct = faq_service.direct_answer(context["relevant_faqs"])
+    if direct:
+        return direct[0], direct[1], ROUTE_FAQ_DIRECT
+    
+    # The cache is keyed on the query embedding, which a lexical retrieval skips
+    if context["history"] or context["summary"] or context["query_embedding"] is None:
+        return None
+    faq_ids = [faq["id"] for faq in context["relevant_faqs"]]
+    cached = response_cache.lookup(context["query_embedding"], faq_ids)
+    if cached:
+        return cached[0], cached[1], ROUTE_RESPONSE_CACHE
+    return None
+
+
+async def _score_confidence(context: Dict, response_text: str) -> float:
+    """Score an LLM answer against the turn's retrieved FAQs, timing it in context["timings"]"""
+    start = time.perf_counter()
+    confidence_score = await confidence_scorer.score(
+        response_text, context["relevant_faqs"], context["query_embedding"]
+    )
+    context["timings"]["confidence_ms"] = _elapsed_ms(start)
+    return confidence_score
+
+
+def _degraded_reply(context: Dict, reason: str) -> Tuple[str, float, Optional[str]]:
+    """
+    Reply without the LLM when it is unavailable or out of time
+    
+    Returns (response, confidence, escalation_reason): the best FAQ answer if
+    one was retrieved (normal escalation checks then apply), otherwise a
+    hand-off message with the turn queued for a human agent. Confidence is
+    the FAQ's cosine similarity; an FAQ matched by BM25 alone scores 0, as
+    its keyword score says nothing comparable.
+    """
+    if context["relevant_faqs"]:
+        faq = context["relevant_faqs"][0]
+        distance = faq.get("distance")
+        confidence_score = 0.0 if distance is None else round(max(0.0, 1.0 - distance), 4)
+        return DEGRADED_FAQ_RESPONSE.format(answer=faq["answer"]), confidence_score, None
+    return DEGRADED_ESCALATION_RESPONSE, 0.0, f"No LLM answer and no FAQ match ({reason})"
+
+
+def _store_cached_response(context: Dict, response_text: str, confidence_score: float, generation: int):
+    """Cache a first-turn answer that did not need escalation"""
+    if context["history"] or context["summary"] or context["query_embedding"] is None:
+        return
+    faq_ids = [faq["id"] for faq in context["relevant_faqs"]]
+    response_cache.store(context["query_embedding"], faq_ids, response_text, confidence_score, generation)
+
+
+def _log_prompt_stats(session_id: int, prompt_stats: Dict):
+    """Log prompt size before and after fitting it to the token budget"""
+    if prompt_stats["tokens_after"] < prompt_stats["tokens_before"]:
+        print(
+            f"✂️  Prompt trimmed (session {session_id}): {prompt_stats['tokens_before']} -> "
+            f"{prompt_stats['tokens_after']} tokens (budget {prompt_stats['budget']}, "
+            f"dropped {prompt_stats['faqs_dropped']} FAQs / {prompt_stats['history_dropped']} messages, "
+            f"truncated {prompt_stats['items_truncated']})"
+        )
+
+
+def _elapsed_ms(start: float) -> float:
+    """Milliseconds since a time.perf_counter() reading"""
+    return round((time.perf_counter() - start) * 1000, 2)
+
+
+def _sse_event(event: str, data: dict) -> str:
+    """Format one Server-Sent Event frame"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _commit_turn_in_background(turn: ChatTurn) -> asyncio.Task:
+    """
+    Write a turn in a task of its own, with its own session
+    
+    The task is not cancelled with the request, so a stream whose client
+    disconnects still records the turn.
+    """
+    async def write():
+        async with AsyncSessionLocal() as db:
+            return await turn.commit(db)
+    
+    task = asyncio.create_task(write())
+    _turn_writes.add(task)
+    task.add_done_callback(_turn_writes.discard)
+    return task
+
+
+async def drain_turn_writes():
+    """Wait for stream turns still being written (used on shutdown)"""
+    if _turn_writes:
+        await asyncio.gather(*_turn_writes, return_exceptions=True)
+
+
+@router.post("/chat/stream")
+async def stream_message(request: ChatRequest, http_request: Request, db: AsyncSession = Depends(get_async_db)):
+    """
+    Send a message and stream the AI response as Server-Sent Events
+    
+    - `token` events carry response text fragments as Groq produces them
+    - A final `done` event carries session_id, confidence and escalation status
+    - Confidence, escalation and persistence run once the stream has finished;
+      if the client disconnects first, the turn is still saved with the
+      partial reply it was shown
+    - The request deadline covers the lookups and the first token; once
+      tokens flow the stream runs to the end
+    """
+    request_start = time.perf_counter()
+    deadline = Deadline.from_header(http_request.headers.get(settings.CHAT_DEADLINE_HEADER))
+    
+    # Create or get session and stage the user message
+    session_id = await _get_or_create_session(request, db)
+    turn = ChatTurn(session_id)
+    turn.add_message("user", request.message)
+    
+    keyword_match = _find_escalation_keyword(request.message)
+    if keyword_match:
+        response_text, confidence_score, escalation_reason = await _escalate_on_keyword(turn, keyword_match, db, request_start)
+        
+        async def keyword_events() -> AsyncIterator[str]:
+            yield _sse_event("token", {"content": response_text})
+            yield _sse_event("done", {
+                "session_id": session_id,
+                "confidence_score": confidence_score,
+                "escalated": True,
+                "escalation_reason": escalation_reason,
+                "timestamp": datetime.utcnow().isoformat(),
+                "route": ROUTE_KEYWORD_ESCALATION
+            })
+        
+        return StreamingResponse(keyword_events(), media_type="text/event-stream")
+    
+    context = await _gather_context(deadline, session_id, request.message, request.category)
+    context_timed_out = context is None
+    if context_timed_out:
+        context = _context_after_deadline()
+    timings = context["timings"]
+    repeated_count = context["repeated_count"]
+    cache_generation = response_cache.generation
+    shortcut = None if context_timed_out else _answer_without_llm(context)
+    prompt_stats = None
+    if not shortcut and not context_timed_out:
+        messages, prompt_stats = build_context_prompt(
+            context["history"], context["relevant_faqs"], request.message, summary=context["summary"]
+        )
+        _log_prompt_stats(session_id, prompt_stats)
+    
+    async def llm_events() -> AsyncIterator[str]:
+        forced_escalation = None
+        route = ROUTE_LLM
+        sent = []  # Reply text handed to the client so far
+        persisted = False
+        try:
+            if shortcut:
+                response_text, confidence_score, route = shortcut
+                sent.append(response_text)
+                yield _sse_event("token", {"content": response_text})
+            elif context_timed_out:
+                route = ROUTE_DEGRADED
+                response_text, confidence_score, forced_escalation = _degraded_reply(context, "deadline exceeded during context")
+                sent.append(response_text)
+                yield _sse_event("token", {"content": response_text})
+            else:
+                llm_start = time.perf_counter()
+                stream = llm_service.stream_response(messages)
+                try:
+                    # Only the wait for the first token is bounded by the deadline
+                    try:
+                        first_token = await deadline.run("first_token", stream.__anext__())
+                    except StopAsyncIteration:
+                        first_token = None
+                    if first_token is not None:
+                        timings["first_token_ms"] = _elapsed_ms(llm_start)
+                        sent.append(first_token)
+                        yield _sse_event("token", {"content": first_token})
+                        async for token in stream:
+                            sent.append(token)
+                            yield _sse_event("token", {"content": token})
+                    response_text = "".join(sent)
+                    confidence_score = await _score_confidence(context, response_text)
+                except Exception as e:
+                    print(f"Error streaming from Groq API: {e}")
+                    if sent:
+                        # Keep the partial answer; it is too late to switch replies
+                        response_text = "".join(sent)
+                        confidence_score = 0.0
+                    else:
+                        route = ROUTE_DEGRADED
+                        response_text, confidence_score, forced_escalation = _degraded_reply(context, str(e))
+                        sent.append(response_text)
+                        yield _sse_event("token", {"content": response_text})
+                finally:
+                    await stream.aclose()
+                timings["llm_ms"] = _elapsed_ms(llm_start)
+        
+            if forced_escalation:
+                should_escalate, escalation_reason = True, forced_escalation
+            else:
+                should_escalate, escalation_reason = escalation_service.should_escalate(
+                    request.message,
+                    response_text,
+                    confidence_score,
+                    repeated_count
+                )
+            
+            if route == ROUTE_LLM and not should_escalate:
+                _store_cached_response(context, response_text, confidence_score, cache_generation)
+            
+            if should_escalate:
+                turn.escalate(escalation_reason)
+                response_text += ESCALATION_NOTICE
+                sent.append(ESCALATION_NOTICE)
+                yield _sse_event("token", {"content": ESCALATION_NOTICE})
+            
+            # The request-scoped session is closed once the response starts,
+            # so the turn is written with a session of its own
+            turn.add_message(
+                "assistant", response_text, confidence_score,
+                route=route, latency_ms=_elapsed_ms(request_start)
+            )
+            persisted = True
+            await asyncio.shield(_commit_turn_in_background(turn))
+            conversation_summarizer.maybe_schedule(session_id, context["unsummarized_count"] + 2)
+        
+            yield _sse_event("done", {
+                "session_id": session_id,
+                "confidence_score": confidence_score,
+                "escalated": should_escalate,
+                "escalation_reason": escalation_reason if should_escalate else None,
+                "timestamp": datetime.utcnow().isoformat(),
+                "timings": timings,
+                "route": route,
+                "prompt_tokens": prompt_stats
+            })
+        finally:
+            if not persisted:
+                # The client went away mid-stream (the stream was cancelled or
+                # closed): record the question and whatever reply it was shown,
+                # so the history matches its view of the conversation
+                if sent:
+                    turn.add_message(
+                        "assistant", "".join(sent), 0.0,
+                        route=route, latency_ms=_elapsed_ms(request_start)
+                    )
+                _commit_turn_in_background(turn)
+                print(f"🔌 Stream closed before the end (session {session_id}); turn saved with {len(sent)} fragments")
+    
+    return StreamingResponse(
+        llm_events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
 
 
 @router.get("/sessions/{session_id}/history", response_model=ConversationHistory)
-def get_session_history(session_id: int, db: Session = Depends(get_db)):
+async def get_session_history(session_id: int, db: AsyncSession = Depends(get_async_db)):
     """Get conversation history for a session"""
-    session = db.query(ChatSession).filter(ChatSession.id == session_id).first()
+    session = await db.get(ChatSession, session_id)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    messages = context_manager.get_conversation_history(session_id, db, max_messages=100)
-    
     # Convert to MessageSchema objects
     from app.models.message import Message
-    message_objects = db.query(Message)\
-        .filter(Message.session_id == session_id)\
-        .order_by(Message.timestamp)\
-        .all()
+    result = await db.execute(
+        select(Message)
+        .where(Message.session_id == session_id)
+        .order_by(Message.timestamp)
+    )
+    message_objects = result.scalars().all()
     
     return ConversationHistory(
         session_id=session_id,
@@ -7,6 +7,7 @@ from app.database import get_db
 from app.schemas.faq import FAQCreate, FAQResponse, FAQUpdate
 from app.models.faq import FAQ
 from app.services.faq_service import faq_service
+from app.services.response_cache import response_cache
 
 router = APIRouter(prefix="/api/faqs", tags=["faqs"])
 
@@ -26,6 +27,9 @@ def create_faq(request: FAQCreate, db: Session = Depends(get_db)):
     # Generate embedding for the new FAQ
     faq_service.generate_and_store_embeddings(db)
     
+    # Cached answers may now have a better FAQ to draw on
+    response_cache.invalidate()
+    
     return FAQResponse.model_validate(faq)
 
 
@@ -84,6 +88,9 @@ def update_faq(
     # Regenerate embedding
     faq_service.generate_and_store_embeddings(db)
     
+    # Cached answers may quote the old FAQ text
+    response_cache.invalidate()
+    
     return FAQResponse.model_validate(faq)
 
 
@@ -96,5 +103,10 @@ def delete_faq(faq_id: int, db: Session = Depends(get_db)):
     
     db.delete(faq)
     db.commit()
+    faq_service.index.remove(faq_id)
+    faq_service.lexical.remove(faq_id)
+    
+    # Cached answers may quote the deleted FAQ
+    response_cache.invalidate()
     
     return {"message": "FAQ deleted successfully"}
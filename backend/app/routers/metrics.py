@@ -0,0 +1,83 @@
+"""Runtime metrics endpoints"""
+
+from datetime import datetime, timedelta
+from fastapi import APIRouter, Depends
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.database import get_async_db
+from app.models.message import Message
+from app.services.response_cache import response_cache
+from app.services.embedding_cache import embedding_cache
+from app.services.embedding_store import embedding_store
+from app.services.llm_service import llm_service
+from app.services.summarizer import conversation_summarizer
+from app.services.confidence import confidence_scorer
+from app.services.faq_service import faq_service
+from app.utils.deadline import deadline_stats
+
+router = APIRouter(prefix="/api/metrics", tags=["metrics"])
+
+
+@router.get("")
+def get_metrics():
+    """In-process counters for caches and the chat pipeline"""
+    return {
+        "response_cache": response_cache.stats(),
+        "embedding_cache": embedding_cache.stats(),
+        "embedding_batcher": faq_service.batcher.stats(),
+        "embedding_store": embedding_store.stats(),
+        "llm": llm_service.stats(),
+        "summarizer": conversation_summarizer.stats(),
+        "confidence": confidence_scorer.stats(),
+        "faq_index": {"backend": settings.FAQ_SEARCH_BACKEND, **faq_service.index.stats()},
+        "lexical_index": faq_service.lexical.stats(),
+        "faq_retrieval": {
+            "mode": settings.FAQ_RETRIEVAL_MODE,
+            "routes": faq_service.routes,
+            "category_filters": faq_service.category_filters
+        },
+        "deadlines": deadline_stats.stats()
+    }
+
+
+@router.get("/routing")
+async def get_routing_metrics(hours: int = 24, db: AsyncSession = Depends(get_async_db)):
+    """
+    How assistant replies were produced over the last `hours`
+    
+    - Share of replies per route (llm, faq_direct, response_cache, keyword_escalation, degraded)
+    - p50/p95 latency per route, from the latency recorded on each message
+    """
+    since = datetime.utcnow() - timedelta(hours=hours)
+    
+    result = await db.execute(
+        select(
+            Message.route,
+            func.count(Message.id).label("count"),
+            func.percentile_cont(0.5).within_group(Message.latency_ms).label("p50_ms"),
+            func.percentile_cont(0.95).within_group(Message.latency_ms).label("p95_ms")
+        )
+        .where(
+            Message.role == "assistant",
+            Message.route.isnot(None),
+            Message.timestamp >= since
+        )
+        .group_by(Message.route)
+    )
+    rows = result.all()
+    total = sum(row.count for row in rows)
+    
+    return {
+        "hours": hours,
+        "total": total,
+        "routes": {
+            row.route: {
+                "count": row.count,
+                "share": round(row.count / total, 4) if total else 0.0,
+                "p50_ms": round(row.p50_ms, 2) if row.p50_ms is not None else None,
+                "p95_ms": round(row.p95_ms, 2) if row.p95_ms is not None else None
+            }
+            for row in rows
+        }
+    }
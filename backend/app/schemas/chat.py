@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Optional, List, Dict, Any
 from datetime import datetime
 
 
@@ -8,6 +8,7 @@ class ChatRequest(BaseModel):
     session_id: Optional[int] = Field(None, description="Session ID. If not provided, a new session will be created")
     message: str = Field(..., min_length=1, max_length=2000, description="User message")
     user_id: Optional[str] = Field(None, description="Optional user identifier")
+    category: Optional[str] = Field(None, max_length=100, description="Only use FAQs of this category")
     
     class Config:
         json_schema_extra = {
@@ -27,6 +28,9 @@ class ChatResponse(BaseModel):
     escalated: bool = False
     escalation_reason: Optional[str] = None
     timestamp: datetime
+    timings: Optional[Dict[str, float]] = Field(None, description="Per-stage latency in milliseconds")
+    route: Optional[str] = Field(None, description="How the reply was produced: llm, faq_direct, response_cache, keyword_escalation, degraded")
+    prompt_tokens: Optional[Dict[str, Any]] = Field(None, description="Prompt size before/after fitting the token budget (LLM route only)")
     
     class Config:
         json_schema_extra = {
@@ -48,6 +52,8 @@ class MessageSchema(BaseModel):
     content: str
     timestamp: datetime
     confidence_score: Optional[float] = None
+    route: Optional[str] = None
+    latency_ms: Optional[float] = None
     
     class Config:
         from_attributes = True
@@ -0,0 +1,236 @@
+"""Admission control for LLM calls: adaptive concurrency limit and circuit breaker"""
+
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+from app.config import settings
+
+
+class LLMUnavailableError(Exception):
+    """Raised when an LLM call is rejected or fails; callers should degrade"""
+    pass
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limit driven by observed latency
+    
+    Each call that finishes under the latency target adds 1/limit to the
+    limit (about +1 per round of calls). A failure or a call over the target
+    multiplies it by LLM_CONCURRENCY_BACKOFF, at most once per observed
+    latency so one slow burst is not punished repeatedly. Calls over the
+    limit wait in a bounded queue; a full queue or a wait longer than
+    LLM_QUEUE_TIMEOUT is rejected at once.
+    """
+    
+    def __init__(self):
+        self.limit = float(settings.LLM_CONCURRENCY_INITIAL)
+        self.in_flight = 0
+        self.waiting = 0
+        self._condition = asyncio.Condition()
+        self._last_decrease = 0.0
+        
+        self.rejected = 0
+    
+    async def acquire(self):
+        async with self._condition:
+            if self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return
+            
+            if self.waiting >= settings.LLM_QUEUE_MAX:
+                self.rejected += 1
+                raise LLMUnavailableError("LLM queue full")
+            
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(
+                    self._condition.wait_for(lambda: self.in_flight < int(self.limit)),
+                    timeout=settings.LLM_QUEUE_TIMEOUT
+                )
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                raise LLMUnavailableError("Timed out waiting for an LLM slot")
+            finally:
+                self.waiting -= 1
+            self.in_flight += 1
+    
+    async def release(self, latency: Optional[float], ok: bool):
+        """
+        Free a slot and adapt the limit
+        
+        Args:
+            latency: Seconds the call took, or None to leave the limit alone
+            ok: Whether the call succeeded
+        """
+        async with self._condition:
+            self.in_flight -= 1
+            if latency is not None:
+                now = time.monotonic()
+                if not ok or latency > settings.LLM_LATENCY_TARGET:
+                    if now - self._last_decrease >= latency:
+                        self.limit = max(settings.LLM_CONCURRENCY_MIN, self.limit * settings.LLM_CONCURRENCY_BACKOFF)
+                        self._last_decrease = now
+                else:
+                    self.limit = min(settings.LLM_CONCURRENCY_MAX, self.limit + 1.0 / self.limit)
+            self._condition.notify_all()
+    
+    def stats(self) -> Dict:
+        return {
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "queue_depth": self.waiting,
+            "rejected": self.rejected
+        }
+
+
+class CircuitBreaker:
+    """
+    Fails fast while the LLM is failing
+    
+    Closed: calls pass; outcomes of the last LLM_BREAKER_WINDOW calls are
+    kept, and once at least LLM_BREAKER_MIN_CALLS are recorded a failure
+    share of LLM_BREAKER_FAILURE_RATIO or more opens the breaker. Errors and
+    calls slower than LLM_BREAKER_SLOW_CALL_SECONDS both count as failures.
+    Open: every call is rejected for LLM_BREAKER_OPEN_SECONDS.
+    Half-open: one trial call is let through; success closes the breaker,
+    failure opens it again.
+    """
+    
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    
+    def __init__(self):
+        self.state = self.CLOSED
+        self._outcomes: deque = deque(maxlen=settings.LLM_BREAKER_WINDOW)
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        
+        self.opened = 0
+        self.rejected = 0
+    
+    def _open(self):
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._trial_in_flight = False
+        self.opened += 1
+        print(f"🔌 LLM circuit breaker opened for {settings.LLM_BREAKER_OPEN_SECONDS}s")
+    
+    def check(self):
+        """Raise LLMUnavailableError if a call may not go through now"""
+        if self.state == self.OPEN:
+            if time.monotonic() - self._opened_at < settings.LLM_BREAKER_OPEN_SECONDS:
+                self.rejected += 1
+                raise LLMUnavailableError("LLM circuit breaker open")
+            self.state = self.HALF_OPEN
+        
+        if self.state == self.HALF_OPEN:
+            if self._trial_in_flight:
+                self.rejected += 1
+                raise LLMUnavailableError("LLM circuit breaker half-open, trial call in flight")
+            self._trial_in_flight = True
+    
+    def record(self, ok: bool):
+        """Record the outcome of a call that check() let through"""
+        if self.state == self.HALF_OPEN:
+            if ok:
+                self.state = self.CLOSED
+                self._outcomes.clear()
+                self._trial_in_flight = False
+                print("🔌 LLM circuit breaker closed")
+            else:
+                self._open()
+            return
+        
+        self._outcomes.append(ok)
+        failures = self._outcomes.count(False)
+        if (
+            self.state == self.CLOSED
+            and len(self._outcomes) >= settings.LLM_BREAKER_MIN_CALLS
+            and failures / len(self._outcomes) >= settings.LLM_BREAKER_FAILURE_RATIO
+        ):
+            self._open()
+    
+    def release_trial(self):
+        """Give up a half-open trial that ended without an outcome (cancelled)"""
+        if self.state == self.HALF_OPEN:
+            self._trial_in_flight = False
+    
+    def stats(self) -> Dict:
+        return {
+            "state": self.state,
+            "recent_failure_ratio": round(self._outcomes.count(False) / len(self._outcomes), 4) if self._outcomes else 0.0,
+            "opened": self.opened,
+            "rejected": self.rejected
+        }
+
+
+class AdmissionTicket:
+    """Handle for one admitted call; streams mark their first token"""
+    
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.first_token_at: Optional[float] = None
+    
+    def first_token(self):
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+    
+    def latency(self) -> float:
+        """Time to first token for streams, total time otherwise"""
+        end = self.first_token_at if self.first_token_at is not None else time.perf_counter()
+        return end - self.start
+
+
+class AdmissionControl:
+    """Circuit breaker in front of an adaptive concurrency limit"""
+    
+    def __init__(self):
+        self.limiter = AdaptiveLimiter()
+        self.breaker = CircuitBreaker()
+    
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[AdmissionTicket]:
+        """
+        Hold an LLM slot for the duration of a call
+        
+        Raises:
+            LLMUnavailableError: Breaker open, queue full or queue wait timed out
+        """
+        self.breaker.check()
+        try:
+            await self.limiter.acquire()
+        except BaseException:
+            self.breaker.release_trial()
+            raise
+        
+        ticket = AdmissionTicket()
+        try:
+            yield ticket
+        except (asyncio.CancelledError, GeneratorExit):
+            # Cancelled or abandoned by the caller: says nothing about the upstream
+            self.breaker.release_trial()
+            await asyncio.shield(self.limiter.release(None, ok=False))
+            raise
+        except BaseException:
+            self.breaker.record(False)
+            await self.limiter.release(ticket.latency(), ok=False)
+            raise
+        
+        latency = ticket.latency()
+        self.breaker.record(latency <= settings.LLM_BREAKER_SLOW_CALL_SECONDS)
+        await self.limiter.release(latency, ok=True)
+    
+    def stats(self) -> Dict:
+        """Current limit, queue depth and breaker state"""
+        return {
+            "concurrency": self.limiter.stats(),
+            "circuit_breaker": self.breaker.stats()
+        }
+
+
+# Global instance
+llm_admission = AdmissionControl()
@@ -0,0 +1,93 @@
+"""Staged pre-LLM pipeline for a chat turn"""
+
+import asyncio
+import time
+from typing import Dict, Awaitable, Callable, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import AsyncSessionLocal
+from app.services.context_manager import context_manager
+from app.services.faq_service import faq_service
+
+
+class ChatPipeline:
+    """
+    Runs the independent lookups of a chat turn concurrently
+    
+    The session reads (history with the rolling summary, then the
+    repeated-question count) and FAQ retrieval do not depend on each other,
+    so they run concurrently and are joined before the prompt is built.
+    Each of the two stages has its own database session, because an
+    AsyncSession cannot run concurrent queries. The two reads share one
+    session and run back to back, since they are short indexed lookups.
+    A session only checks out a pooled connection on its first query, so
+    the in-memory FAQ search holds none. A turn therefore needs at most one
+    connection here, or two with FAQ_SEARCH_BACKEND=pgvector, and one more
+    afterwards to write the turn (see DB_POOL_SIZE).
+    """
+    
+    @staticmethod
+    async def _timed_stage(name: str, stage: Callable[[AsyncSession], Awaitable], timings: Dict[str, float]):
+        """Run one stage on its own session and record its duration in ms"""
+        start = time.perf_counter()
+        try:
+            async with AsyncSessionLocal() as db:
+                return await stage(db)
+        finally:
+            timings[f"{name}_ms"] = round((time.perf_counter() - start) * 1000, 2)
+    
+    async def gather_context(self, session_id: int, user_message: str, category: Optional[str] = None) -> Dict:
+        """
+        Fetch everything the prompt and escalation checks need for one turn
+        
+        Runs before the turn's user message is written, so history holds
+        only earlier messages and the repeated count adds the current one.
+        
+        Args:
+            session_id: Session ID
+            user_message: Current user message
+            category: Only retrieve FAQs of this category (else possibly inferred)
+        
+        Returns:
+            Dict with summary, history, unsummarized_count, relevant_faqs,
+            query_embedding, repeated_count and per-stage timings
+        """
+        timings: Dict[str, float] = {}
+        start = time.perf_counter()
+        
+        async def retrieve_faqs(db: AsyncSession):
+            # Keep the query embedding (None on a lexical route); the
+            # response cache is keyed on it
+            relevant_faqs, query_embedding, _ = await faq_service.retrieve(
+                user_message, db, category=category, session_id=session_id
+            )
+            return relevant_faqs, query_embedding
+        
+        async def read_session(db: AsyncSession):
+            prompt_context = await context_manager.get_prompt_context(session_id, db)
+            repeated_count = await context_manager.count_repeated_questions(session_id, user_message, db)
+            return prompt_context, repeated_count
+        
+        (prompt_context, repeated_count), (relevant_faqs, query_embedding) = await asyncio.gather(
+            self._timed_stage("history", read_session, timings),
+            self._timed_stage("faq_retrieval", retrieve_faqs, timings),
+        )
+        
+        # The current message is staged, not yet written, so count it here
+        repeated_count += 1
+        
+        # Wall time of the fan-out, i.e. the slowest stage plus scheduling
+        timings["context_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        
+        return {
+            "summary": prompt_context["summary"],
+            "history": prompt_context["history"],
+            "unsummarized_count": prompt_context["unsummarized"],
+            "relevant_faqs": relevant_faqs,
+            "query_embedding": query_embedding,
+            "repeated_count": repeated_count,
+            "timings": timings
+        }
+
+
+# Global instance
+chat_pipeline = ChatPipeline()
@@ -0,0 +1,147 @@
+"""Confidence scoring of LLM answers"""
+
+import time
+from typing import Dict, List, Optional
+import numpy as np
+from app.config import settings
+from app.services.faq_service import faq_service
+from app.services.llm_service import llm_service
+from app.utils.prompts import LOW_CONFIDENCE_MATCHER
+
+
+class HeuristicConfidenceScorer:
+    """Phrase, length and question-mark heuristic (LLMService._calculate_confidence)"""
+    
+    name = "heuristic"
+    
+    async def score(self, response: str, relevant_faqs: List[Dict], query_embedding: Optional[np.ndarray]) -> float:
+        return llm_service._calculate_confidence(response)
+    
+    def stats(self) -> Dict:
+        return {"scorer": self.name}
+
+
+class EmbeddingConfidenceScorer:
+    """
+    Scores how well an answer is grounded in the retrieved FAQs
+    
+    The answer is embedded with the FAQ model and compared (cosine) with the
+    FAQ embeddings search_faqs already returned, so FAQs are never
+    re-encoded: one matrix-vector product against the top-k FAQs, plus the
+    similarity to the query embedding so an answer that drifts off the
+    question is not trusted either. The blend is mapped linearly from
+    [CONFIDENCE_SIMILARITY_LOW, CONFIDENCE_SIMILARITY_HIGH] onto [0, 1].
+    An answer that admits it doesn't know is capped at CONFIDENCE_UNCERTAIN_CAP.
+    Without retrieved FAQs there is nothing to ground against, so the
+    heuristic is used.
+    
+    Embedding the answer is a full model forward pass (through the batcher)
+    on every turn and dominates the cost; stats() reports it apart from the
+    similarity step.
+    """
+    
+    name = "embedding"
+    
+    def __init__(self):
+        self.fallback = HeuristicConfidenceScorer()
+        
+        self.scored = 0
+        self.fallbacks = 0
+        self.total_ms = 0.0
+        self.encode_ms = 0.0
+    
+    @staticmethod
+    def _unit(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+    
+    def score_embedding(
+        self,
+        response: str,
+        response_embedding: np.ndarray,
+        faq_embeddings: List[np.ndarray],
+        query_embedding: Optional[np.ndarray] = None
+    ) -> float:
+        """
+        Score an answer whose embedding is already computed
+        
+        Args:
+            response: LLM response text
+            response_embedding: Embedding of the response
+            faq_embeddings: Embeddings of the retrieved FAQs (at least one)
+            query_embedding: Embedding of the user's question, if known
+        
+        Returns:
+            Confidence score between 0 and 1
+        """
+        answer = self._unit(np.asarray(response_embedding, dtype=np.float32))
+        faqs = self._unit(np.asarray(faq_embeddings, dtype=np.float32))
+        similarity = float(np.max(faqs @ answer))
+        
+        if query_embedding is not None:
+            query = self._unit(np.asarray(query_embedding, dtype=np.float32))
+            weight = settings.CONFIDENCE_GROUNDING_WEIGHT
+            similarity = weight * similarity + (1 - weight) * float(query @ answer)
+        
+        low, high = settings.CONFIDENCE_SIMILARITY_LOW, settings.CONFIDENCE_SIMILARITY_HIGH
+        confidence = min(1.0, max(0.0, (similarity - low) / (high - low)))
+        
+        if LOW_CONFIDENCE_MATCHER.contains(response):
+            confidence = min(confidence, settings.CONFIDENCE_UNCERTAIN_CAP)
+        
+        return round(confidence, 4)
+    
+    async def score(self, response: str, relevant_faqs: List[Dict], query_embedding: Optional[np.ndarray]) -> float:
+        """
+        Score an LLM answer against the FAQs retrieved for its prompt
+        
+        Args:
+            response: LLM response text
+            relevant_faqs: Results of search_faqs (with their embeddings)
+            query_embedding: Query vector from embed_query, if known
+        
+        Returns:
+            Confidence score between 0 and 1
+        """
+        faq_embeddings = [faq["embedding"] for faq in relevant_faqs if faq.get("embedding") is not None]
+        if not faq_embeddings or not response.strip():
+            self.fallbacks += 1
+            return await self.fallback.score(response, relevant_faqs, query_embedding)
+        
+        start = time.perf_counter()
+        try:
+            # Answers rarely repeat; keep them out of the query embedding cache
+            response_embedding = await faq_service.embed_query(response, use_cache=False)
+        except Exception as e:
+            print(f"⚠️  Embedding the response failed, using the heuristic: {e}")
+            self.fallbacks += 1
+            return await self.fallback.score(response, relevant_faqs, query_embedding)
+        encoded_at = time.perf_counter()
+        confidence = self.score_embedding(response, response_embedding, faq_embeddings, query_embedding)
+        self.scored += 1
+        self.encode_ms += (encoded_at - start) * 1000
+        self.total_ms += (time.perf_counter() - start) * 1000
+        return confidence
+    
+    def stats(self) -> Dict:
+        return {
+            "scorer": self.name,
+            "scored": self.scored,
+            "fallbacks": self.fallbacks,
+            # Per scored answer, response encode included
+            "avg_ms": round(self.total_ms / self.scored, 2) if self.scored else 0.0,
+            "avg_encode_ms": round(self.encode_ms / self.scored, 2) if self.scored else 0.0
+        }
+
+
+def create_confidence_scorer():
+    """Build the scorer selected by CONFIDENCE_SCORER"""
+    if settings.CONFIDENCE_SCORER == "heuristic":
+        return HeuristicConfidenceScorer()
+    if settings.CONFIDENCE_SCORER == "embedding":
+        return EmbeddingConfidenceScorer()
+    raise ValueError(f"Unknown CONFIDENCE_SCORER: {settings.CONFIDENCE_SCORER!r}")
+
+
+# Global instance
+confidence_scorer = create_confidence_scorer()
@@ -1,8 +1,10 @@
 """Context management for conversation history"""
 
 from typing import List, Dict
-from sqlalchemy.orm import Session
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.message import Message
+from app.models.session import Session as ChatSession
 from app.config import settings
 
 
@@ -10,13 +12,13 @@ class ContextManager:
     """Manages conversation context and history"""
     
     @staticmethod
-    def get_conversation_history(session_id: int, db: Session, max_messages: int = None) -> List[Dict[str, str]]:
+    async def get_conversation_history(session_id: int, db: AsyncSession, max_messages: int = None) -> List[Dict[str, str]]:
         """
         Get conversation history for a session
         
         Args:
             session_id: Session ID
-            db: Database session
+            db: Async database session
             max_messages: Maximum number of recent messages to retrieve
             
         Returns:
@@ -25,26 +27,71 @@ class ContextManager:
         if max_messages is None:
             max_messages = settings.MAX_CONTEXT_MESSAGES
         
-        # Get recent messages
-        messages = db.query(Message)\
-            .filter(Message.session_id == session_id)\
-            .order_by(Message.timestamp.desc())\
-            .limit(max_messages)\
-            .all()
+        # Get recent messages (only the columns the prompt needs)
+        result = await db.execute(
+            select(Message.role, Message.content)
+            .where(Message.session_id == session_id)
+            .order_by(Message.timestamp.desc())
+            .limit(max_messages)
+        )
         
         # Reverse to get chronological order
-        messages = list(reversed(messages))
+        rows = list(reversed(result.all()))
         
         # Convert to LLM format
         history = [
-            {"role": msg.role, "content": msg.content}
-            for msg in messages
+            {"role": row.role, "content": row.content}
+            for row in rows
         ]
         
         return history
     
     @staticmethod
-    def save_message(session_id: int, role: str, content: str, db: Session, confidence_score: float = None) -> Message:
+    async def get_prompt_context(session_id: int, db: AsyncSession, max_messages: int = None) -> Dict:
+        """
+        Get the rolling summary and the messages not yet folded into it
+        
+        Args:
+            session_id: Session ID
+            db: Async database session
+            max_messages: Maximum number of unsummarized messages to retrieve
+        
+        Returns:
+            Dict with summary (None if the session has none yet), history
+            in format [{"role": "user/assistant", "content": "..."}] and
+            unsummarized, the count of all messages after the summary (history
+            is capped at max_messages, this count is not)
+        """
+        if max_messages is None:
+            max_messages = settings.MAX_CONTEXT_MESSAGES
+        
+        result = await db.execute(
+            select(ChatSession.summary, ChatSession.summarized_until)
+            .where(ChatSession.id == session_id)
+        )
+        session_row = result.one_or_none()
+        summary = session_row.summary if session_row else None
+        summarized_until = session_row.summarized_until if session_row else None
+        
+        # The window count is taken before LIMIT, so the same query also
+        # counts every unsummarized message
+        query = select(
+            Message.role, Message.content, func.count().over().label("unsummarized")
+        ).where(Message.session_id == session_id)
+        if summarized_until is not None:
+            query = query.where(Message.id > summarized_until)
+        result = await db.execute(query.order_by(Message.id.desc()).limit(max_messages))
+        rows = result.all()
+        
+        history = [
+            {"role": row.role, "content": row.content}
+            for row in reversed(rows)
+        ]
+        
+        return {"summary": summary, "history": history, "unsummarized": rows[0].unsummarized if rows else 0}
+    
+    @staticmethod
+    async def save_message(session_id: int, role: str, content: str, db: AsyncSession, confidence_score: float = None) -> Message:
         """
         Save a message to the database
         
@@ -52,7 +99,7 @@ class ContextManager:
             session_id: Session ID
             role: Message role ('user' or 'assistant')
             content: Message content
-            db: Database session
+            db: Async database session
             confidence_score: Optional confidence score for assistant messages
             
         Returns:
@@ -65,41 +112,36 @@ class ContextManager:
             confidence_score=confidence_score
         )
         db.add(message)
-        db.commit()
-        db.refresh(message)
+        await db.commit()
+        await db.refresh(message)
         
         return message
     
     @staticmethod
-    def count_repeated_questions(session_id: int, current_question: str, db: Session) -> int:
+    async def count_repeated_questions(session_id: int, current_question: str, db: AsyncSession) -> int:
         """
         Count how many times a similar question has been asked in this session
         
         Args:
             session_id: Session ID
             current_question: Current question text
-            db: Database session
+            db: Async database session
             
         Returns:
             Count of similar questions
         """
-        # Get all user messages in this session
-        user_messages = db.query(Message)\
-            .filter(
+        # Simple similarity check (can be improved with embeddings), done in SQL
+        # so only the count crosses the wire
+        result = await db.execute(
+            select(func.count(Message.id))
+            .where(
                 Message.session_id == session_id,
-                Message.role == "user"
-            )\
-            .all()
-        
-        # Simple similarity check (can be improved with embeddings)
-        current_lower = current_question.lower()
-        count = 0
-        
-        for msg in user_messages:
-            if msg.content.lower() == current_lower:
-                count += 1
+                Message.role == "user",
+                func.lower(Message.content) == current_question.lower()
+            )
+        )
         
-        return count
+        return result.scalar_one()
 
 
 # Global instance
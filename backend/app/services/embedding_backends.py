@@ -0,0 +1,128 @@
+"""Embedding model backends (sentence-transformers or ONNX Runtime)"""
+
+import json
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import List, Union
+import numpy as np
+from app.config import settings
+
+
+class EmbeddingBackend(ABC):
+    """
+    Turns texts into L2-normalized sentence embeddings
+    
+    Backends are interchangeable: encode() takes one text or a list and
+    returns a 1-D vector or a 2-D array, like SentenceTransformer.encode.
+    `name` identifies the model and backend (used to key cached vectors);
+    `lowercase` is true when the tokenizer lowercases its input, so texts
+    differing only in case get the same embedding.
+    A backend without encode() can't be instantiated.
+    """
+    
+    name = "base"
+    dim = 384
+    lowercase = False
+    
+    @abstractmethod
+    def encode(self, texts: Union[str, List[str]], batch_size: int = 32) -> np.ndarray:
+        """Embed one text (1-D result) or a list of texts (2-D result)"""
+
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    """The torch model through sentence-transformers"""
+    
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+        
+        self.model = SentenceTransformer(model_name)
+        self.name = f"sentence-transformers:{model_name}"
+        self.lowercase = bool(getattr(getattr(self.model, "tokenizer", None), "do_lower_case", False))
+    
+    def encode(self, texts: Union[str, List[str]], batch_size: int = 32) -> np.ndarray:
+        return self.model.encode(texts, batch_size=batch_size, convert_to_tensor=False)
+
+
+class ONNXEmbeddingBackend(EmbeddingBackend):
+    """
+    The same transformer exported to ONNX, run with ONNX Runtime on CPU
+    
+    Reproduces the sentence-transformers pipeline for MiniLM: tokenize
+    (truncating to max_length), run the encoder, mean-pool the token
+    states under the attention mask, L2-normalize. Texts are sorted by
+    length before batching so padding stays small. `quantized` loads the
+    int8 dynamically quantized model written by export_onnx_model.py.
+    Needs the optional onnxruntime and tokenizers packages, but not torch.
+    """
+    
+    def __init__(self, model_dir: str, quantized: bool = True, threads: int = 0, max_length: int = 256):
+        try:
+            import onnxruntime
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise RuntimeError("EMBEDDING_BACKEND=onnx needs: pip install onnxruntime tokenizers") from e
+        
+        model_dir = Path(model_dir)
+        model_path = model_dir / ("model_int8.onnx" if quantized else "model.onnx")
+        if not model_path.exists():
+            raise RuntimeError(f"{model_path} not found; run python export_onnx_model.py first")
+        
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(str(model_path), options, providers=["CPUExecutionProvider"])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+        
+        self.tokenizer = Tokenizer.from_file(str(model_dir / "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+        self.lowercase = _normalizer_lowercases(json.loads(self.tokenizer.to_str()).get("normalizer") or {})
+        
+        self.name = f"onnx{'-int8' if quantized else ''}:{model_dir.name}"
+    
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        attention_mask = np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64)
+        feeds = {
+            "input_ids": np.array([encoding.ids for encoding in encodings], dtype=np.int64),
+            "attention_mask": attention_mask,
+            "token_type_ids": np.array([encoding.type_ids for encoding in encodings], dtype=np.int64)
+        }
+        token_states = self.session.run(None, {name: feeds[name] for name in self.input_names})[0]
+        
+        mask = attention_mask[:, :, None].astype(np.float32)
+        pooled = (token_states * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        return pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+    
+    def encode(self, texts: Union[str, List[str]], batch_size: int = 32) -> np.ndarray:
+        single = isinstance(texts, str)
+        if single:
+            texts = [texts]
+        
+        order = np.argsort([-len(text) for text in texts], kind="stable")
+        embeddings = np.empty((len(texts), self.dim), dtype=np.float32)
+        for start in range(0, len(texts), batch_size):
+            batch = order[start:start + batch_size]
+            embeddings[batch] = self._encode_batch([texts[i] for i in batch])
+        
+        return embeddings[0] if single else embeddings
+
+
+def _normalizer_lowercases(normalizer: dict) -> bool:
+    """Whether a tokenizer.json normalizer folds case (BertNormalizer, Lowercase, or a Sequence holding one)"""
+    if normalizer.get("type") == "Sequence":
+        return any(_normalizer_lowercases(step) for step in normalizer.get("normalizers", []))
+    return normalizer.get("type") == "Lowercase" or (normalizer.get("type") == "BertNormalizer" and bool(normalizer.get("lowercase")))
+
+
+def create_embedding_backend() -> EmbeddingBackend:
+    """Build the backend selected by EMBEDDING_BACKEND"""
+    if settings.EMBEDDING_BACKEND == "sentence-transformers":
+        return SentenceTransformerBackend(settings.EMBEDDING_MODEL_NAME)
+    if settings.EMBEDDING_BACKEND == "onnx":
+        return ONNXEmbeddingBackend(
+            settings.EMBEDDING_ONNX_DIR,
+            quantized=settings.EMBEDDING_ONNX_QUANTIZED,
+            threads=settings.EMBEDDING_ONNX_THREADS
+        )
+    raise ValueError(f"Unknown EMBEDDING_BACKEND: {settings.EMBEDDING_BACKEND!r}")
@@ -0,0 +1,140 @@
+"""Dynamic micro-batching of embedding model calls"""
+
+import asyncio
+import time
+from typing import Callable, Dict, List, Optional
+import numpy as np
+from app.config import settings
+from app.utils.histogram import Histogram
+
+
+class EmbeddingBatcher:
+    """
+    Groups concurrent single-text encode requests into one batched call
+    
+    Requests are queued; a single worker takes the first one, keeps
+    collecting for up to `max_wait_ms` or until `max_batch_size` texts are
+    queued, then runs one batched encode in a worker thread and hands each
+    caller its row. While a batch is encoding, new requests build up for the
+    next one, so batches grow with load and an idle server only pays the
+    short collection window. Callers that give up (cancelled) are skipped
+    when results are handed out.
+    """
+    
+    def __init__(
+        self,
+        encode: Callable[[List[str]], np.ndarray],
+        max_batch_size: int = None,
+        max_wait_ms: float = None
+    ):
+        """
+        Args:
+            encode: Blocking function mapping a list of texts to a 2-D array
+                of embeddings (one row per text)
+            max_batch_size: Texts per encode call (default from settings)
+            max_wait_ms: Longest time the first request of a batch waits
+                for company (default from settings)
+        """
+        self.encode = encode
+        self.max_batch_size = settings.EMBEDDING_BATCH_MAX_SIZE if max_batch_size is None else max_batch_size
+        self.max_wait_ms = settings.EMBEDDING_BATCH_MAX_WAIT_MS if max_wait_ms is None else max_wait_ms
+        
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        
+        self.batch_sizes = Histogram([1, 2, 4, 8, 16, 32, 64, 128])
+        self.queue_wait_ms = Histogram([0.5, 1, 2, 5, 10, 20, 50, 100, 250])
+        self.batches = 0
+        self.failed_batches = 0
+    
+    def _ensure_worker(self):
+        if self._worker is None or self._worker.done() or self._worker.get_loop() is not asyncio.get_running_loop():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+    
+    async def embed(self, text: str) -> np.ndarray:
+        """
+        Embed one text as part of the next batch
+        
+        Args:
+            text: Text to encode
+        
+        Returns:
+            Its embedding vector
+        """
+        self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future, time.perf_counter()))
+        return await future
+    
+    async def _collect(self) -> list:
+        """Wait for a first request, then gather more until the batch is full or the window closes"""
+        batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        closes_at = loop.time() + self.max_wait_ms / 1000
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = closes_at - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+    
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            batch = [item for item in batch if not item[1].done()]
+            if not batch:
+                continue
+            
+            started = time.perf_counter()
+            for _, _, enqueued_at in batch:
+                self.queue_wait_ms.observe((started - enqueued_at) * 1000)
+            self.batch_sizes.observe(len(batch))
+            self.batches += 1
+            
+            try:
+                embeddings = await asyncio.to_thread(self.encode, [text for text, _, _ in batch])
+            except asyncio.CancelledError:
+                for _, future, _ in batch:
+                    future.cancel()
+                raise
+            except Exception as e:
+                self.failed_batches += 1
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            
+            for row, (_, future, _) in zip(embeddings, batch):
+                if not future.done():
+                    future.set_result(row)
+    
+    @property
+    def queue_depth(self) -> int:
+        """Texts waiting for a batch (not counting the one encoding)"""
+        return self._queue.qsize() if self._queue is not None else 0
+    
+    async def aclose(self):
+        """Stop the worker (used on shutdown)"""
+        if self._worker is not None:
+            self._worker.cancel()
+            await asyncio.gather(self._worker, return_exceptions=True)
+            self._worker = None
+    
+    def stats(self) -> Dict:
+        """Batch count, queue depth, and batch-size / queue-wait histograms"""
+        return {
+            "batches": self.batches,
+            "failed_batches": self.failed_batches,
+            "queue_depth": self.queue_depth,
+            "batch_size": self.batch_sizes.stats(),
+            "queue_wait_ms": self.queue_wait_ms.stats()
+        }
@@ -0,0 +1,125 @@
+"""Shared LRU cache of text embeddings"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+import numpy as np
+from app.config import settings
+
+
+class EmbeddingCache:
+    """
+    Caches embeddings keyed on (model, normalized text)
+    
+    Whitespace is collapsed before lookup, and for models whose tokenizer
+    lowercases its input (the backend's `lowercase`, true for MiniLM) the
+    text is lowercased too, so "Track my order " and "track my order"
+    share one entry; a cased model keeps them apart. Entries are
+    evicted LRU-first once the entry count or byte cap is exceeded, and
+    expire after `ttl_seconds` when that is set (0 keeps them until evicted).
+    Access is guarded by a lock, since encoders run in worker threads.
+    Cached vectors are read-only and shared by every caller.
+    """
+    
+    def __init__(
+        self,
+        max_entries: int = None,
+        max_bytes: int = None,
+        ttl_seconds: float = None,
+        enabled: bool = None
+    ):
+        self.max_entries = settings.EMBEDDING_CACHE_MAX_ENTRIES if max_entries is None else max_entries
+        self.max_bytes = settings.EMBEDDING_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self.ttl_seconds = settings.EMBEDDING_CACHE_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self.enabled = settings.EMBEDDING_CACHE_ENABLED if enabled is None else enabled
+        
+        self._entries: "OrderedDict[Tuple[str, str], Dict]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    @staticmethod
+    def normalize_text(text: str, lowercase: bool = False) -> str:
+        """Cache key form of a text: whitespace collapsed, lowercased if the model ignores case"""
+        return " ".join((text.lower() if lowercase else text).split())
+    
+    def get(self, model: str, text: str, lowercase: bool = False) -> Optional[np.ndarray]:
+        """
+        Look up the embedding of a text
+        
+        Args:
+            model: Name of the model that produced the embedding
+            text: Text as given to the model
+            lowercase: The model lowercases its input, so case is ignored
+        
+        Returns:
+            The cached vector, or None on a miss
+        """
+        if not self.enabled:
+            return None
+        
+        key = (model, self.normalize_text(text, lowercase))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry["expires_at"] is not None and entry["expires_at"] <= time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry["vector"]
+    
+    def put(self, model: str, text: str, vector: np.ndarray, lowercase: bool = False) -> np.ndarray:
+        """
+        Store an embedding, evicting least-recently-used entries to stay within caps
+        
+        Returns:
+            The stored (read-only) vector
+        """
+        vector = np.asarray(vector)
+        if not self.enabled:
+            return vector
+        
+        vector = vector.copy()
+        vector.setflags(write=False)
+        key = (model, self.normalize_text(text, lowercase))
+        nbytes = vector.nbytes + len(key[1].encode("utf-8")) + 64
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else None
+        
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = {"vector": vector, "expires_at": expires_at, "nbytes": nbytes}
+            self._bytes += nbytes
+            
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+        return vector
+    
+    def _remove(self, key: Tuple[str, str]):
+        entry = self._entries.pop(key)
+        self._bytes -= entry["nbytes"]
+    
+    def stats(self) -> Dict:
+        """Hit/miss counters and current size"""
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions
+        }
+
+
+# Global instance
+embedding_cache = EmbeddingCache()
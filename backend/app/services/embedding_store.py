@@ -0,0 +1,264 @@
+"""Content-addressed on-disk store of FAQ embeddings (memory-mapped)"""
+
+import hashlib
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+from app.config import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows: single writer assumed
+    fcntl = None
+
+
+class EmbeddingStore:
+    """
+    Embeddings keyed by a hash of (model id, text), kept across restarts
+    
+    An FAQ whose text hasn't changed keeps its vector through reloads,
+    table rebuilds and model-less restarts; a different model never sees
+    another model's vectors. The store is a pair of files in `directory`:
+    
+    - vectors-<generation>.npy: float32 [capacity, dim] L2-normalized rows,
+      preallocated and grown by doubling; readers memory-map it read-only
+    - index.npz: the 32-byte key of every filled row, in row order, and the
+      name of the vectors file they refer to
+    
+    New rows are written in place past the filled ones, then index.npz is
+    atomically replaced, so a reader never sees a key whose row isn't
+    written. Growing and compacting write a new vectors generation; open
+    memory maps of the old one stay valid. Writers in different processes
+    serialize on a lock file.
+    """
+    
+    INITIAL_CAPACITY = 1024
+    
+    def __init__(self, directory: str = None, dim: int = 384, enabled: bool = None):
+        self.directory = Path(settings.EMBEDDING_STORE_DIR if directory is None else directory)
+        self.dim = dim
+        self.enabled = settings.EMBEDDING_STORE_ENABLED if enabled is None else enabled
+        self._lock = threading.Lock()
+        
+        self._index_stamp = None  # (mtime_ns, size) of the index file last read
+        self._vectors_file: Optional[str] = None
+        self._vectors: np.ndarray = np.empty((0, dim), dtype=np.float32)
+        self._keys: np.ndarray = np.empty((0, 32), dtype=np.uint8)
+        self._positions: Dict[bytes, int] = {}
+        
+        self.hits = 0
+        self.misses = 0
+        self.added = 0
+    
+    @property
+    def _index_path(self) -> Path:
+        return self.directory / "index.npz"
+    
+    @staticmethod
+    def key(model: str, text: str) -> bytes:
+        """Content address of a text embedded by a model"""
+        return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).digest()
+    
+    def _stamp(self):
+        try:
+            stat = self._index_path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+    
+    def _refresh(self):
+        """Re-read the index (and map its vectors file) if another writer changed it; caller holds _lock"""
+        stamp = self._stamp()
+        if stamp == self._index_stamp:
+            return
+        if stamp is None:
+            keys, vectors_file, vectors = np.empty((0, 32), dtype=np.uint8), None, np.empty((0, self.dim), dtype=np.float32)
+        else:
+            with np.load(self._index_path) as index:
+                keys, vectors_file = index["keys"], str(index["vectors_file"])
+            vectors = np.load(self.directory / vectors_file, mmap_mode="r")
+            if vectors.shape[1] != self.dim:
+                raise ValueError(f"Embedding store {self.directory} holds {vectors.shape[1]}-dim vectors, expected {self.dim}")
+        self._keys = keys
+        self._vectors_file = vectors_file
+        self._vectors = vectors[:len(keys)]  # A view of the memory map, not a copy
+        self._positions = {key.tobytes(): i for i, key in enumerate(keys)}
+        self._index_stamp = stamp
+    
+    def _write_index(self, keys: np.ndarray, vectors_file: str):
+        tmp = self._index_path.with_suffix(".tmp")
+        with open(tmp, "wb") as f:
+            np.savez(f, keys=keys, vectors_file=np.array(vectors_file))
+        os.replace(tmp, self._index_path)
+    
+    def _new_vectors_file(self, rows: np.ndarray, capacity: int) -> str:
+        """Write rows into a new vectors generation of `capacity` rows and return its name"""
+        generation = int(self._vectors_file.split("-")[1].split(".")[0]) + 1 if self._vectors_file else 1
+        name = f"vectors-{generation}.npy"
+        vectors = np.lib.format.open_memmap(self.directory / name, mode="w+", dtype=np.float32, shape=(capacity, self.dim))
+        vectors[:len(rows)] = rows
+        vectors.flush()
+        del vectors
+        return name
+    
+    def _remove_old(self, vectors_file: Optional[str]):
+        if vectors_file and vectors_file != self._vectors_file:
+            try:
+                os.remove(self.directory / vectors_file)
+            except OSError:
+                pass  # Still open elsewhere (Windows); replaced on the next write
+    
+    def _file_lock(self):
+        """Exclusive lock across processes (a no-op without fcntl)"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        lock_file = open(self.directory / ".lock", "w")
+        if fcntl:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        return lock_file  # Closing it releases the lock
+    
+    @property
+    def matrix(self) -> np.ndarray:
+        """Every stored vector in row order (a read-only memory map)"""
+        if not self.enabled:
+            return np.empty((0, self.dim), dtype=np.float32)
+        with self._lock:
+            self._refresh()
+            return self._vectors
+    
+    def positions(self, keys: Iterable[bytes]) -> List[Optional[int]]:
+        """Row of each key in `matrix`, or None where it isn't stored"""
+        if not self.enabled:
+            return [None for _ in keys]
+        with self._lock:
+            self._refresh()
+            return [self._positions.get(key) for key in keys]
+    
+    def get_many(self, keys: List[bytes]) -> List[Optional[np.ndarray]]:
+        """
+        Look up several embeddings
+        
+        Args:
+            keys: Keys from EmbeddingStore.key
+        
+        Returns:
+            A read-only vector per key, or None where it isn't stored
+        """
+        if not self.enabled:
+            return [None] * len(keys)
+        with self._lock:
+            self._refresh()
+            vectors = self._vectors
+            found = [self._positions.get(key) for key in keys]
+        results = [None if position is None else vectors[position] for position in found]
+        hits = sum(result is not None for result in results)
+        self.hits += hits
+        self.misses += len(keys) - hits
+        return results
+    
+    def add_many(self, keys: List[bytes], vectors: np.ndarray):
+        """
+        Store new embeddings (keys already stored are skipped)
+        
+        Args:
+            keys: Keys from EmbeddingStore.key
+            vectors: One embedding per key; stored L2-normalized
+        """
+        if not self.enabled or not keys:
+            return
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        
+        with self._lock:
+            lock_file = self._file_lock()
+            try:
+                self._refresh()
+                new = {}
+                for key, vector in zip(keys, vectors):
+                    if key not in self._positions and key not in new:
+                        new[key] = vector
+                if not new:
+                    return
+                
+                count = len(self._keys)
+                old_file = self._vectors_file
+                capacity = 0 if old_file is None else np.load(self.directory / old_file, mmap_mode="r").shape[0]
+                if count + len(new) > capacity:
+                    vectors_file = self._new_vectors_file(
+                        self._vectors,
+                        max(self.INITIAL_CAPACITY, 2 * capacity, count + len(new))
+                    )
+                else:
+                    vectors_file = old_file
+                
+                # Rows past `count` are invisible to readers until the index names them
+                stored = np.load(self.directory / vectors_file, mmap_mode="r+")
+                stored[count:count + len(new)] = np.stack(list(new.values()))
+                stored.flush()
+                del stored
+                
+                keys = np.concatenate([self._keys, np.frombuffer(b"".join(new), dtype=np.uint8).reshape(-1, 32)])
+                self._write_index(keys, vectors_file)
+                
+                # Extend the in-process view rather than re-reading the whole index
+                self._keys = keys
+                self._vectors_file = vectors_file
+                self._vectors = np.load(self.directory / vectors_file, mmap_mode="r")[:len(keys)]
+                self._positions.update((key, count + i) for i, key in enumerate(new))
+                self._index_stamp = self._stamp()
+                self._remove_old(old_file)
+                self.added += len(new)
+            finally:
+                lock_file.close()
+    
+    def compact(self, keep: Iterable[bytes]) -> int:
+        """
+        Drop every stored embedding whose key is not in `keep`
+        
+        Rewrites the store as a new vectors generation holding only the kept
+        rows; call after a full reload so changed and deleted FAQ texts
+        don't accumulate.
+        
+        Returns:
+            Number of embeddings dropped
+        """
+        if not self.enabled:
+            return 0
+        keep = set(keep)
+        with self._lock:
+            lock_file = self._file_lock()
+            try:
+                self._refresh()
+                rows = [i for i, key in enumerate(self._keys) if key.tobytes() in keep]
+                dropped = len(self._keys) - len(rows)
+                if dropped == 0:
+                    return 0
+                old_file = self._vectors_file
+                vectors_file = self._new_vectors_file(self._vectors[rows], max(self.INITIAL_CAPACITY, len(rows)))
+                self._write_index(self._keys[rows], vectors_file)
+                self._refresh()
+                self._remove_old(old_file)
+                return dropped
+            finally:
+                lock_file.close()
+    
+    def __len__(self) -> int:
+        return len(self.matrix)
+    
+    def stats(self) -> Dict:
+        with self._lock:
+            if self.enabled:
+                self._refresh()
+            return {
+                "enabled": self.enabled,
+                "size": len(self._keys),
+                "bytes": int(self._vectors.nbytes),
+                "hits": self.hits,
+                "misses": self.misses,
+                "added": self.added
+            }
+
+
+# Global instance
+embedding_store = EmbeddingStore()
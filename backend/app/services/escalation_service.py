@@ -1,10 +1,12 @@
 """Escalation detection and management service"""
 
+from sqlalchemy import update
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.escalation import Escalation
 from app.models.session import Session as ChatSession
 from app.config import settings
-from app.utils.prompts import ESCALATION_KEYWORDS
+from app.utils.prompts import ESCALATION_MATCHER
 
 
 class EscalationService:
@@ -34,10 +36,9 @@ class EscalationService:
             return True, f"Low confidence response (score: {confidence_score:.2f})"
         
         # Check 2: User explicitly requests human
-        user_lower = user_message.lower()
-        for keyword in ESCALATION_KEYWORDS:
-            if keyword in user_lower:
-                return True, f"User requested human assistance (keyword: '{keyword}')"
+        keyword_match = ESCALATION_MATCHER.search(user_message)
+        if keyword_match:
+            return True, f"User requested human assistance (keyword: '{keyword_match.phrase}')"
         
         # Check 3: Repeated questions
         if repeated_count >= 3:
@@ -54,22 +55,24 @@ class EscalationService:
         return False, ""
     
     @staticmethod
-    def create_escalation(session_id: int, reason: str, db: Session) -> Escalation:
+    async def create_escalation(session_id: int, reason: str, db: AsyncSession) -> Escalation:
         """
         Create an escalation record
         
         Args:
             session_id: Session ID to escalate
             reason: Reason for escalation
-            db: Database session
+            db: Async database session
             
         Returns:
             Created escalation object
         """
         # Update session status
-        chat_session = db.query(ChatSession).filter(ChatSession.id == session_id).first()
-        if chat_session:
-            chat_session.status = "escalated"
+        await db.execute(
+            update(ChatSession)
+            .where(ChatSession.id == session_id)
+            .values(status="escalated")
+        )
         
         # Create escalation
         escalation = Escalation(
@@ -78,8 +81,8 @@ class EscalationService:
             status="pending"
         )
         db.add(escalation)
-        db.commit()
-        db.refresh(escalation)
+        await db.commit()
+        await db.refresh(escalation)
         
         return escalation
     
@@ -1,94 +1,575 @@
 """FAQ retrieval and semantic search service using pgvector"""
 
-from typing import List, Dict
-from sentence_transformers import SentenceTransformer
+from collections import OrderedDict
+from typing import List, Dict, Optional, Tuple
+import asyncio
+import threading
+import time
 import numpy as np
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
+from pgvector.sqlalchemy import Vector
 from app.models.faq import FAQ
+from app.services.vector_index import FAQVectorIndex
+from app.services.lexical_index import LexicalIndex
+from app.services.embedding_cache import embedding_cache
+from app.services.embedding_store import embedding_store
+from app.services.pgvector_index import pgvector_index
+from app.services.embedding_batcher import EmbeddingBatcher
+from app.services.embedding_backends import EmbeddingBackend, create_embedding_backend
 from app.config import settings
 
+# Writes one chunk of embeddings in a single round trip
+_BULK_UPDATE_EMBEDDINGS = text("""
+    UPDATE faqs
+    SET embedding = batch.embedding
+    FROM (
+        SELECT unnest(CAST(:ids AS integer[])) AS id,
+               CAST(unnest(CAST(:embeddings AS text[])) AS vector) AS embedding
+    ) AS batch
+    WHERE faqs.id = batch.id
+""")
+
 
 class FAQService:
-    """Service for FAQ retrieval and semantic search with pgvector"""
+    """Service for FAQ retrieval and semantic search (in-memory index or pgvector)"""
+    
+    # Cosine distance under which an FAQ counts as relevant (0 = identical)
+    MAX_DISTANCE = 0.5
+    
+    # From this many indexed FAQs a search (several ms) runs off the event loop
+    INDEX_THREAD_MIN_ROWS = 10000
+    
+    # Sessions whose last inferred FAQ category is remembered
+    SESSION_CATEGORIES_MAX = 10000
     
     def __init__(self):
-        # Load a lightweight but effective embedding model (384 dimensions)
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
+        # A lightweight but effective embedding model (384 dimensions), through
+        # the backend chosen by EMBEDDING_BACKEND; loaded on first use or by
+        # warm_up, so importing this module stays cheap
+        self._model: Optional[EmbeddingBackend] = None
+        self._model_lock = threading.Lock()
+        self.model_load_seconds: Optional[float] = None
+        
+        # Filled by load_index / load_lexical_index at startup and patched as FAQs change
+        self.index = FAQVectorIndex(dim=384)
+        self.lexical = LexicalIndex()
+        
+        # Retrievals per route taken by retrieve(), and how often they were
+        # filtered to a category
+        self.routes: Dict[str, int] = {}
+        self.category_filters: Dict[str, int] = {}
+        self._model_loading: Optional[asyncio.Task] = None
+        
+        # Session id -> category inferred on its last turn
+        self._session_categories: "OrderedDict[int, str]" = OrderedDict()
+    
+        # Concurrent embed_query calls share batched model calls
+        self.batcher = EmbeddingBatcher(self._encode_batch)
+    
+    def _load_model(self) -> EmbeddingBackend:
+        """Load the embedding model once, whichever thread gets here first"""
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    start = time.perf_counter()
+                    model = create_embedding_backend()
+                    self.model_load_seconds = round(time.perf_counter() - start, 2)
+                    print(f"✅ Loaded embedding model {model.name} in {self.model_load_seconds:.1f}s")
+                    self._model = model
+        return self._model
+    
+    @property
+    def model(self) -> EmbeddingBackend:
+        """The embedding backend, loaded on first access (blocking)"""
+        return self._load_model()
+    
+    def warm_up(self):
+        """
+        Load the model and run one encode (blocking; call from a worker thread)
+        
+        The first forward pass allocates buffers and, for torch, picks
+        kernels, so it is much slower than the ones after it.
+        """
+        self.model.encode(["warm up"])
+    
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        """Encode several texts in one forward pass (runs in a worker thread)"""
+        return self.model.encode(texts, batch_size=len(texts))
     
-    def get_relevant_faqs(self, query: str, db: Session, top_k: int = None) -> List[Dict]:
+    async def embed_query(self, query: str, use_cache: bool = True) -> np.ndarray:
         """
-        Retrieve most relevant FAQs using pgvector semantic similarity
+        Encode a query into its embedding vector
+        
+        Repeated texts are served from the shared embedding cache; otherwise
+        the model forward pass, which is CPU-bound, runs off the event loop,
+        batched with other concurrent requests when EMBEDDING_BATCH_ENABLED.
         
         Args:
             query: User's question
-            db: Database session
+            use_cache: Look up and store the vector in the embedding cache
+        
+        Returns:
+            384-dim embedding (read-only when cached)
+        """
+        # A cold model is loaded off the event loop
+        model = self._model or await asyncio.to_thread(self._load_model)
+        
+        if use_cache:
+            cached = embedding_cache.get(model.name, query, model.lowercase)
+            if cached is not None:
+                return cached
+        
+        if settings.EMBEDDING_BATCH_ENABLED:
+            embedding = await self.batcher.embed(query)
+        else:
+            embedding = await asyncio.to_thread(model.encode, query)
+        if use_cache:
+            embedding = embedding_cache.put(model.name, query, embedding, model.lowercase)
+        return embedding
+    
+    async def search_faqs(
+        self,
+        query_embedding: np.ndarray,
+        db: AsyncSession,
+        top_k: int = None,
+        category: Optional[str] = None
+    ) -> List[Dict]:
+        """
+        Find the FAQs closest to an already-computed query embedding
+        
+        Uses the in-memory index when FAQ_SEARCH_BACKEND is "memory" and the
+        index is loaded, otherwise pgvector. With a category, only that
+        partition is searched.
+        
+        Args:
+            query_embedding: Query vector from embed_query
+            db: Async database session (only used by the pgvector backend)
             top_k: Number of FAQs to return (default from settings)
+            category: Only search the FAQs of this category
             
         Returns:
-            List of relevant FAQ dictionaries
+            List of relevant FAQ dictionaries, each with its stored embedding
+            (reused by the confidence scorer instead of re-encoding the FAQ)
         """
         if top_k is None:
             top_k = settings.TOP_K_FAQS
         
-        # Encode the query
-        query_embedding = self.model.encode(query, convert_to_tensor=False)
+        if settings.FAQ_SEARCH_BACKEND == "memory" and self.index.loaded:
+            if self.index.partition_size(category) >= self.INDEX_THREAD_MIN_ROWS:
+                return await asyncio.to_thread(self.index.search, query_embedding, top_k, self.MAX_DISTANCE, category)
+            return self.index.search(query_embedding, top_k, self.MAX_DISTANCE, category)
+        return await self._search_pgvector(query_embedding, db, top_k, category)
+    
+    async def _search_pgvector(
+        self,
+        query_embedding: np.ndarray,
+        db: AsyncSession,
+        top_k: int,
+        category: Optional[str] = None
+    ) -> List[Dict]:
+        """Nearest FAQs by pgvector cosine distance, same contract as search_faqs"""
         query_vector = query_embedding.tolist()
+        params = {"query_embedding": str(query_vector), "limit": top_k}
+        
+        if category is None or category in pgvector_index.category_indexes:
+            # ef_search / probes for the ANN index, scoped to this transaction
+            await pgvector_index.apply_query_settings(db, top_k)
         
-        # Use pgvector's <=> operator for cosine distance
-        # Lower distance = more similar
-        sql = text("""
-            SELECT id, question, answer, category,
-                   embedding <=> :query_embedding AS distance
-            FROM faqs
-            WHERE embedding IS NOT NULL
-            ORDER BY embedding <=> :query_embedding
-            LIMIT :limit
-        """)
-        
-        result = db.execute(
-            sql,
-            {"query_embedding": str(query_vector), "limit": top_k}
-        ).fetchall()
+            # Use pgvector's <=> operator for cosine distance
+            # Lower distance = more similar; the WHERE clause matches the
+            # predicate of the partial ANN index (the whole table's or the
+            # category's), so the index can serve it
+            predicate = "embedding IS NOT NULL"
+            if category is not None:
+                predicate += f" AND {pgvector_index.category_predicate(category)}"
+            sql = f"""
+                SELECT id, question, answer, category, embedding,
+                       embedding <=> CAST(:query_embedding AS vector) AS distance
+                FROM faqs
+                WHERE {predicate}
+                ORDER BY embedding <=> CAST(:query_embedding AS vector)
+                LIMIT :limit
+            """
+        else:
+            # A category without its own index: read its rows through the
+            # category btree and rank them exactly; MATERIALIZED keeps the
+            # planner from walking the whole table's ANN index and filtering
+            # afterwards, which can return fewer than top_k rows
+            sql = """
+                WITH partition AS MATERIALIZED (
+                    SELECT id, question, answer, category, embedding
+                    FROM faqs
+                    WHERE embedding IS NOT NULL AND category = :category
+                )
+                SELECT id, question, answer, category, embedding,
+                       embedding <=> CAST(:query_embedding AS vector) AS distance
+                FROM partition
+                ORDER BY distance
+                LIMIT :limit
+            """
+            params["category"] = category
+        
+        result = (await db.execute(text(sql).columns(embedding=Vector(384)), params)).fetchall()
         
         # Convert to list of dicts, filter by similarity threshold
         relevant_faqs = []
         for row in result:
-            # cosine distance < 0.5 means good similarity (threshold adjustable)
-            if row.distance < 0.5:
+            # cosine distance < MAX_DISTANCE means good similarity
+            if row.distance < self.MAX_DISTANCE:
                 relevant_faqs.append({
                     'id': row.id,
                     'question': row.question,
                     'answer': row.answer,
-                    'category': row.category
+                    'category': row.category,
+                    'embedding': row.embedding,
+                    'distance': float(row.distance)
                 })
         
         return relevant_faqs
     
-    def generate_and_store_embeddings(self, db: Session):
+    async def retrieve(
+        self,
+        query: str,
+        db: AsyncSession,
+        top_k: int = None,
+        category: Optional[str] = None,
+        session_id: Optional[int] = None
+    ) -> Tuple[List[Dict], Optional[np.ndarray], str]:
+        """
+        Retrieve the FAQs for a query, routed by FAQ_RETRIEVAL_MODE and the current load
+        
+        - vector: embed the query and search_faqs
+        - hybrid: vector and BM25 results fused by reciprocal rank
+        - lexical_decisive / lexical_cold / lexical_overloaded (with
+          FAQ_LEXICAL_ROUTING_ENABLED): BM25 alone, without a model call,
+          when its best match clearly stands out, the model isn't loaded
+          yet, or the embedding queue is backed up; if BM25 finds nothing,
+          the vector route is taken anyway
+        
+        BM25-only results carry `lexical_score` but no `distance` or
+        embedding: a BM25 score is not a cosine distance, so thresholds on
+        distance (direct answers, degraded-reply confidence) skip them.
+        
+        Without a category, FAQ_CATEGORY_INFERENCE_ENABLED picks the one
+        whose FAQ centroid is clearly closest to the query embedding (or,
+        on a near tie, the one inferred earlier in the session) and only
+        searches that partition, falling back to every FAQ if it has no
+        match. Lexical routes don't infer, having no query embedding.
+        
+        Args:
+            query: User's question
+            db: Async database session
+            top_k: Number of FAQs to return (default from settings)
+            category: Only retrieve FAQs of this category
+            session_id: Conversation the query belongs to (for category inference)
+        
+        Returns:
+            Tuple of (relevant FAQs, query embedding or None if the model was skipped, route)
+        """
+        if top_k is None:
+            top_k = settings.TOP_K_FAQS
+        hybrid = settings.FAQ_RETRIEVAL_MODE == "hybrid"
+        if category is not None:
+            self._count(self.category_filters, "requested")
+        
+        lexical_faqs = []
+        if self.lexical.loaded and (hybrid or settings.FAQ_LEXICAL_ROUTING_ENABLED):
+            lexical_faqs = self.lexical.search(
+                query, max(top_k, settings.FAQ_HYBRID_CANDIDATES), settings.FAQ_LEXICAL_MIN_SCORE, category
+            )
+        
+        if settings.FAQ_LEXICAL_ROUTING_ENABLED and lexical_faqs:
+            route = self._lexical_route(lexical_faqs)
+            if route:
+                self._count(self.routes, route)
+                return lexical_faqs[:top_k], None, route
+        
+        query_embedding = await self.embed_query(query)
+        inferred = False
+        if category is None and settings.FAQ_CATEGORY_INFERENCE_ENABLED and self.index.loaded:
+            category = self._infer_category(query_embedding, session_id)
+            inferred = category is not None
+        
+        candidates = max(top_k, settings.FAQ_HYBRID_CANDIDATES) if hybrid else top_k
+        vector_faqs = await self.search_faqs(query_embedding, db, candidates, category)
+        if inferred:
+            if vector_faqs:
+                self._count(self.category_filters, "inferred")
+                lexical_faqs = [faq for faq in lexical_faqs if faq["category"] == category]
+            else:
+                self._count(self.category_filters, "inferred_fallback")
+                vector_faqs = await self.search_faqs(query_embedding, db, candidates)
+        
+        if not hybrid:
+            self._count(self.routes, "vector")
+            return vector_faqs, query_embedding, "vector"
+        self._count(self.routes, "hybrid")
+        return self._fuse(vector_faqs, lexical_faqs, top_k), query_embedding, "hybrid"
+        
+    def _infer_category(self, query_embedding: np.ndarray, session_id: Optional[int]) -> Optional[str]:
+        """Category to filter by, remembered per session as a tie-breaker for its next turns"""
+        prior = self._session_categories.get(session_id) if session_id is not None else None
+        category = self.index.infer_category(query_embedding, settings.FAQ_CATEGORY_INFERENCE_MARGIN, prior)
+        if session_id is not None and category is not None:
+            self._session_categories[session_id] = category
+            self._session_categories.move_to_end(session_id)
+            while len(self._session_categories) > self.SESSION_CATEGORIES_MAX:
+                self._session_categories.popitem(last=False)
+        return category
+    
+    def _lexical_route(self, lexical_faqs: List[Dict]) -> Optional[str]:
+        """Why retrieval can skip the model for these BM25 results, or None"""
+        best = lexical_faqs[0]["lexical_score"]
+        runner_up = lexical_faqs[1]["lexical_score"] if len(lexical_faqs) > 1 else 0.0
+        if best >= settings.FAQ_LEXICAL_DECISIVE_SCORE and best - runner_up >= settings.FAQ_LEXICAL_DECISIVE_MARGIN:
+            return "lexical_decisive"
+        if self._model is None:
+            # Load it in the background; this request doesn't wait for it
+            if self._model_loading is None or self._model_loading.done():
+                self._model_loading = asyncio.create_task(asyncio.to_thread(self._load_model))
+            return "lexical_cold"
+        if settings.EMBEDDING_BATCH_ENABLED and self.batcher.queue_depth >= settings.FAQ_LEXICAL_OVERLOAD_QUEUE_DEPTH:
+            return "lexical_overloaded"
+        return None
+    
+    @staticmethod
+    def _fuse(vector_faqs: List[Dict], lexical_faqs: List[Dict], top_k: int) -> List[Dict]:
+        """
+        Reciprocal rank fusion: each FAQ scores sum(1 / (FAQ_HYBRID_RRF_K + rank))
+        over the lists it appears in; ties keep the vector order. FAQs only
+        BM25 found keep just their `lexical_score` (no distance or embedding).
+        """
+        fused: Dict[int, List] = {}
+        for results in (vector_faqs, lexical_faqs):
+            for rank, faq in enumerate(results, start=1):
+                entry = fused.get(faq["id"])
+                if entry is None:
+                    fused[faq["id"]] = [1.0 / (settings.FAQ_HYBRID_RRF_K + rank), faq]
+                else:
+                    # Keep the vector result (distance and embedding), add the BM25 score
+                    entry[0] += 1.0 / (settings.FAQ_HYBRID_RRF_K + rank)
+                    entry[1] = {**entry[1], "lexical_score": faq["lexical_score"]}
+        ranked = sorted(fused.values(), key=lambda entry: entry[0], reverse=True)
+        return [faq for _, faq in ranked[:top_k]]
+    
+    @staticmethod
+    def _count(counters: Dict[str, int], key: str):
+        counters[key] = counters.get(key, 0) + 1
+    
+    @staticmethod
+    def faq_text(question: str, answer: str) -> str:
+        """Text an FAQ is embedded from (question and answer, for better semantic matching)"""
+        return f"{question} {answer}"
+    
+    def store_keys(self, texts: List[str]) -> List[bytes]:
+        """Embedding store keys of texts under the current model"""
+        return [embedding_store.key(self.model.name, text) for text in texts]
+    
+    def load_index(self, db: Session):
+        """
+        Load every embedded FAQ into the in-memory index
+        
+        Call at startup, after generate_and_store_embeddings. When every FAQ
+        has its vector in the embedding store, the index searches the
+        store's memory map directly; otherwise the vectors are read from
+        the database.
+        """
+        if embedding_store.enabled:
+            faqs = db.query(FAQ.id, FAQ.question, FAQ.answer, FAQ.category).filter(
+                FAQ.embedding != None
+            ).all()
+            positions = embedding_store.positions(self.store_keys([self.faq_text(faq.question, faq.answer) for faq in faqs]))
+            # Needs one store row per FAQ (FAQs with identical text share a row)
+            if None not in positions and len(set(positions)) == len(positions):
+                matrix = embedding_store.matrix
+                ids = np.full(len(matrix), -1, dtype=np.int64)
+                rows = [None] * len(matrix)
+                for faq, position in zip(faqs, positions):
+                    ids[position] = faq.id
+                    rows[position] = {"id": faq.id, "question": faq.question, "answer": faq.answer, "category": faq.category}
+                self.index.load_matrix(ids, matrix, rows)
+                print(f"✅ Mapped {len(self.index)} FAQ embeddings from the embedding store into the in-memory index")
+                return
+        
+        faqs = db.query(FAQ.id, FAQ.question, FAQ.answer, FAQ.category, FAQ.embedding).filter(
+            FAQ.embedding != None
+        ).all()
+        self.index.load(faqs)
+        print(f"✅ Loaded {len(self.index)} FAQ embeddings into the in-memory index")
+    
+    def load_lexical_index(self, db: Session):
+        """Load every FAQ into the BM25 index (needs no embeddings, so it can run before the model loads)"""
+        self.lexical.load(db.query(FAQ.id, FAQ.question, FAQ.answer, FAQ.category).all())
+        print(f"✅ Loaded {len(self.lexical)} FAQs into the lexical (BM25) index")
+    
+    def _embed_faq_texts(self, texts: List[str]) -> Tuple[np.ndarray, int]:
+        """
+        Embeddings of FAQ texts, encoding only those not in the embedding store
+        
+        Returns:
+            Tuple of (embeddings, number of texts actually encoded)
+        """
+        keys = self.store_keys(texts)
+        embeddings = embedding_store.get_many(keys)
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            encoded = self.model.encode([texts[i] for i in missing], batch_size=settings.EMBEDDING_GENERATION_BATCH_SIZE)
+            embedding_store.add_many([keys[i] for i in missing], encoded)
+            for i, embedding in zip(missing, encoded):
+                embeddings[i] = embedding
+        return np.asarray(embeddings, dtype=np.float32), len(missing)
+    
+    def direct_answer(self, relevant_faqs: List[Dict]) -> Optional[Tuple[str, float]]:
+        """
+        Answer straight from the best FAQ when it is a near-exact match
+        
+        Below FAQ_DIRECT_ANSWER_MAX_DISTANCE the LLM would only reword the
+        FAQ answer, so it is returned as-is (through FAQ_DIRECT_ANSWER_TEMPLATE).
+        Only a vector match qualifies; a best FAQ found by BM25 alone has no
+        distance to compare.
+        
+        Args:
+            relevant_faqs: Results of search_faqs, closest first
+        
+        Returns:
+            Tuple of (response_text, confidence_score), or None if disabled or no close match
+        """
+        if not settings.FAQ_DIRECT_ANSWER_ENABLED or not relevant_faqs:
+            return None
+        
+        best = relevant_faqs[0]
+        if best.get('distance') is None or best['distance'] >= settings.FAQ_DIRECT_ANSWER_MAX_DISTANCE:
+            return None
+        
+        response_text = settings.FAQ_DIRECT_ANSWER_TEMPLATE.format(
+            question=best['question'],
+            answer=best['answer'],
+            category=best['category'] or ''
+        )
+        
+        # Cosine distance 0 -> similarity 1; below the threshold this stays
+        # above the escalation threshold
+        confidence_score = round(max(0.0, min(1.0, 1.0 - best['distance'])), 4)
+        
+        return response_text, confidence_score
+    
+    async def get_relevant_faqs(
+        self,
+        query: str,
+        db: AsyncSession,
+        top_k: int = None,
+        category: Optional[str] = None
+    ) -> List[Dict]:
+        """
+        Retrieve most relevant FAQs (see retrieve)
+        
+        Args:
+            query: User's question
+            db: Async database session
+            top_k: Number of FAQs to return (default from settings)
+            category: Only retrieve FAQs of this category
+        
+        Returns:
+            List of relevant FAQ dictionaries
+        """
+        relevant_faqs, _, _ = await self.retrieve(query, db, top_k, category)
+        return relevant_faqs
+    
+    def generate_and_store_embeddings(
+        self,
+        db: Session,
+        chunk_size: int = None,
+        start_after_id: int = 0,
+        reembed_all: bool = False
+    ) -> Dict:
         """
         Generate embeddings for all FAQs that don't have them
         Call this after adding new FAQs
+        
+        Rows are read in id order, chunk_size at a time (keyset pagination),
+        each chunk is encoded in one batch, written with a single UPDATE and
+        committed, so memory stays flat and an interrupted run keeps its
+        finished chunks. Texts already in the embedding store (unchanged
+        since they were last embedded) are not encoded again. Re-running
+        resumes with the FAQs still missing an embedding; a reembed_all run
+        is resumed by passing the last id it reported as start_after_id.
+        
+        Args:
+            db: Database session
+            chunk_size: FAQs per chunk (default EMBEDDING_GENERATION_CHUNK_SIZE)
+            start_after_id: Only FAQs with a larger id are processed
+            reembed_all: Re-encode FAQs that already have an embedding
+                (e.g. after changing the model)
+        
+        Returns:
+            Dict with embedded and encoded counts, last_id, seconds and per_second
         """
-        # Get FAQs without embeddings
-        faqs = db.query(FAQ).filter(FAQ.embedding == None).all()
+        if chunk_size is None:
+            chunk_size = settings.EMBEDDING_GENERATION_CHUNK_SIZE
+        
+        pending = db.query(FAQ.id).filter(FAQ.id > start_after_id)
+        if not reembed_all:
+            pending = pending.filter(FAQ.embedding == None)
+        total = pending.count()
         
-        if not faqs:
+        if total == 0:
             print("✅ All FAQs already have embeddings")
-            return
+            return {"embedded": 0, "encoded": 0, "last_id": start_after_id, "seconds": 0.0, "per_second": 0.0}
         
-        print(f"🔄 Generating embeddings for {len(faqs)} FAQs...")
+        print(f"🔄 Generating embeddings for {total} FAQs in chunks of {chunk_size}...")
         
-        for faq in faqs:
-            # Combine question and answer for better semantic matching
-            text = f"{faq.question} {faq.answer}"
-            embedding = self.model.encode(text, convert_to_tensor=False)
+        start = time.perf_counter()
+        embedded = 0
+        encoded = 0
+        last_id = start_after_id
+        while True:
+            chunk = db.query(FAQ.id, FAQ.question, FAQ.answer, FAQ.category).filter(FAQ.id > last_id)
+            if not reembed_all:
+                chunk = chunk.filter(FAQ.embedding == None)
+            rows = chunk.order_by(FAQ.id).limit(chunk_size).all()
+            if not rows:
+                break
             
-            # Store as list (pgvector will handle conversion)
-            faq.embedding = embedding.tolist()
+            embeddings, chunk_encoded = self._embed_faq_texts([self.faq_text(row.question, row.answer) for row in rows])
+            
+            # One statement per chunk; vectors travel as pgvector text literals
+            db.execute(
+                _BULK_UPDATE_EMBEDDINGS,
+                {
+                    "ids": [row.id for row in rows],
+                    "embeddings": [str(embedding.tolist()) for embedding in embeddings]
+                }
+            )
+            db.commit()
+        
+            # Patch the in-memory indexes once the rows are committed (before
+            # they are loaded at startup there is nothing to patch)
+            if self.index.loaded:
+                self.index.upsert_many([
+                    (row.id, row.question, row.answer, row.category, embedding)
+                    for row, embedding in zip(rows, embeddings)
+                ])
+            if self.lexical.loaded:
+                self.lexical.upsert_many([(row.id, row.question, row.answer, row.category) for row in rows])
+        
+            embedded += len(rows)
+            encoded += chunk_encoded
+            last_id = rows[-1].id
+            elapsed = time.perf_counter() - start
+            print(f"   {embedded}/{total} FAQs embedded ({embedded / elapsed:.0f}/s, {encoded} encoded, last id {last_id})")
         
-        db.commit()
-        print(f"✅ Generated and stored {len(faqs)} embeddings")
+        elapsed = time.perf_counter() - start
+        print(f"✅ Generated and stored {embedded} embeddings in {elapsed:.1f}s "
+              f"({encoded} encoded, {embedded - encoded} from the embedding store)")
+        return {
+            "embedded": embedded,
+            "encoded": encoded,
+            "last_id": last_id,
+            "seconds": round(elapsed, 2),
+            "per_second": round(embedded / elapsed, 1) if elapsed > 0 else 0.0
+        }
 
 
 # Global instance
@@ -0,0 +1,287 @@
+"""In-process BM25 keyword index over FAQ questions and answers"""
+
+import math
+import re
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from app.config import settings
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+# Words too common in support questions to tell FAQs apart
+_STOPWORDS = frozenset("""
+    a an and are as at be by can do does for from have how i if in is it me my of on or
+    our so that the this to us was we what when where which who why will with you your
+""".split())
+
+
+class LexicalIndex:
+    """
+    BM25 search over FAQ text, no embedding model involved
+    
+    An inverted index maps each term to the FAQs containing it and how
+    often; question terms count QUESTION_WEIGHT times, since a question
+    states what the FAQ is about and its answer only elaborates. Scores are
+    normalized by the most a query could score (every term saturated in one
+    FAQ), so they fall in [0, 1) and can be compared across queries, and a
+    query word no FAQ contains lowers every score.
+    
+    Each FAQ has a slot; a term's postings are two arrays (slots in
+    ascending order, term frequencies), so a search scores every FAQ
+    containing a query term with a few vectorized operations per term.
+    Writers patch the index under a lock and replace the postings of each
+    term they touch rather than changing them in place, so searches never
+    lock and never see a half-written posting list.
+    """
+    
+    QUESTION_WEIGHT = 2
+    INITIAL_CAPACITY = 1024
+    
+    def __init__(self, k1: float = None, b: float = None):
+        self.k1 = settings.FAQ_LEXICAL_BM25_K1 if k1 is None else k1
+        self.b = settings.FAQ_LEXICAL_BM25_B if b is None else b
+        self._lock = threading.Lock()
+        self._postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._slots: Dict[int, int] = {}  # FAQ id -> slot
+        self._categories: Dict[str, int] = {}  # Category -> code (never reused)
+        # Per slot: FAQ id (-1 when free), weighted term count, category code
+        # (-1 for none); swapped together when they grow
+        self._slot_arrays = self._new_slot_arrays(0)
+        self._terms: Dict[int, Counter] = {}
+        self._rows: Dict[int, Dict] = {}
+        self._used_slots = 0
+        self._free_slots: List[int] = []  # Freed by remove, reused first
+        self._total_length = 0
+        self.loaded = False
+        
+        self.searches = 0
+    
+    @staticmethod
+    def _new_slot_arrays(capacity: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        return (
+            np.full(capacity, -1, dtype=np.int64),
+            np.zeros(capacity, dtype=np.float32),
+            np.full(capacity, -1, dtype=np.int32)
+        )
+    
+    def _category_code(self, category: Optional[str]) -> int:
+        if category is None:
+            return -1
+        return self._categories.setdefault(category, len(self._categories))
+    
+    @staticmethod
+    def tokenize(text: str) -> List[str]:
+        """Lowercased word tokens without stopwords, plurals folded ("policies" -> "policy")"""
+        tokens = []
+        for token in _TOKEN.findall(text.lower()):
+            if token in _STOPWORDS:
+                continue
+            if len(token) > 4 and token.endswith("ies"):
+                token = token[:-3] + "y"
+            elif len(token) > 3 and token.endswith("s") and not token.endswith(("ss", "us")):
+                token = token[:-1]
+            tokens.append(token)
+        return tokens
+    
+    def _document_terms(self, question: str, answer: str) -> Counter:
+        terms = Counter(self.tokenize(question))
+        for term in terms:
+            terms[term] *= self.QUESTION_WEIGHT
+        terms.update(self.tokenize(answer))
+        return terms
+    
+    @staticmethod
+    def _arrays(postings: Dict[int, int]) -> Tuple[np.ndarray, np.ndarray]:
+        return np.fromiter(postings.keys(), dtype=np.int64, count=len(postings)), \
+            np.fromiter(postings.values(), dtype=np.float32, count=len(postings))
+    
+    def load(self, faqs: Iterable):
+        """
+        Replace the index contents
+        
+        Args:
+            faqs: Rows with id, question, answer and category
+        """
+        postings: Dict[str, Dict[int, int]] = {}
+        slots, terms, rows, lengths, categories = {}, {}, {}, [], []
+        for faq in faqs:
+            counts = self._document_terms(faq.question, faq.answer)
+            slot = slots.setdefault(faq.id, len(slots))
+            if slot < len(lengths):
+                continue  # Duplicate id: the first row wins
+            for term, count in counts.items():
+                postings.setdefault(term, {})[slot] = count
+            terms[faq.id] = counts
+            lengths.append(sum(counts.values()))
+            categories.append(faq.category)
+            rows[faq.id] = {"id": faq.id, "question": faq.question, "answer": faq.answer, "category": faq.category}
+        
+        category_codes: Dict[str, int] = {}
+        ids, length_array, codes = self._new_slot_arrays(max(self.INITIAL_CAPACITY, len(slots)))
+        ids[:len(slots)] = list(slots.keys())
+        length_array[:len(lengths)] = lengths
+        codes[:len(categories)] = [
+            -1 if category is None else category_codes.setdefault(category, len(category_codes))
+            for category in categories
+        ]
+        with self._lock:
+            self._postings = {term: self._arrays(entries) for term, entries in postings.items()}
+            self._slots, self._categories = slots, category_codes
+            self._slot_arrays = (ids, length_array, codes)
+            self._terms, self._rows = terms, rows
+            self._used_slots = len(slots)
+            self._free_slots = []
+            self._total_length = sum(lengths)
+            self.loaded = True
+    
+    def upsert_many(self, entries: List[Tuple]):
+        """
+        Add or replace several FAQs, copying each affected posting list once
+        
+        FAQs whose text is unchanged only have their row and category refreshed.
+        
+        Args:
+            entries: (faq_id, question, answer, category) tuples
+        """
+        with self._lock:
+            edits: Dict[str, Dict[int, Optional[int]]] = {}
+            for faq_id, question, answer, category in entries:
+                counts = self._document_terms(question, answer)
+                old = self._terms.get(faq_id)
+                slot = self._slots.get(faq_id)
+                if slot is None:
+                    slot = self._new_slot(faq_id)
+                if old != counts:
+                    for term in (old or {}).keys() - counts.keys():
+                        edits.setdefault(term, {})[slot] = None
+                    for term, count in counts.items():
+                        edits.setdefault(term, {})[slot] = count
+                    length = sum(counts.values())
+                    self._total_length += length - (sum(old.values()) if old else 0)
+                    self._slot_arrays[1][slot] = length
+                    self._terms[faq_id] = counts
+                self._slot_arrays[2][slot] = self._category_code(category)
+                self._rows[faq_id] = {"id": faq_id, "question": question, "answer": answer, "category": category}
+            self._publish(edits)
+    
+    def remove(self, faq_id: int):
+        """Drop an FAQ from the index (no-op if it isn't indexed)"""
+        with self._lock:
+            counts = self._terms.pop(faq_id, None)
+            if counts is None:
+                return
+            slot = self._slots.pop(faq_id)
+            self._publish({term: {slot: None} for term in counts})
+            ids, _, codes = self._slot_arrays
+            ids[slot] = -1
+            codes[slot] = -1
+            self._free_slots.append(slot)
+            self._rows.pop(faq_id, None)
+            self._total_length -= sum(counts.values())
+    
+    def _new_slot(self, faq_id: int) -> int:
+        """A freed slot or the next unused one, growing the slot arrays by doubling; caller holds _lock"""
+        if self._free_slots:
+            slot = self._free_slots.pop()
+        else:
+            slot = self._used_slots
+            self._used_slots += 1
+            if slot == len(self._slot_arrays[0]):
+                # New arrays rather than resizing: searches may hold the old ones
+                grown = self._new_slot_arrays(max(self.INITIAL_CAPACITY, 2 * slot))
+                for new, old in zip(grown, self._slot_arrays):
+                    new[:slot] = old
+                self._slot_arrays = grown
+        self._slot_arrays[0][slot] = faq_id
+        self._slots[faq_id] = slot
+        return slot
+    
+    def _publish(self, edits: Dict[str, Dict[int, Optional[int]]]):
+        """
+        Swap in new posting arrays for the edited terms; caller holds _lock
+        
+        Args:
+            edits: Per term, the new frequency of each edited slot (None removes it)
+        """
+        for term, changes in edits.items():
+            slots, frequencies = self._postings.get(term, (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)))
+            keep = ~np.isin(slots, np.fromiter(changes.keys(), dtype=np.int64, count=len(changes)))
+            added = {slot: count for slot, count in changes.items() if count is not None}
+            new_slots, new_frequencies = self._arrays(added)
+            slots = np.concatenate([slots[keep], new_slots])
+            if not len(slots):
+                self._postings.pop(term, None)
+                continue
+            # Ascending slots let a search trim those added after it started
+            order = np.argsort(slots, kind="stable")
+            self._postings[term] = (slots[order], np.concatenate([frequencies[keep], new_frequencies])[order])
+    
+    def search(self, query: str, top_k: int, min_score: float = 0.0, category: Optional[str] = None) -> List[Dict]:
+        """
+        Find the FAQs that best match a query's keywords
+        
+        Args:
+            query: User's question
+            top_k: Number of FAQs to consider
+            min_score: Only FAQs scoring at least this (0-1) are returned
+            category: Only return FAQs of this category
+        
+        Returns:
+            List of FAQ dictionaries with their normalized `lexical_score`, best first
+        """
+        self.searches += 1
+        ids, lengths, codes = self._slot_arrays
+        count = len(self._slots)
+        terms = set(self.tokenize(query))
+        code = None if category is None else self._categories.get(category)
+        if count == 0 or not terms or top_k <= 0 or (category is not None and code is None):
+            return []
+        
+        k1, b = self.k1, self.b
+        average_length = max(self._total_length / count, 1e-9)
+        scores = np.zeros(len(lengths), dtype=np.float32)
+        best_possible = 0.0
+        for term in terms:
+            slots, frequencies = self._postings.get(term, (None, None))
+            frequency = len(slots) if slots is not None else 0
+            idf = math.log(1 + (count - frequency + 0.5) / (frequency + 0.5))
+            best_possible += idf * (k1 + 1)
+            if not frequency:
+                continue
+            if slots[-1] >= len(lengths):
+                # Slots added after this search read the slot arrays
+                keep = np.searchsorted(slots, len(lengths))
+                slots, frequencies = slots[:keep], frequencies[:keep]
+            norms = k1 * (1 - b + b * lengths[slots] / average_length)
+            scores[slots] += idf * frequencies * (k1 + 1) / (frequencies + norms)
+        
+        if code is not None:
+            scores[codes != code] = 0
+        if len(scores) > top_k:
+            candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+        else:
+            candidates = np.arange(len(scores))
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        
+        results = []
+        for slot in candidates:
+            score = float(scores[slot]) / best_possible
+            if score <= 0 or score < min_score:
+                break
+            row = self._rows.get(int(ids[slot]))
+            if row is not None:
+                results.append({**row, "lexical_score": round(score, 4)})
+        return results
+    
+    def __len__(self) -> int:
+        return len(self._slots)
+    
+    def stats(self) -> Dict:
+        return {
+            "loaded": self.loaded,
+            "size": len(self),
+            "terms": len(self._postings),
+            "searches": self.searches
+        }
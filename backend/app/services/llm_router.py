@@ -0,0 +1,230 @@
+"""Latency-aware routing and failover across OpenAI-compatible LLM backends"""
+
+import json
+import time
+from typing import AsyncIterator, Dict, List, Optional
+from app.config import settings
+from app.services.llm_transport import LLMTransport, LLMTransportError
+
+
+class LLMBackend:
+    """One endpoint + model, with live EWMA latency and error-rate stats"""
+    
+    def __init__(self, name: str, base_url: str, api_key: str, model: str, max_retries: Optional[int] = None):
+        self.name = name
+        self.model = model
+        self.transport = LLMTransport(base_url, api_key, max_retries=max_retries)
+        
+        self.ewma_latency: Optional[float] = None  # seconds
+        self.ewma_error_rate = 0.0
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+        self.last_used = 0.0
+        self.in_flight = 0
+        self.last_sample = 0.0
+        self.calls = 0
+        self.failures = 0
+    
+    def record_success(self, latency: float):
+        alpha = settings.LLM_ROUTER_EWMA_ALPHA
+        now = time.monotonic()
+        self.calls += 1
+        self.consecutive_failures = 0
+        if self.ewma_latency is None or now - self.last_sample > settings.LLM_ROUTER_PROBE_INTERVAL:
+            # First sample, or stats too old to describe the backend now (a probe)
+            self.ewma_latency = latency
+            self.ewma_error_rate = 0.0
+        elif latency > self.ewma_latency:
+            # Peak-sensitive: slowdowns register at once, recoveries decay in
+            self.ewma_latency = latency
+            self.ewma_error_rate = (1 - alpha) * self.ewma_error_rate
+        else:
+            self.ewma_latency = alpha * latency + (1 - alpha) * self.ewma_latency
+            self.ewma_error_rate = (1 - alpha) * self.ewma_error_rate
+        self.last_sample = now
+    
+    def record_failure(self, latency: float):
+        alpha = settings.LLM_ROUTER_EWMA_ALPHA
+        self.calls += 1
+        self.failures += 1
+        self.last_sample = time.monotonic()
+        self.consecutive_failures += 1
+        self.ewma_error_rate = alpha + (1 - alpha) * self.ewma_error_rate
+        # A failure costs at least as much as the time it took
+        if self.ewma_latency is None or latency > self.ewma_latency:
+            self.ewma_latency = latency
+        if self.consecutive_failures >= settings.LLM_ROUTER_FAILURE_THRESHOLD:
+            self.cooldown_until = time.monotonic() + settings.LLM_ROUTER_COOLDOWN_SECONDS
+    
+    def healthy(self, now: float) -> bool:
+        return now >= self.cooldown_until
+    
+    def expected_latency(self) -> float:
+        """
+        Peak EWMA latency, inflated by the chance of having to fail over and
+        by the calls already queued on this backend
+        """
+        if self.ewma_latency is None:
+            return 0.0  # Unmeasured backends are tried first
+        return self.ewma_latency / (1.0 - min(self.ewma_error_rate, 0.9)) * (self.in_flight + 1)
+    
+    def stats(self) -> Dict:
+        now = time.monotonic()
+        return {
+            "name": self.name,
+            "model": self.model,
+            "healthy": self.healthy(now),
+            "ewma_latency_ms": round(self.ewma_latency * 1000, 1) if self.ewma_latency is not None else None,
+            "ewma_error_rate": round(self.ewma_error_rate, 4),
+            "in_flight": self.in_flight,
+            "calls": self.calls,
+            "failures": self.failures,
+            "transport": self.transport.stats()
+        }
+
+
+class LLMRouter:
+    """
+    Sends each call to the fastest healthy backend and fails over on errors
+    
+    Backends are ranked by peak EWMA latency, inflated by their EWMA error
+    rate and the number of calls they already have in flight.
+    A backend that fails LLM_ROUTER_FAILURE_THRESHOLD times in a row is
+    skipped for LLM_ROUTER_COOLDOWN_SECONDS. A backend that has not been
+    used for LLM_ROUTER_PROBE_INTERVAL seconds gets the next call, so its
+    stats can recover after an incident. A failed call moves on to the next
+    backend within the same request. Streams fail over only before the
+    first token.
+    """
+    
+    def __init__(self, backends: List[LLMBackend]):
+        if not backends:
+            raise ValueError("LLMRouter needs at least one backend")
+        self.backends = backends
+        self.failovers = 0
+    
+    @classmethod
+    def from_settings(cls) -> "LLMRouter":
+        """
+        Build backends from LLM_BACKENDS, or the single GROQ_* endpoint if unset
+        
+        LLM_BACKENDS is a JSON list of objects with base_url and model, and
+        optionally name and api_key (default GROQ_API_KEY).
+        """
+        if not settings.LLM_BACKENDS:
+            return cls([LLMBackend("groq", settings.GROQ_BASE_URL, settings.GROQ_API_KEY, settings.GROQ_MODEL)])
+        
+        configs = json.loads(settings.LLM_BACKENDS)
+        # With several backends a failing one is better skipped than retried
+        max_retries = settings.LLM_ROUTER_BACKEND_RETRIES if len(configs) > 1 else None
+        return cls([
+            LLMBackend(
+                config.get("name") or config["base_url"],
+                config["base_url"],
+                config.get("api_key") or settings.GROQ_API_KEY,
+                config["model"],
+                max_retries=max_retries
+            )
+            for config in configs
+        ])
+    
+    def ranked_backends(self) -> List[LLMBackend]:
+        """Backends in the order a call should try them"""
+        now = time.monotonic()
+        healthy = [b for b in self.backends if b.healthy(now)]
+        cooling = sorted((b for b in self.backends if not b.healthy(now)), key=lambda b: b.cooldown_until)
+        
+        stale = [b for b in healthy if b.ewma_latency is not None and now - b.last_used > settings.LLM_ROUTER_PROBE_INTERVAL]
+        ranked = sorted(healthy, key=lambda b: b.expected_latency())
+        if stale:
+            ranked.remove(stale[0])
+            ranked.insert(0, stale[0])
+        
+        # Backends in cooldown are a last resort, not excluded
+        return ranked + cooling
+    
+    async def chat_completion(self, payload: Dict, timeout: Optional[float] = None) -> Dict:
+        """
+        Run a non-streaming chat completion on the best available backend
+        
+        Args:
+            payload: OpenAI-format request body; the model is set per backend
+            timeout: Per-attempt timeout in seconds
+        
+        Returns:
+            Parsed JSON response
+        """
+        last_error = None
+        for attempt, backend in enumerate(self.ranked_backends()):
+            if attempt:
+                self.failovers += 1
+            backend.last_used = time.monotonic()
+            backend.in_flight += 1
+            start = time.perf_counter()
+            try:
+                response = await backend.transport.chat_completion({**payload, "model": backend.model}, timeout)
+            except LLMTransportError as e:
+                backend.record_failure(time.perf_counter() - start)
+                print(f"⚠️  LLM backend {backend.name} failed: {e}")
+                last_error = e
+                continue
+            finally:
+                backend.in_flight -= 1
+            backend.record_success(time.perf_counter() - start)
+            return response
+        
+        raise last_error
+    
+    async def stream_chat_completion(self, payload: Dict, timeout: Optional[float] = None) -> AsyncIterator[str]:
+        """
+        Stream a chat completion from the best available backend
+        
+        Fails over to the next backend only while nothing has been yielded.
+        
+        Args:
+            payload: OpenAI-format request body; the model is set per backend
+            timeout: Per-read timeout in seconds
+        
+        Yields:
+            Response text fragments
+        """
+        last_error = None
+        for attempt, backend in enumerate(self.ranked_backends()):
+            if attempt:
+                self.failovers += 1
+            backend.last_used = time.monotonic()
+            backend.in_flight += 1
+            start = time.perf_counter()
+            yielded = False
+            try:
+                async for token in backend.transport.stream_chat_completion({**payload, "model": backend.model}, timeout):
+                    if not yielded:
+                        # Time to first token is what the user waits for
+                        backend.record_success(time.perf_counter() - start)
+                        yielded = True
+                    yield token
+                if not yielded:
+                    backend.record_success(time.perf_counter() - start)
+                return
+            except LLMTransportError as e:
+                if yielded:
+                    raise
+                backend.record_failure(time.perf_counter() - start)
+                print(f"⚠️  LLM backend {backend.name} failed: {e}")
+                last_error = e
+            finally:
+                backend.in_flight -= 1
+        
+        raise last_error
+    
+    def stats(self) -> Dict:
+        """Per-backend routing stats"""
+        return {
+            "failovers": self.failovers,
+            "backends": [backend.stats() for backend in self.backends]
+        }
+    
+    async def aclose(self):
+        """Close every backend's pooled connections"""
+        for backend in self.backends:
+            await backend.transport.aclose()
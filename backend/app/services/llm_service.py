@@ -1,46 +1,186 @@
 """Groq API integration for LLM responses"""
 
-from groq import Groq
 from app.config import settings
-from typing import List, Dict, Tuple
+from app.services.llm_router import LLMRouter
+from app.services.admission import llm_admission, LLMUnavailableError
+from typing import List, Dict, Tuple, AsyncIterator, Optional
+import asyncio
+import hashlib
+import json
 import re
 
 
+# Returned by summarize_conversation when no summary could be produced
+SUMMARY_UNAVAILABLE = "Summary unavailable"
+
+
 class LLMService:
-    """Service for interacting with Groq API"""
+    """Service for interacting with Groq API (or any OpenAI-compatible backends)"""
     
     def __init__(self):
-        self.client = Groq(api_key=settings.GROQ_API_KEY)
+        # Built on first use (or warm_up): backends open pooled HTTP clients
+        self._router: Optional[LLMRouter] = None
         self.model = settings.GROQ_MODEL
     
-    def generate_response(self, messages: List[Dict[str, str]]) -> Tuple[str, float]:
+        # Single-flight: identical in-flight requests share one upstream call
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._waiters: Dict[str, int] = {}
+        self.requests = 0
+        self.upstream_calls = 0
+        self.coalesced_calls = 0
+    
+    @property
+    def router(self) -> LLMRouter:
+        """The backend router, built from settings on first access"""
+        if self._router is None:
+            self._router = LLMRouter.from_settings()
+        return self._router
+    
+    def warm_up(self):
+        """Build the router and its HTTP clients before the first request"""
+        self.router
+    
+    def _request_key(self, messages: List[Dict[str, str]]) -> str:
+        """Hash everything that determines the completion"""
+        payload = json.dumps(
+            [self.model, settings.TEMPERATURE, settings.MAX_TOKENS, messages],
+            sort_keys=True,
+            ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    async def generate_response(self, messages: List[Dict[str, str]]) -> Tuple[str, float]:
         """
         Generate a response using Groq API
         
+        Concurrent calls with an identical message list are coalesced: the
+        first caller starts the upstream request and the others await the
+        same result. The shared call is shielded, so a cancelled caller does
+        not cancel it for the rest; once every caller has given up (e.g. on
+        a deadline) the upstream call itself is cancelled and forgotten, so
+        a later identical call starts a fresh one. A caller only sees
+        CancelledError when it was cancelled itself.
+        
         Args:
             messages: List of messages in OpenAI format
-            
+        
         Returns:
             Tuple of (response_text, confidence_score)
+        
+        Raises:
+            LLMUnavailableError: The call was rejected by admission control or
+                failed upstream; the caller should send a degraded reply
         """
+        self.requests += 1
+        key = self._request_key(messages)
+        
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced_calls += 1
+        else:
+            self.upstream_calls += 1
+            task = asyncio.ensure_future(self._generate_response(messages))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget_inflight(key, done))
+        
+        self._waiters[key] = self._waiters.get(key, 0) + 1
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                temperature=settings.TEMPERATURE,
-                max_tokens=settings.MAX_TOKENS,
-                top_p=1,
-                stream=False
-            )
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if task.cancelled() and not asyncio.current_task().cancelling():
+                # The shared call was cancelled, not this caller
+                raise LLMUnavailableError("LLM call was cancelled") from None
+            raise
+        finally:
+            self._waiters[key] -= 1
+            if not self._waiters[key]:
+                del self._waiters[key]
+                if not task.done():
+                    # The last caller gave up; stop the upstream call and
+                    # let new callers start their own
+                    self._forget_inflight(key, task)
+                    task.cancel()
+    
+    def _forget_inflight(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the error as retrieved even if every waiter went away
+        if task.done() and not task.cancelled():
+            task.exception()
+    
+    def stats(self) -> Dict:
+        """Request coalescing, admission and routing counters"""
+        return {
+            "requests": self.requests,
+            "upstream_calls": self.upstream_calls,
+            "coalesced_calls": self.coalesced_calls,
+            "in_flight": len(self._inflight),
+            "admission": llm_admission.stats(),
+            "router": self._router.stats() if self._router else None
+        }
+    
+    async def aclose(self):
+        """Close pooled backend connections"""
+        if self._router:
+            await self._router.aclose()
+    
+    async def _generate_response(self, messages: List[Dict[str, str]]) -> Tuple[str, float]:
+        """
+        Call Groq API once for a message list
+        
+        Args:
+            messages: List of messages in OpenAI format
             
-            response_text = response.choices[0].message.content
-            confidence_score = self._calculate_confidence(response_text)
+        Returns:
+            Tuple of (response_text, confidence_score)
+        """
+        async with llm_admission.slot():
+            try:
+                response = await self.router.chat_completion({
+                    "model": self.model,
+                    "messages": messages,
+                    "temperature": settings.TEMPERATURE,
+                    "max_tokens": settings.MAX_TOKENS,
+                    "top_p": 1,
+                    "stream": False
+                })
+                response_text = response["choices"][0]["message"]["content"]
+            except Exception as e:
+                print(f"Error calling Groq API: {e}")
+                raise LLMUnavailableError(f"LLM call failed: {e}") from e
             
-            return response_text, confidence_score
+        confidence_score = self._calculate_confidence(response_text)
             
-        except Exception as e:
-            print(f"Error calling Groq API: {e}")
-            return f"I apologize, but I'm having trouble processing your request right now. Please try again or contact support at support@example.com", 0.0
+        return response_text, confidence_score
+    
+    async def stream_response(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        """
+        Stream a response from Groq API token by token
+        
+        Errors are raised to the caller, which decides how to end the stream;
+        LLMUnavailableError means admission control rejected the call before
+        anything was sent.
+        Confidence is not computed here because it needs the full text;
+        score the joined tokens once the stream ends (see confidence.py).
+        
+        Args:
+            messages: List of messages in OpenAI format
+        
+        Yields:
+            Response text fragments as they arrive
+        """
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "temperature": settings.TEMPERATURE,
+            "max_tokens": settings.MAX_TOKENS,
+            "top_p": 1
+        }
+        
+        async with llm_admission.slot() as ticket:
+            async for token in self.router.stream_chat_completion(payload):
+                ticket.first_token()
+                yield token
     
     def _calculate_confidence(self, response: str) -> float:
         """
@@ -52,17 +192,10 @@ class LLMService:
         Returns:
             Confidence score between 0 and 1
         """
-        from app.utils.prompts import LOW_CONFIDENCE_PHRASES
-        
-        response_lower = response.lower()
+        from app.utils.prompts import LOW_CONFIDENCE_MATCHER
         
         # Check for low confidence phrases
-        low_confidence_count = sum(
-            1 for phrase in LOW_CONFIDENCE_PHRASES 
-            if phrase in response_lower
-        )
-        
-        if low_confidence_count > 0:
+        if LOW_CONFIDENCE_MATCHER.contains(response):
             return 0.3  # Low confidence if uncertain phrases detected
         
         # Check response length (very short responses might be uncertain)
@@ -77,7 +210,7 @@ class LLMService:
         # Default to relatively high confidence
         return 0.85
     
-    def summarize_conversation(self, conversation_text: str) -> str:
+    async def summarize_conversation(self, conversation_text: str) -> str:
         """
         Summarize a conversation
         
@@ -88,20 +221,21 @@ class LLMService:
             Summary string
         """
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "user", "content": conversation_text}
-                ],
-                temperature=0.5,
-                max_tokens=150,
-            )
+            async with llm_admission.slot():
+                response = await self.router.chat_completion({
+                    "model": self.model,
+                    "messages": [
+                        {"role": "user", "content": conversation_text}
+                    ],
+                    "temperature": 0.5,
+                    "max_tokens": settings.SUMMARY_MAX_TOKENS,
+                })
             
-            return response.choices[0].message.content.strip()
+            return response["choices"][0]["message"]["content"].strip()
             
         except Exception as e:
             print(f"Error summarizing conversation: {e}")
-            return "Summary unavailable"
+            return SUMMARY_UNAVAILABLE
 
 
 # Global instance
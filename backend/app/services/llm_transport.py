@@ -0,0 +1,239 @@
+"""Pooled HTTP transport for OpenAI-compatible chat completion APIs"""
+
+import asyncio
+import json
+import random
+import time
+from collections import deque
+from typing import AsyncIterator, Dict, Optional
+import httpx
+from app.config import settings
+
+
+class LLMTransportError(Exception):
+    """Raised when a chat completion fails after all retries"""
+    
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class LLMTransport:
+    """
+    Keep-alive HTTP client for one OpenAI-compatible endpoint
+    
+    - One pooled httpx.AsyncClient (HTTP/2 when enabled) per endpoint
+    - Jittered exponential retries on connection errors, 429 and 5xx
+    - Optional hedged request once the primary exceeds the recent p95
+    - Per-call timeouts layered over the pool defaults
+    """
+    
+    RETRY_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+    
+    def __init__(self, base_url: str, api_key: str, max_retries: Optional[int] = None):
+        self.base_url = base_url.rstrip("/")
+        self.max_retries = settings.LLM_MAX_RETRIES if max_retries is None else max_retries
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            http2=settings.LLM_HTTP2,
+            headers={"Authorization": f"Bearer {api_key}"},
+            limits=httpx.Limits(
+                max_connections=settings.LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.LLM_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.LLM_KEEPALIVE_EXPIRY
+            ),
+            timeout=httpx.Timeout(settings.LLM_REQUEST_TIMEOUT, connect=settings.LLM_CONNECT_TIMEOUT)
+        )
+        
+        # Recent successful call latencies (seconds), for the hedge delay
+        self._latencies: deque = deque(maxlen=200)
+        
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+    
+    def _backoff_delay(self, attempt: int, response: Optional[httpx.Response] = None) -> float:
+        """Full-jitter exponential backoff, honouring Retry-After when given"""
+        if response is not None:
+            retry_after = response.headers.get("retry-after")
+            if retry_after:
+                try:
+                    return min(float(retry_after), settings.LLM_RETRY_MAX_DELAY)
+                except ValueError:
+                    pass
+        ceiling = min(settings.LLM_RETRY_MAX_DELAY, settings.LLM_RETRY_BASE_DELAY * (2 ** attempt))
+        return random.uniform(0, ceiling)
+    
+    def _timeout(self, timeout: Optional[float]) -> httpx.Timeout:
+        if timeout is None:
+            timeout = settings.LLM_REQUEST_TIMEOUT
+        return httpx.Timeout(timeout, connect=min(timeout, settings.LLM_CONNECT_TIMEOUT))
+    
+    def latency_percentile(self, percentile: float) -> Optional[float]:
+        """Latency (seconds) at the given percentile of recent successful calls"""
+        if not self._latencies:
+            return None
+        ordered = sorted(self._latencies)
+        index = min(len(ordered) - 1, int(round(percentile / 100 * (len(ordered) - 1))))
+        return ordered[index]
+    
+    async def _post(self, payload: Dict, timeout: Optional[float]) -> Dict:
+        """One POST with retries; raises LLMTransportError when retries run out"""
+        last_error = None
+        
+        for attempt in range(self.max_retries + 1):
+            response = None
+            try:
+                start = time.perf_counter()
+                response = await self.client.post(
+                    "/chat/completions", json=payload, timeout=self._timeout(timeout)
+                )
+                if response.status_code < 400:
+                    self._latencies.append(time.perf_counter() - start)
+                    return response.json()
+                
+                last_error = LLMTransportError(
+                    f"HTTP {response.status_code}: {response.text[:200]}", response.status_code
+                )
+                if response.status_code not in self.RETRY_STATUS_CODES:
+                    break
+            except (httpx.TransportError, httpx.TimeoutException) as e:
+                last_error = LLMTransportError(f"{type(e).__name__}: {e}")
+            
+            if attempt < self.max_retries:
+                self.retries += 1
+                await asyncio.sleep(self._backoff_delay(attempt, response))
+        
+        raise last_error
+    
+    async def chat_completion(self, payload: Dict, timeout: Optional[float] = None) -> Dict:
+        """
+        Run a non-streaming chat completion
+        
+        With LLM_HEDGE_ENABLED a second identical request is sent if the
+        first has not answered after max(LLM_HEDGE_MIN_DELAY, recent p95);
+        whichever finishes first wins and the other is cancelled.
+        
+        Args:
+            payload: OpenAI-format request body
+            timeout: Per-call timeout in seconds (default LLM_REQUEST_TIMEOUT)
+        
+        Returns:
+            Parsed JSON response
+        """
+        self.requests += 1
+        try:
+            if not settings.LLM_HEDGE_ENABLED:
+                return await self._post(payload, timeout)
+            return await self._hedged_post(payload, timeout)
+        except LLMTransportError:
+            self.failures += 1
+            raise
+    
+    async def _hedged_post(self, payload: Dict, timeout: Optional[float]) -> Dict:
+        p95 = self.latency_percentile(95)
+        hedge_delay = max(settings.LLM_HEDGE_MIN_DELAY, p95 or 0.0)
+        
+        primary = asyncio.ensure_future(self._post(payload, timeout))
+        hedge = None
+        tasks = {primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+            if not done:
+                self.hedges += 1
+                hedge = asyncio.ensure_future(self._post(payload, timeout))
+                tasks.add(hedge)
+            
+            # First success wins; fail only if every attempt failed
+            pending = set(tasks)
+            last_error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.hedge_wins += 1
+                        return task.result()
+                    last_error = task.exception()
+            raise last_error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+    
+    async def stream_chat_completion(self, payload: Dict, timeout: Optional[float] = None) -> AsyncIterator[str]:
+        """
+        Run a streaming chat completion and yield content deltas
+        
+        Retries apply only until the first byte of a successful response;
+        after that a failure is raised to the caller.
+        
+        Args:
+            payload: OpenAI-format request body (stream is forced on)
+            timeout: Per-read timeout in seconds (default LLM_REQUEST_TIMEOUT)
+        
+        Yields:
+            Response text fragments
+        """
+        self.requests += 1
+        payload = {**payload, "stream": True}
+        yielded = False
+        
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with self.client.stream(
+                    "POST", "/chat/completions", json=payload, timeout=self._timeout(timeout)
+                ) as response:
+                    if response.status_code >= 400:
+                        body = (await response.aread()).decode("utf-8", "replace")
+                        error = LLMTransportError(f"HTTP {response.status_code}: {body[:200]}", response.status_code)
+                        if response.status_code not in self.RETRY_STATUS_CODES or attempt == self.max_retries:
+                            raise error
+                        self.retries += 1
+                        await asyncio.sleep(self._backoff_delay(attempt, response))
+                        continue
+                    
+                    async for line in response.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        data = line[len("data:"):].strip()
+                        if data == "[DONE]":
+                            break
+                        chunk = json.loads(data)
+                        if not chunk.get("choices"):
+                            continue
+                        content = chunk["choices"][0].get("delta", {}).get("content")
+                        if content:
+                            yielded = True
+                            yield content
+                    return
+            except (httpx.TransportError, httpx.TimeoutException) as e:
+                if yielded or attempt == self.max_retries:
+                    self.failures += 1
+                    raise LLMTransportError(f"{type(e).__name__}: {e}")
+                self.retries += 1
+                await asyncio.sleep(self._backoff_delay(attempt))
+            except LLMTransportError:
+                self.failures += 1
+                raise
+    
+    def stats(self) -> Dict:
+        """Retry, hedge and latency counters"""
+        p50 = self.latency_percentile(50)
+        p95 = self.latency_percentile(95)
+        return {
+            "base_url": self.base_url,
+            "requests": self.requests,
+            "retries": self.retries,
+            "failures": self.failures,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None
+        }
+    
+    async def aclose(self):
+        """Close pooled connections"""
+        await self.client.aclose()
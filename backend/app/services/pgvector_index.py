@@ -0,0 +1,269 @@
+"""pgvector ANN index on faqs.embedding (HNSW or IVFFlat) and its query-time tuning"""
+
+import hashlib
+import math
+import re
+import time
+from typing import Dict, List, Optional, Set, Tuple
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+
+
+class PGVectorIndex:
+    """
+    Creates, replaces and tunes the approximate nearest-neighbour index
+    
+    The index is partial (`WHERE embedding IS NOT NULL`), matching the
+    filter of the FAQ search query, so the planner can use it for
+    `ORDER BY embedding <=> :q LIMIT k` and FAQs not embedded yet take no
+    space in it. Its build options are recorded in the index comment;
+    ensure() rebuilds it when they no longer match the settings, and drops
+    indexes of the other kind when PGVECTOR_INDEX changes. Builds run
+    CONCURRENTLY, so searches and FAQ edits continue meanwhile.
+    
+    Query-time recall is set per search transaction with set_config(...,
+    true) (the SET LOCAL equivalent), which also works through a
+    transaction-mode connection pooler.
+    
+    Categories with at least PGVECTOR_CATEGORY_INDEX_MIN_ROWS embedded FAQs
+    also get their own partial index (`AND category = '...'`), so a search
+    filtered to one of them walks only that partition's graph or lists;
+    smaller categories are scanned exactly through a btree on category.
+    
+    ensure() holds an advisory lock per table while it works: a concurrent
+    build shows its index as invalid, and a second worker starting at the
+    same time would otherwise drop it and start over. refresh() only reads
+    which indexes exist, for workers that leave the DDL to the scripts.
+    """
+    
+    KINDS = ("hnsw", "ivfflat", "none")
+    LOCK_POLL_SECONDS = 2.0
+    
+    def __init__(self, table: str = "faqs", kind: str = None):
+        self.table = table
+        self.kind = settings.PGVECTOR_INDEX if kind is None else kind
+        if self.kind not in self.KINDS:
+            raise ValueError(f"PGVECTOR_INDEX must be one of {self.KINDS}, got {self.kind!r}")
+        
+        # Index names live in the table's schema
+        schema, _, base = table.rpartition(".")
+        self._schema_prefix = f"{schema}." if schema else ""
+        self._base = base
+    
+        # Categories with a valid partial index, as of the last ensure() or refresh()
+        self.category_indexes: Set[str] = set()
+        
+        # Advisory lock key serializing ensure() across processes
+        self.lock_key = int.from_bytes(hashlib.md5(f"pgvector_index:{table}".encode("utf-8")).digest()[:8], "big", signed=True)
+    
+    def index_name(self, kind: str, category: Optional[str] = None) -> str:
+        if category is None:
+            return f"{self._base}_embedding_{kind}_idx"
+        # Readable and unique, within the 63-byte identifier limit
+        prefix = f"{self._base}_embedding_{kind}_cat_"
+        slug = re.sub(r"[^a-z0-9]+", "_", category.lower()).strip("_")[:max(0, 63 - len(prefix) - 13)]
+        return f"{prefix}{slug}_{hashlib.md5(category.encode('utf-8')).hexdigest()[:8]}_idx"
+    
+    @staticmethod
+    def quote(value: str) -> str:
+        """SQL string literal (standard_conforming_strings)"""
+        return "'" + value.replace("'", "''") + "'"
+    
+    def category_predicate(self, category: str) -> str:
+        """
+        Filter of a category partition, written out as a literal
+        
+        The planner only uses a partial index whose predicate the query
+        implies at plan time, which a bound parameter can't guarantee once
+        the statement is prepared with a generic plan.
+        """
+        return f"category = {self.quote(category)}"
+    
+    @staticmethod
+    def auto_lists(rows: int) -> int:
+        """pgvector's guidance: rows / 1000 up to 1M rows, sqrt(rows) beyond"""
+        lists = rows // 1000 if rows <= 1_000_000 else int(math.sqrt(rows))
+        return max(10, lists)
+    
+    def signature(self, category: Optional[str] = None) -> str:
+        """Build options as configured (and the partition's category), stored as the index comment"""
+        if self.kind == "hnsw":
+            options = f"m={settings.PGVECTOR_HNSW_M},ef_construction={settings.PGVECTOR_HNSW_EF_CONSTRUCTION}"
+        elif self.kind == "ivfflat":
+            options = f"lists={settings.PGVECTOR_IVFFLAT_LISTS or 'auto'}"
+        else:
+            return ""
+        return options if category is None else f"{options};category={category}"
+    
+    def create_sql(self, rows: int, category: Optional[str] = None) -> str:
+        """CREATE INDEX statement for the configured kind, given the embedded row count (of the category)"""
+        if self.kind == "hnsw":
+            options = f"m = {settings.PGVECTOR_HNSW_M}, ef_construction = {settings.PGVECTOR_HNSW_EF_CONSTRUCTION}"
+        else:
+            options = f"lists = {settings.PGVECTOR_IVFFLAT_LISTS or self.auto_lists(rows)}"
+        predicate = "embedding IS NOT NULL"
+        if category is not None:
+            predicate += f" AND {self.category_predicate(category)}"
+        return (
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {self.index_name(self.kind, category)} ON {self.table} "
+            f"USING {self.kind} (embedding vector_cosine_ops) WITH ({options}) "
+            f"WHERE {predicate}"
+        )
+    
+    def query_settings(self, top_k: int) -> List[Tuple[str, str]]:
+        """(parameter, value) pairs to set for one search"""
+        if self.kind == "hnsw":
+            # An HNSW scan returns at most ef_search rows
+            return [("hnsw.ef_search", str(max(settings.PGVECTOR_HNSW_EF_SEARCH, top_k)))]
+        if self.kind == "ivfflat":
+            return [("ivfflat.probes", str(settings.PGVECTOR_IVFFLAT_PROBES))]
+        return []
+    
+    async def apply_query_settings(self, db: AsyncSession, top_k: int):
+        """Set the recall knobs for the rest of the current transaction"""
+        for name, value in self.query_settings(top_k):
+            await db.execute(text("SELECT set_config(:name, :value, true)"), {"name": name, "value": value})
+    
+    def ensure(self, engine: Engine, rebuild: bool = False, maintenance_work_mem: Optional[str] = None) -> Dict:
+        """
+        Bring the indexes in line with the settings
+        
+        Drops invalid indexes (a failed concurrent build), indexes of the
+        other kind or of categories below the size threshold and, on
+        rebuild or changed options, the current ones; then creates the
+        configured indexes that are missing, and the btree on category. An
+        IVFFlat index is not built on an empty table, since its lists are
+        trained on the rows present at build time (rebuild after large loads).
+        
+        Args:
+            engine: Sync engine (DDL runs in autocommit mode)
+            rebuild: Rebuild the indexes even if their options are unchanged
+            maintenance_work_mem: Memory for the build (e.g. "1GB"); HNSW
+                builds are much faster when the graph fits
+        
+        Returns:
+            Dict with the index name (None for "none"), whether any index was
+            built, the build seconds, the number of embedded rows and the
+            categories with their own index
+        """
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            self._lock(conn)
+            try:
+                return self._ensure(conn, rebuild, maintenance_work_mem)
+            finally:
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": self.lock_key})
+    
+    def _lock(self, conn):
+        """
+        Take the ensure() advisory lock, waiting while another process holds it
+        
+        Polled with pg_try_advisory_lock rather than blocking in
+        pg_advisory_lock: a waiting statement holds a snapshot, which the
+        other process's CREATE INDEX CONCURRENTLY would in turn wait for.
+        """
+        waiting = False
+        while not conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": self.lock_key}).scalar():
+            if not waiting:
+                print("⏳ Another process is updating the vector indexes; waiting for it")
+                waiting = True
+            time.sleep(self.LOCK_POLL_SECONDS)
+    
+    def _existing(self, conn) -> list:
+        """(relname, indisvalid, options comment, building) of this table's vector indexes"""
+        return conn.execute(text("""
+            SELECT c.relname, i.indisvalid, obj_description(c.oid, 'pg_class') AS options,
+                   EXISTS (SELECT 1 FROM pg_stat_progress_create_index p WHERE p.index_relid = c.oid) AS building
+            FROM pg_index i
+            JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE i.indrelid = CAST(:table AS regclass) AND c.relname LIKE :pattern
+        """), {"table": self.table, "pattern": f"{self._base}_embedding_%_idx"}).fetchall()
+    
+    def refresh(self, engine: Engine) -> Set[str]:
+        """
+        Read which categories have a valid index as configured, without any DDL
+        
+        Returns:
+            The categories with their own index (also kept in category_indexes)
+        """
+        categories = set()
+        if self.kind != "none":
+            prefix = f"{self.signature()};category="
+            with engine.connect() as conn:
+                for index in self._existing(conn):
+                    if not index.indisvalid or not (index.options or "").startswith(prefix):
+                        continue
+                    category = index.options[len(prefix):]
+                    if index.relname == self.index_name(self.kind, category):
+                        categories.add(category)
+        self.category_indexes = categories
+        return categories
+    
+    def _ensure(self, conn, rebuild: bool, maintenance_work_mem: Optional[str]) -> Dict:
+        """ensure() with the advisory lock held on conn (autocommit)"""
+        existing = self._existing(conn)
+        rows = conn.execute(text(f"SELECT count(*) FROM {self.table} WHERE embedding IS NOT NULL")).scalar()
+        
+        # Index name -> (comment, category, rows it covers)
+        wanted: Dict[str, Tuple[str, Optional[str], int]] = {}
+        if self.kind != "none":
+            wanted[self.index_name(self.kind)] = (self.signature(), None, rows)
+            if settings.PGVECTOR_CATEGORY_INDEX_MIN_ROWS > 0:
+                partitions = conn.execute(text(f"""
+                    SELECT category, count(*) FROM {self.table}
+                    WHERE embedding IS NOT NULL AND category IS NOT NULL
+                    GROUP BY category HAVING count(*) >= :min_rows
+                """), {"min_rows": settings.PGVECTOR_CATEGORY_INDEX_MIN_ROWS}).fetchall()
+                for category, count in partitions:
+                    wanted[self.index_name(self.kind, category)] = (self.signature(category), category, count)
+        
+        present, building = set(), set()
+        for index in existing:
+            spec = wanted.get(index.relname)
+            if spec and index.indisvalid and index.options == spec[0] and not rebuild:
+                present.add(index.relname)
+                continue
+            if index.building:
+                # Invalid until a session outside the lock finishes it; left alone
+                print(f"⏳ Vector index {index.relname} is still being built elsewhere; skipping it")
+                building.add(index.relname)
+                continue
+            conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {self._schema_prefix}{index.relname}"))
+            print(f"🗑️  Dropped vector index {index.relname}")
+        
+        # Filtered searches of small categories read their partition through it
+        conn.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {self._base}_category_idx ON {self.table} (category)"))
+        
+        main = None if self.kind == "none" else self.index_name(self.kind)
+        result = {"index": main, "built": False, "seconds": 0.0, "rows": rows, "category_indexes": []}
+        if maintenance_work_mem and len(present) + len(building) < len(wanted):
+            conn.execute(text("SELECT set_config('maintenance_work_mem', :value, false)"), {"value": maintenance_work_mem})
+        
+        categories = set()
+        for name, (comment, category, count) in wanted.items():
+            if name in building:
+                continue
+            if name not in present:
+                if self.kind == "ivfflat" and count == 0:
+                    print("ℹ️  IVFFlat index not built yet: no embedded FAQs to train its lists on")
+                    result["index"] = None
+                    continue
+                label = "" if category is None else f" for category {category!r}"
+                print(f"🔄 Building {self.kind} vector index{label} on {count} embeddings...")
+                start = time.perf_counter()
+                conn.execute(text(self.create_sql(count, category)))
+                conn.execute(text(f"COMMENT ON INDEX {self._schema_prefix}{name} IS {self.quote(comment)}"))
+                seconds = time.perf_counter() - start
+                result.update(built=True, seconds=round(result["seconds"] + seconds, 2))
+                print(f"✅ Built vector index {name} in {seconds:.1f}s")
+            if category is not None:
+                categories.add(category)
+        
+        self.category_indexes = categories
+        result["category_indexes"] = sorted(categories)
+        return result
+
+
+# Global instance
+pgvector_index = PGVectorIndex()
@@ -0,0 +1,199 @@
+"""Semantic cache of LLM responses for first-turn questions"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from app.config import settings
+
+
+class ResponseCache:
+    """
+    Caches LLM answers keyed on the query embedding
+    
+    A lookup hits when a stored query lies within `max_distance` (cosine
+    distance) of the new one and the same FAQs were retrieved for it. Only
+    first-turn questions are cached, since with history the answer depends
+    on more than the question. Entries are evicted LRU-first once the entry
+    count or byte cap is exceeded, and expire after `ttl_seconds`.
+    
+    Lookups and stores run on the event loop while invalidate() is called
+    from the FAQ endpoints in the threadpool, so every method holds a lock.
+    """
+    
+    def __init__(
+        self,
+        max_distance: float = None,
+        max_entries: int = None,
+        max_bytes: int = None,
+        ttl_seconds: int = None,
+        enabled: bool = None
+    ):
+        self.max_distance = settings.RESPONSE_CACHE_MAX_DISTANCE if max_distance is None else max_distance
+        self.max_entries = settings.RESPONSE_CACHE_MAX_ENTRIES if max_entries is None else max_entries
+        self.max_bytes = settings.RESPONSE_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self.ttl_seconds = settings.RESPONSE_CACHE_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self.enabled = settings.RESPONSE_CACHE_ENABLED if enabled is None else enabled
+        
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[int, Dict]" = OrderedDict()
+        self._next_key = 0
+        self._bytes = 0
+        
+        # Bumped on invalidation so answers computed before an FAQ change
+        # are not stored after it
+        self.generation = 0
+        
+        # Stacked vectors of all entries, rebuilt lazily after changes
+        self._matrix: Optional[np.ndarray] = None
+        self._matrix_keys: List[int] = []
+        
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+    
+    @staticmethod
+    def _normalize(vector: np.ndarray) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+    
+    def _rebuild_matrix(self):
+        """Caller holds _lock"""
+        self._matrix_keys = list(self._entries.keys())
+        if self._matrix_keys:
+            self._matrix = np.stack([self._entries[key]["vector"] for key in self._matrix_keys])
+        else:
+            self._matrix = None
+    
+    def _remove(self, key: int):
+        """Caller holds _lock"""
+        entry = self._entries.pop(key)
+        self._bytes -= entry["nbytes"]
+        self._matrix = None
+    
+    def lookup(self, query_embedding: np.ndarray, faq_ids: List[int]) -> Optional[Tuple[str, float]]:
+        """
+        Find a cached answer for a near-identical question
+        
+        Args:
+            query_embedding: Query vector
+            faq_ids: IDs of the FAQs retrieved for this query
+        
+        Returns:
+            (response_text, confidence_score) on a hit, otherwise None
+        """
+        if not self.enabled:
+            return None
+        
+        query = self._normalize(query_embedding)
+        faq_key = tuple(faq_ids)
+        with self._lock:
+            if self._entries and self._matrix is None:
+                self._rebuild_matrix()
+            if self._matrix is None:
+                self.misses += 1
+                return None
+            
+            similarities = self._matrix @ query
+            matrix_keys = self._matrix_keys
+            now = time.monotonic()
+            
+            # Best candidate first; stop at the first one that is fresh and
+            # was answered from the same FAQs
+            for index in np.argsort(-similarities):
+                if 1.0 - float(similarities[index]) > self.max_distance:
+                    break
+                key = matrix_keys[index]
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                if entry["expires_at"] <= now:
+                    self._remove(key)
+                    continue
+                if entry["faq_ids"] != faq_key:
+                    continue
+                
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry["response"], entry["confidence"]
+            
+            self.misses += 1
+            return None
+    
+    def store(
+        self,
+        query_embedding: np.ndarray,
+        faq_ids: List[int],
+        response_text: str,
+        confidence_score: float,
+        generation: int = None
+    ):
+        """
+        Cache an answer, evicting least-recently-used entries to stay within caps
+        
+        Args:
+            query_embedding: Query vector
+            faq_ids: IDs of the FAQs the answer was generated from
+            response_text: LLM answer
+            confidence_score: Confidence of the answer
+            generation: Value of `generation` read before the answer was
+                generated; the answer is dropped if the cache was invalidated since
+        """
+        if not self.enabled:
+            return
+        
+        vector = self._normalize(query_embedding)
+        nbytes = vector.nbytes + len(response_text.encode("utf-8")) + 8 * len(faq_ids) + 64
+        
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+        
+            key = self._next_key
+            self._next_key += 1
+            self._entries[key] = {
+                "vector": vector,
+                "faq_ids": tuple(faq_ids),
+                "response": response_text,
+                "confidence": confidence_score,
+                "expires_at": time.monotonic() + self.ttl_seconds,
+                "nbytes": nbytes
+            }
+            self._bytes += nbytes
+            self._matrix = None
+            
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+    
+    def invalidate(self):
+        """Drop every entry (call when FAQ content changes)"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._matrix = None
+            self.generation += 1
+            self.invalidations += 1
+    
+    def stats(self) -> Dict:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            entries, nbytes = len(self._entries), self._bytes
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": entries,
+            "bytes": nbytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations
+        }
+
+
+# Global instance
+response_cache = ResponseCache()
@@ -0,0 +1,154 @@
+"""Background rolling summarization of long conversations"""
+
+import asyncio
+from typing import Dict, Set
+from sqlalchemy import select, update
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models.message import Message
+from app.models.session import Session as ChatSession
+from app.services.llm_service import llm_service, SUMMARY_UNAVAILABLE
+from app.utils.prompts import build_summarization_prompt
+
+
+class ConversationSummarizer:
+    """
+    Folds messages older than the recent tail into Session.summary
+    
+    Scheduled after a turn is written, off the request path. A session is
+    folded once SUMMARY_EVERY_N_TURNS turns have built up past the last
+    SUMMARY_RECENT_MESSAGES messages, so the prompt carries the summary plus
+    a short raw tail and stays flat as the conversation grows.
+    Session.summarized_until records the last message folded in. At most
+    SUMMARY_MAX_CONCURRENCY summarizations run at once, and a session is
+    never summarized twice concurrently.
+    """
+    
+    def __init__(self):
+        self._semaphore = asyncio.Semaphore(settings.SUMMARY_MAX_CONCURRENCY)
+        self._pending: Set[int] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        
+        self.scheduled = 0
+        self.completed = 0
+        self.skipped = 0
+        self.failed = 0
+    
+    @staticmethod
+    def fold_threshold() -> int:
+        """Unsummarized messages at which a session is folded"""
+        return settings.SUMMARY_RECENT_MESSAGES + 2 * settings.SUMMARY_EVERY_N_TURNS
+    
+    def maybe_schedule(self, session_id: int, unsummarized_messages: int):
+        """
+        Schedule a background fold if enough messages have built up
+        
+        Args:
+            session_id: Session ID
+            unsummarized_messages: Messages after the summary, including the
+                turn just written (a lower bound is fine)
+        """
+        if not settings.SUMMARY_ENABLED or unsummarized_messages < self.fold_threshold():
+            return
+        if session_id in self._pending:
+            return
+        if len(self._pending) >= settings.SUMMARY_MAX_PENDING:
+            # Overloaded; the next turn of this session will try again
+            self.skipped += 1
+            return
+        
+        self._pending.add(session_id)
+        self.scheduled += 1
+        task = asyncio.create_task(self._run(session_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def _run(self, session_id: int):
+        try:
+            async with self._semaphore:
+                await self.summarize_session(session_id)
+            self.completed += 1
+        except Exception as e:
+            self.failed += 1
+            print(f"❌ Error summarizing session {session_id}: {e}")
+        finally:
+            self._pending.discard(session_id)
+    
+    async def summarize_session(self, session_id: int):
+        """
+        Fold everything but the recent tail into the session summary
+        
+        Older sessions are folded SUMMARY_MAX_FOLD_MESSAGES at a time, oldest
+        first, so each summarization prompt stays bounded.
+        """
+        while True:
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(
+                    select(ChatSession.summary, ChatSession.summarized_until)
+                    .where(ChatSession.id == session_id)
+                )
+                session_row = result.one_or_none()
+                if session_row is None:
+                    return
+                
+                query = select(Message.id, Message.role, Message.content).where(Message.session_id == session_id)
+                if session_row.summarized_until is not None:
+                    query = query.where(Message.id > session_row.summarized_until)
+                # Enough for one fold plus the tail that must stay raw
+                result = await db.execute(
+                    query.order_by(Message.id)
+                    .limit(settings.SUMMARY_MAX_FOLD_MESSAGES + settings.SUMMARY_RECENT_MESSAGES)
+                )
+                rows = result.all()
+            
+            foldable = rows[:len(rows) - settings.SUMMARY_RECENT_MESSAGES]
+            if len(foldable) < 2 * settings.SUMMARY_EVERY_N_TURNS:
+                return
+            foldable = foldable[:settings.SUMMARY_MAX_FOLD_MESSAGES]
+            
+            # No connection is held while the LLM works
+            prompt = build_summarization_prompt(
+                [{"role": row.role, "content": row.content} for row in foldable],
+                previous_summary=session_row.summary
+            )
+            summary = await llm_service.summarize_conversation(prompt)
+            if summary == SUMMARY_UNAVAILABLE:
+                raise RuntimeError("LLM returned no summary")
+            
+            # Only advance from the watermark we read, in case the summary
+            # was changed meanwhile
+            watermark = ChatSession.summarized_until
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(
+                    update(ChatSession)
+                    .where(
+                        ChatSession.id == session_id,
+                        watermark.is_(None) if session_row.summarized_until is None
+                        else watermark == session_row.summarized_until
+                    )
+                    .values(summary=summary, summarized_until=foldable[-1].id)
+                    .execution_options(synchronize_session=False)
+                )
+                await db.commit()
+            if result.rowcount == 0:
+                return
+            print(f"📝 Summarized {len(foldable)} messages of session {session_id}")
+    
+    def stats(self) -> Dict:
+        """Background summarization counters"""
+        return {
+            "pending": len(self._pending),
+            "scheduled": self.scheduled,
+            "completed": self.completed,
+            "skipped": self.skipped,
+            "failed": self.failed
+        }
+    
+    async def drain(self):
+        """Wait for in-flight summarizations (used on shutdown)"""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+# Global instance
+conversation_summarizer = ConversationSummarizer()
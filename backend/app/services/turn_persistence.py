@@ -0,0 +1,87 @@
+"""Unit-of-work persistence for a single chat turn"""
+
+from datetime import datetime
+from typing import Dict, List, Optional
+from sqlalchemy import insert, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.message import Message
+from app.models.escalation import Escalation
+from app.models.session import Session as ChatSession
+
+
+class ChatTurn:
+    """
+    Stages everything a chat turn writes and flushes it in one transaction
+    
+    The user message, the assistant message, an optional escalation row and
+    the matching session status change are collected in memory while the
+    turn runs, then written with one multi-row INSERT ... RETURNING (plus
+    the escalation INSERT/UPDATE when needed) and a single commit.
+    """
+    
+    def __init__(self, session_id: int):
+        self.session_id = session_id
+        self._messages: List[Dict] = []
+        self._escalation_reason: Optional[str] = None
+    
+    def add_message(
+        self,
+        role: str,
+        content: str,
+        confidence_score: float = None,
+        route: str = None,
+        latency_ms: float = None
+    ):
+        """Stage a message, timestamped now so turn order is kept"""
+        self._messages.append({
+            "session_id": self.session_id,
+            "role": role,
+            "content": content,
+            "confidence_score": confidence_score,
+            "route": route,
+            "latency_ms": latency_ms,
+            "timestamp": datetime.utcnow()
+        })
+    
+    def escalate(self, reason: str):
+        """Stage an escalation and the session's move to 'escalated'"""
+        self._escalation_reason = reason
+    
+    async def commit(self, db: AsyncSession) -> Dict:
+        """
+        Write all staged rows in one transaction
+        
+        Args:
+            db: Async database session
+        
+        Returns:
+            Dict with the new message_ids (in staging order) and escalation_id
+        """
+        message_ids = []
+        escalation_id = None
+        
+        if self._messages:
+            result = await db.execute(
+                insert(Message).returning(Message.id, sort_by_parameter_order=True),
+                self._messages
+            )
+            message_ids = list(result.scalars())
+        
+        if self._escalation_reason is not None:
+            result = await db.execute(
+                insert(Escalation)
+                .values(session_id=self.session_id, reason=self._escalation_reason, status="pending")
+                .returning(Escalation.id)
+            )
+            escalation_id = result.scalar_one()
+            
+            await db.execute(
+                update(ChatSession)
+                .where(ChatSession.id == self.session_id)
+                .values(status="escalated")
+                .execution_options(synchronize_session=False)
+            )
+        
+        await db.commit()
+        
+        return {"message_ids": message_ids, "escalation_id": escalation_id}
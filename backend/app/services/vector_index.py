@@ -0,0 +1,269 @@
+"""In-process FAQ vector index (cosine similarity over a NumPy matrix)"""
+
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+
+
+class _Snapshot:
+    """
+    Immutable view searched by readers; writers swap in a new one
+    
+    A row whose id is -1 belongs to no FAQ (deleted, or a row of a mapped
+    embedding store that no FAQ uses) and is never returned. `partitions`
+    holds the live rows of each category; category centroids are computed
+    on first use.
+    """
+    
+    __slots__ = ("ids", "matrix", "rows", "positions", "dead", "partitions", "_centroids")
+    
+    def __init__(self, ids: np.ndarray, matrix: np.ndarray, rows: List[Optional[Dict]]):
+        self.ids = ids
+        self.matrix = matrix
+        self.rows = rows
+        self.positions = {int(faq_id): i for i, faq_id in enumerate(ids) if faq_id >= 0}
+        self.dead = ids < 0 if len(self.positions) < len(ids) else None
+        
+        partitions: Dict[str, List[int]] = {}
+        for position in self.positions.values():
+            category = rows[position]["category"]
+            if category is not None:
+                partitions.setdefault(category, []).append(position)
+        self.partitions = {category: np.array(sorted(members), dtype=np.int64) for category, members in partitions.items()}
+        self._centroids = None
+    
+    def centroids(self) -> Tuple[List[str], np.ndarray]:
+        """Categories and their L2-normalized mean embeddings"""
+        if self._centroids is None:
+            categories = sorted(self.partitions)
+            centroids = np.zeros((len(categories), self.matrix.shape[1]), dtype=np.float32)
+            for i, category in enumerate(categories):
+                centroids[i] = self.matrix[self.partitions[category]].mean(axis=0)
+            norms = np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+            self._centroids = (categories, centroids / norms)
+        return self._centroids
+
+
+class FAQVectorIndex:
+    """
+    Exact cosine search over all FAQ embeddings, held in memory
+    
+    Embeddings are L2-normalized into one float32 matrix, so a search is a
+    single matrix-vector product followed by an argpartition for the top k;
+    distances are cosine distances (1 - similarity), the same as pgvector's
+    `<=>`. Writers (FAQ create/update/delete, running in the threadpool)
+    build a patched copy under a lock and swap it in, so searches never
+    lock and never see a half-applied change.
+    
+    Each worker process holds its own copy, loaded at startup; changes made
+    through another worker are picked up on its next restart.
+    
+    A search can be limited to one category: only that partition's rows
+    are scored, so it costs O(partition) rather than O(corpus) (past
+    PARTITION_GATHER_MAX_FRACTION of the rows, copying them out costs more
+    than scoring the whole matrix, which is done instead).
+    
+    load_matrix searches a memory-mapped embedding store in place, so the
+    vectors are shared through the page cache rather than copied; the
+    first upsert afterwards copies them into memory.
+    """
+    
+    # Partitions smaller than this share of the rows are scored on their own
+    PARTITION_GATHER_MAX_FRACTION = 0.2
+    
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+        self._lock = threading.Lock()
+        self._snapshot = _Snapshot(np.empty(0, dtype=np.int64), np.empty((0, dim), dtype=np.float32), [])
+        self.loaded = False
+        
+        self.searches = 0
+    
+    def _normalize(self, vectors: np.ndarray) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+    
+    @staticmethod
+    def _row(faq_id: int, question: str, answer: str, category: Optional[str]) -> Dict:
+        return {"id": faq_id, "question": question, "answer": answer, "category": category}
+    
+    def load(self, faqs: Iterable):
+        """
+        Replace the index contents
+        
+        Args:
+            faqs: Rows with id, question, answer, category and embedding
+        """
+        faqs = [faq for faq in faqs if faq.embedding is not None]
+        ids = np.array([faq.id for faq in faqs], dtype=np.int64)
+        matrix = self._normalize([faq.embedding for faq in faqs]) if faqs else np.empty((0, self.dim), dtype=np.float32)
+        rows = [self._row(faq.id, faq.question, faq.answer, faq.category) for faq in faqs]
+        with self._lock:
+            self._snapshot = _Snapshot(ids, matrix, rows)
+            self.loaded = True
+    
+    def load_matrix(self, ids: np.ndarray, matrix: np.ndarray, rows: List[Optional[Dict]]):
+        """
+        Replace the index contents with a matrix used as-is (no copy)
+        
+        Args:
+            ids: FAQ id of each matrix row, -1 for rows no FAQ uses
+            matrix: L2-normalized float32 rows, e.g. a read-only memory map
+            rows: FAQ dictionary (id, question, answer, category) per row, None for unused rows
+        """
+        with self._lock:
+            self._snapshot = _Snapshot(np.asarray(ids, dtype=np.int64), matrix, rows)
+            self.loaded = True
+    
+    def upsert(self, faq_id: int, question: str, answer: str, category: Optional[str], embedding):
+        """Add an FAQ, or replace its text and vector if already indexed"""
+        self.upsert_many([(faq_id, question, answer, category, embedding)])
+    
+    def upsert_many(self, entries: List[Tuple]):
+        """
+        Add or replace several FAQs with a single copy of the index
+        
+        Args:
+            entries: (faq_id, question, answer, category, embedding) tuples
+        """
+        if not entries:
+            return
+        vectors = self._normalize([entry[4] for entry in entries])
+        with self._lock:
+            current = self._snapshot
+            matrix = np.array(current.matrix)  # In-memory copy, also of a mapped matrix
+            rows = list(current.rows)
+            new_ids, new_positions = [], []
+            for i, (faq_id, question, answer, category, _) in enumerate(entries):
+                row = self._row(faq_id, question, answer, category)
+                position = current.positions.get(faq_id)
+                if position is None:
+                    new_ids.append(faq_id)
+                    new_positions.append(i)
+                    rows.append(row)
+                else:
+                    matrix[position] = vectors[i]
+                    rows[position] = row
+            ids = current.ids
+            if new_ids:
+                ids = np.concatenate([ids, np.array(new_ids, dtype=np.int64)])
+                matrix = np.vstack([matrix, vectors[new_positions]])
+            self._snapshot = _Snapshot(ids, matrix, rows)
+    
+    def remove(self, faq_id: int):
+        """Drop an FAQ from the index (no-op if it isn't indexed)"""
+        with self._lock:
+            current = self._snapshot
+            position = current.positions.get(faq_id)
+            if position is None:
+                return
+            # Mark the row dead rather than copying the matrix without it
+            ids = current.ids.copy()
+            ids[position] = -1
+            rows = list(current.rows)
+            rows[position] = None
+            self._snapshot = _Snapshot(ids, current.matrix, rows)
+    
+    def search(
+        self,
+        query_embedding: np.ndarray,
+        top_k: int,
+        max_distance: float,
+        category: Optional[str] = None
+    ) -> List[Dict]:
+        """
+        Find the FAQs closest to a query embedding
+        
+        Args:
+            query_embedding: Query vector from embed_query
+            top_k: Number of FAQs to consider
+            max_distance: Only FAQs closer than this cosine distance are returned
+            category: Only search the FAQs of this category
+        
+        Returns:
+            List of FAQ dictionaries (with embedding and distance), closest first
+        """
+        snapshot = self._snapshot
+        self.searches += 1
+        query = self._normalize(query_embedding)[0]
+        if category is None:
+            rows = None
+            count = len(snapshot.ids)
+        else:
+            rows = snapshot.partitions.get(category)
+            count = 0 if rows is None else len(rows)
+        if count == 0 or top_k <= 0:
+            return []
+        
+        if rows is None:
+            similarities = snapshot.matrix @ query
+            if snapshot.dead is not None:
+                similarities[snapshot.dead] = -np.inf
+        elif count < self.PARTITION_GATHER_MAX_FRACTION * len(snapshot.ids):
+            similarities = snapshot.matrix[rows] @ query
+        else:
+            # Gathering a large partition's rows costs more than scoring them all
+            similarities = (snapshot.matrix @ query)[rows]
+        if count > top_k:
+            candidates = np.argpartition(-similarities, top_k - 1)[:top_k]
+        else:
+            candidates = np.arange(count)
+        candidates = candidates[np.argsort(-similarities[candidates], kind="stable")]
+        
+        results = []
+        for candidate in candidates:
+            position = candidate if rows is None else rows[candidate]
+            distance = 1.0 - float(similarities[candidate])
+            if distance < max_distance:
+                results.append({
+                    **snapshot.rows[position],
+                    "embedding": snapshot.matrix[position],
+                    "distance": distance
+                })
+        return results
+    
+    def infer_category(self, query_embedding: np.ndarray, margin: float, prior: Optional[str] = None) -> Optional[str]:
+        """
+        Category whose centroid is clearly closest to a query
+        
+        Args:
+            query_embedding: Query vector from embed_query
+            margin: Similarity lead over the runner-up category needed
+            prior: Category to prefer when it is the closest but not by the margin
+                (e.g. the one inferred earlier in the conversation)
+        
+        Returns:
+            The category, or None if no category stands out
+        """
+        categories, centroids = self._snapshot.centroids()
+        if not categories:
+            return None
+        similarities = centroids @ self._normalize(query_embedding)[0]
+        order = np.argsort(-similarities)
+        best = categories[order[0]]
+        if len(categories) == 1 or similarities[order[0]] - similarities[order[1]] >= margin or best == prior:
+            return best
+        return None
+    
+    def partition_size(self, category: Optional[str] = None) -> int:
+        """FAQs in a category (all FAQs for None)"""
+        if category is None:
+            return len(self)
+        rows = self._snapshot.partitions.get(category)
+        return 0 if rows is None else len(rows)
+    
+    def __len__(self) -> int:
+        return len(self._snapshot.positions)
+    
+    def stats(self) -> Dict:
+        matrix = self._snapshot.matrix
+        return {
+            "loaded": self.loaded,
+            "size": len(self),
+            "rows": len(matrix),
+            "mapped": isinstance(matrix, np.memmap),
+            "partitions": len(self._snapshot.partitions),
+            "bytes": int(matrix.nbytes),
+            "searches": self.searches
+        }
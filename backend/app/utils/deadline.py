@@ -0,0 +1,95 @@
+"""Per-request time budgets for the chat path"""
+
+import asyncio
+import math
+import time
+from typing import Awaitable, Dict, Optional, TypeVar
+from app.config import settings
+
+T = TypeVar("T")
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a stage does not finish within the request's budget"""
+    
+    def __init__(self, stage: str):
+        super().__init__(f"Deadline exceeded during {stage}")
+        self.stage = stage
+
+
+class DeadlineStats:
+    """Counts requests that ran out of budget, per stage"""
+    
+    def __init__(self):
+        self.requests = 0
+        self.hits: Dict[str, int] = {}
+    
+    def record_hit(self, stage: str):
+        self.hits[stage] = self.hits.get(stage, 0) + 1
+    
+    def stats(self) -> Dict:
+        total = sum(self.hits.values())
+        return {
+            "requests": self.requests,
+            "hits": total,
+            "hit_ratio": round(total / self.requests, 4) if self.requests else 0.0,
+            "hits_by_stage": dict(self.hits)
+        }
+
+
+# Global instance
+deadline_stats = DeadlineStats()
+
+
+class Deadline:
+    """
+    A request's time budget, shared by every stage it runs
+    
+    The last CHAT_DEADLINE_RESERVE_SECONDS are kept back from the stages so
+    there is still time to write the turn and send a (degraded) reply.
+    """
+    
+    def __init__(self, budget_seconds: float):
+        self.budget = budget_seconds
+        self.expires_at = time.monotonic() + budget_seconds
+    
+    @classmethod
+    def from_header(cls, header_value: Optional[str]) -> "Deadline":
+        """
+        Build the deadline from the request header, or CHAT_DEADLINE_SECONDS
+        
+        Args:
+            header_value: Budget in seconds sent by the client (may be None
+                or invalid, in which case the default applies; "nan", "inf"
+                and non-positive values count as invalid)
+        """
+        budget = settings.CHAT_DEADLINE_SECONDS
+        if header_value:
+            try:
+                requested = float(header_value)
+            except ValueError:
+                requested = None
+            if requested is not None and math.isfinite(requested) and requested > 0:
+                budget = requested
+        budget = min(max(budget, settings.CHAT_DEADLINE_RESERVE_SECONDS), settings.CHAT_DEADLINE_MAX_SECONDS)
+        deadline_stats.requests += 1
+        return cls(budget)
+    
+    def remaining(self) -> float:
+        """Seconds left for stages (the reserve excluded), never negative"""
+        return max(0.0, self.expires_at - time.monotonic() - settings.CHAT_DEADLINE_RESERVE_SECONDS)
+    
+    async def run(self, stage: str, awaitable: Awaitable[T]) -> T:
+        """
+        Await a stage within the remaining budget
+        
+        The stage is cancelled when the budget runs out.
+        
+        Raises:
+            DeadlineExceeded: The stage did not finish in time
+        """
+        try:
+            return await asyncio.wait_for(awaitable, timeout=self.remaining())
+        except asyncio.TimeoutError:
+            deadline_stats.record_hit(stage)
+            raise DeadlineExceeded(stage)
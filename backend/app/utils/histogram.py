@@ -0,0 +1,36 @@
+"""Fixed-bucket histograms for in-process metrics"""
+
+import bisect
+import threading
+from typing import Dict, Sequence
+
+
+class Histogram:
+    """
+    Counts observations into upper-bound buckets
+    
+    A value lands in the first bucket whose bound is >= the value; values
+    above the last bound land in "+Inf".
+    """
+    
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = sorted(bounds)
+        self._counts = [0] * (len(self.bounds) + 1)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total = 0.0
+    
+    def observe(self, value: float):
+        with self._lock:
+            self._counts[bisect.bisect_left(self.bounds, value)] += 1
+            self.count += 1
+            self.total += value
+    
+    def stats(self) -> Dict:
+        """Bucket counts (keyed "<=bound" and "+Inf"), count and mean"""
+        labels = [f"<={bound:g}" for bound in self.bounds] + ["+Inf"]
+        return {
+            "buckets": dict(zip(labels, self._counts)),
+            "count": self.count,
+            "mean": round(self.total / self.count, 3) if self.count else 0.0
+        }
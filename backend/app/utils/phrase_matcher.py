@@ -0,0 +1,157 @@
+"""Compiled multi-phrase matcher for keyword and phrase detection"""
+
+import json
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+
+class PhraseMatch(NamedTuple):
+    """A phrase found in a text, with its character span"""
+    phrase: str
+    start: int
+    end: int
+
+
+def _trie_pattern(phrases: Iterable[str]) -> str:
+    """
+    Build a regex from a character trie of the phrases
+    
+    Shared prefixes are factored out, so each text position is tried against
+    the trie (depth of the longest phrase) instead of against every phrase
+    one by one. Longer phrases are preferred over their own prefixes.
+    """
+    trie: Dict = {}
+    for phrase in phrases:
+        node = trie
+        for char in phrase:
+            node = node.setdefault(char, {})
+        node[""] = True  # end-of-phrase marker
+    
+    def emit(node: Dict) -> str:
+        terminal = "" in node
+        branches = [re.escape(char) + emit(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if terminal:
+            # Greedy optional: try the longer phrase first, fall back to this one
+            return "(?:" + body + ")?"
+        return body
+    
+    return emit(trie)
+
+
+class PhraseMatcher:
+    """
+    Finds every occurrence of a set of phrases in one pass over the text
+    
+    The phrase list is compiled once into a single trie-shaped regex, so the
+    cost of a scan grows with the text length rather than with the number of
+    phrases times the text length.
+    """
+    
+    def __init__(self, phrases: Iterable[str], word_boundaries: bool = False, case_sensitive: bool = False):
+        """
+        Args:
+            phrases: Phrases to look for
+            word_boundaries: Only match whole words/phrases (default: substring match)
+            case_sensitive: Match case exactly (default: case-insensitive)
+        """
+        self.word_boundaries = word_boundaries
+        self.case_sensitive = case_sensitive
+        self._compile(phrases)
+    
+    def _normalize(self, phrase: str) -> str:
+        return phrase if self.case_sensitive else phrase.lower()
+    
+    def _compile(self, phrases: Iterable[str]):
+        # Map normalized form back to the phrase as it was configured
+        self._phrases: Dict[str, str] = {}
+        for phrase in phrases:
+            if phrase and self._normalize(phrase) not in self._phrases:
+                self._phrases[self._normalize(phrase)] = phrase
+        
+        if not self._phrases:
+            self._regex = None
+            return
+        
+        body = _trie_pattern(self._phrases)
+        if self.word_boundaries:
+            body = r"(?<!\w)" + body + r"(?!\w)"
+        else:
+            body = "(?:" + body + ")"
+        
+        # Zero-width lookahead so overlapping phrases starting at different
+        # positions are all reported
+        flags = 0 if self.case_sensitive else re.IGNORECASE
+        self._regex = re.compile("(?=(" + body + "))", flags)
+    
+    @property
+    def phrases(self) -> List[str]:
+        """Configured phrases (deduplicated, in load order)"""
+        return list(self._phrases.values())
+    
+    def reload(self, phrases: Iterable[str]):
+        """Replace the phrase list at runtime"""
+        self._compile(phrases)
+    
+    def _to_match(self, m: re.Match) -> PhraseMatch:
+        matched = m.group(1)
+        phrase = self._phrases.get(self._normalize(matched), matched)
+        return PhraseMatch(phrase, m.start(), m.start() + len(matched))
+    
+    def find_all(self, text: str) -> List[PhraseMatch]:
+        """
+        Find every phrase occurrence in the text
+        
+        At each start position the longest matching phrase is reported.
+        
+        Returns:
+            Matches ordered by start position
+        """
+        if self._regex is None:
+            return []
+        return [self._to_match(m) for m in self._regex.finditer(text)]
+    
+    def search(self, text: str) -> Optional[PhraseMatch]:
+        """Return the leftmost match, or None"""
+        if self._regex is None:
+            return None
+        m = self._regex.search(text)
+        return self._to_match(m) if m else None
+    
+    def contains(self, text: str) -> bool:
+        """True if any phrase occurs in the text"""
+        return self._regex is not None and self._regex.search(text) is not None
+
+
+def load_phrases(path: str) -> List[str]:
+    """
+    Load a phrase list from a file
+    
+    Accepts a JSON array of strings (.json) or one phrase per line; blank
+    lines and lines starting with '#' are ignored.
+    
+    Args:
+        path: File path; empty means no extra phrases
+    
+    Returns:
+        List of phrases
+    """
+    if not path:
+        return []
+    
+    file_path = Path(path)
+    if not file_path.exists():
+        print(f"⚠️  Phrase file not found: {path}")
+        return []
+    
+    content = file_path.read_text(encoding="utf-8")
+    if file_path.suffix == ".json":
+        return [str(phrase) for phrase in json.loads(content)]
+    
+    return [
+        line.strip() for line in content.splitlines()
+        if line.strip() and not line.strip().startswith("#")
+    ]
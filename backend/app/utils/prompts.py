@@ -1,5 +1,10 @@
 """LLM prompt templates for customer support bot"""
 
+from typing import Tuple
+from app.config import settings
+from app.utils.phrase_matcher import PhraseMatcher, load_phrases
+from app.utils.tokens import count_message_tokens, tokenizer_name, truncate_to_tokens
+
 SYSTEM_PROMPT = """You are a helpful and professional customer support assistant. Your role is to:
 
 1. Answer customer questions clearly, concisely, and professionally
@@ -19,31 +24,31 @@ Guidelines:
 IMPORTANT: If a user asks to speak with a human, manager, or agent, respond briefly (1 sentence) acknowledging their request. Do NOT explain the escalation process - the system handles that automatically."""
 
 
-def build_context_prompt(conversation_history: list, relevant_faqs: list, user_message: str) -> list:
-    """
-    Build the complete prompt with context for the LLM
+def _faq_context_message(relevant_faqs: list) -> dict:
+    faq_context = "Here are some relevant FAQs that might help answer the question:\n\n"
+    for i, faq in enumerate(relevant_faqs, 1):
+        faq_context += f"{i}. Q: {faq['question']}\n   A: {faq['answer']}\n\n"
     
-    Args:
-        conversation_history: List of previous messages [{"role": "user/assistant", "content": "..."}]
-        relevant_faqs: List of relevant FAQ entries
-        user_message: Current user message
+    return {
+        "role": "system",
+        "content": faq_context.strip()
+    }
         
-    Returns:
-        List of messages in OpenAI format
-    """
+
+def _assemble_prompt(conversation_history: list, relevant_faqs: list, user_message: str, summary: str = None) -> list:
     messages = [{"role": "system", "content": SYSTEM_PROMPT}]
     
-    # Add FAQ context if available
-    if relevant_faqs:
-        faq_context = "Here are some relevant FAQs that might help answer the question:\n\n"
-        for i, faq in enumerate(relevant_faqs, 1):
-            faq_context += f"{i}. Q: {faq['question']}\n   A: {faq['answer']}\n\n"
-        
+    # Add the rolling summary of messages older than the history
+    if summary:
         messages.append({
             "role": "system",
-            "content": faq_context.strip()
+            "content": f"Summary of the earlier conversation: {summary}"
         })
     
+    # Add FAQ context if available
+    if relevant_faqs:
+        messages.append(_faq_context_message(relevant_faqs))
+    
     # Add conversation history
     messages.extend(conversation_history)
     
@@ -53,12 +58,109 @@ def build_context_prompt(conversation_history: list, relevant_faqs: list, user_m
     return messages
 
 
-def build_summarization_prompt(conversation_history: list) -> str:
+def _prompt_tokens(messages: list) -> int:
+    # +2 primes the assistant reply
+    return sum(count_message_tokens(message) for message in messages) + 2
+
+
+def build_context_prompt(
+    conversation_history: list,
+    relevant_faqs: list,
+    user_message: str,
+    summary: str = None,
+    token_budget: int = None
+) -> Tuple[list, dict]:
+    """
+    Build the complete prompt with context for the LLM, within a token budget
+    
+    When the prompt exceeds the budget, FAQ answers and history messages
+    longer than PROMPT_ITEM_MAX_TOKENS are truncated first. Then the
+    lowest-value items are dropped until it fits, in this order: history
+    older than the latest exchange (oldest first), FAQs after the best match
+    (lowest-ranked first), the latest exchange, and the best FAQ. The system
+    prompt, the conversation summary and the user message are always kept.
+    
+    Args:
+        conversation_history: List of previous messages [{"role": "user/assistant", "content": "..."}]
+            not yet folded into the summary
+        relevant_faqs: List of relevant FAQ entries, best match first
+        user_message: Current user message
+        summary: Rolling summary of the earlier conversation, if any
+        token_budget: Input token budget (default PROMPT_TOKEN_BUDGET)
+    
+    Returns:
+        Tuple of (messages in OpenAI format, stats with token counts before
+        and after trimming)
+    """
+    budget = settings.PROMPT_TOKEN_BUDGET if token_budget is None else token_budget
+    history = list(conversation_history)
+    faqs = list(relevant_faqs)
+    
+    messages = _assemble_prompt(history, faqs, user_message, summary)
+    tokens_before = _prompt_tokens(messages)
+    stats = {
+        "budget": budget,
+        "tokens_before": tokens_before,
+        "tokens_after": tokens_before,
+        "faqs_dropped": 0,
+        "history_dropped": 0,
+        "items_truncated": 0,
+        "tokenizer": tokenizer_name()
+    }
+    
+    if tokens_before <= budget:
+        return messages, stats
+    
+    # Step 1: shorten oversized FAQ answers, history messages and the summary
+    item_limit = settings.PROMPT_ITEM_MAX_TOKENS
+    if summary:
+        shortened = truncate_to_tokens(summary, item_limit)
+        if shortened != summary:
+            summary = shortened
+            stats["items_truncated"] += 1
+    for i, faq in enumerate(faqs):
+        answer = truncate_to_tokens(faq["answer"], item_limit)
+        if answer != faq["answer"]:
+            faqs[i] = {**faq, "answer": answer}
+            stats["items_truncated"] += 1
+    for i, message in enumerate(history):
+        content = truncate_to_tokens(message["content"], item_limit)
+        if content != message["content"]:
+            history[i] = {**message, "content": content}
+            stats["items_truncated"] += 1
+    
+    messages = _assemble_prompt(history, faqs, user_message, summary)
+    
+    # Step 2: drop the lowest-value items until the prompt fits
+    while _prompt_tokens(messages) > budget:
+        if len(history) > 2:
+            history.pop(0)
+            stats["history_dropped"] += 1
+        elif len(faqs) > 1:
+            faqs.pop()
+            stats["faqs_dropped"] += 1
+        elif history:
+            history.pop(0)
+            stats["history_dropped"] += 1
+        elif faqs:
+            faqs.pop()
+            stats["faqs_dropped"] += 1
+        else:
+            break
+        messages = _assemble_prompt(history, faqs, user_message, summary)
+    
+    stats["tokens_after"] = _prompt_tokens(messages)
+    return messages, stats
+
+
+def build_summarization_prompt(conversation_history: list, previous_summary: str = None) -> str:
     """
     Build prompt for summarizing a conversation
     
     Args:
         conversation_history: List of messages
+        previous_summary: Summary of the messages before these; when given,
+            the prompt asks for an updated summary covering both
         
     Returns:
         Summarization prompt
@@ -68,6 +170,17 @@ def build_summarization_prompt(conversation_history: list) -> str:
         for msg in conversation_history
     ])
     
+    if previous_summary:
+        return f"""Here is a summary of a customer support conversation so far:
+
+{previous_summary}
+
+Update the summary in 2-4 sentences to also cover the following new messages, keeping the customer's open issues and any details (order numbers, account facts) they gave:
+
+{conversation_text}
+
+Updated summary:"""
+    
     return f"""Summarize the following customer support conversation in 1-2 sentences, focusing on the main topics discussed and any issues raised:
 
 {conversation_text}
@@ -113,3 +226,11 @@ LOW_CONFIDENCE_PHRASES = [
     "beyond my capability",
     "i don't have information",
 ]
+
+# Compiled once at import; extra phrases can be supplied via files in settings
+ESCALATION_MATCHER = PhraseMatcher(
+    ESCALATION_KEYWORDS + load_phrases(settings.ESCALATION_KEYWORDS_FILE)
+)
+LOW_CONFIDENCE_MATCHER = PhraseMatcher(
+    LOW_CONFIDENCE_PHRASES + load_phrases(settings.LOW_CONFIDENCE_PHRASES_FILE)
+)
@@ -0,0 +1,96 @@
+"""Local token counting for prompt budgeting"""
+
+import math
+import re
+import threading
+from functools import lru_cache
+from app.config import settings
+
+# tiktoken encoding, loaded on first use: get_encoding may download the BPE
+# file, which importing this module (and the chat router) must not wait on
+_NOT_LOADED = object()
+_ENCODING = _NOT_LOADED
+_ENCODING_LOCK = threading.Lock()
+
+# Fallback: words and punctuation, long words split into ~4-character pieces
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+# Per-message overhead of the chat format (role and separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def load_encoding():
+    """
+    The tiktoken encoding, loading it on the first call
+    
+    Returns None when tiktoken is not installed or the encoding can't be
+    loaded (e.g. offline without a cached BPE file); token counts then use
+    the regex approximation.
+    """
+    global _ENCODING
+    if _ENCODING is _NOT_LOADED:
+        with _ENCODING_LOCK:
+            if _ENCODING is _NOT_LOADED:
+                try:
+                    import tiktoken
+                    _ENCODING = tiktoken.get_encoding(settings.TOKENIZER_ENCODING)
+                except Exception as e:
+                    print(f"⚠️  tiktoken encoding {settings.TOKENIZER_ENCODING!r} unavailable, approximating token counts: {e}")
+                    _ENCODING = None
+    return _ENCODING
+
+
+def tokenizer_name() -> str:
+    """Name of the tokenizer in use"""
+    return settings.TOKENIZER_ENCODING if load_encoding() is not None else "regex-approx"
+
+
+@lru_cache(maxsize=settings.TOKEN_COUNT_CACHE_SIZE)
+def count_tokens(text: str) -> int:
+    """
+    Count tokens in a text (cached per distinct text)
+    
+    Uses tiktoken when installed; otherwise an approximation that counts
+    punctuation as one token and words as one token per 4 characters.
+    """
+    if not text:
+        return 0
+    encoding = load_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return sum(max(1, math.ceil(len(piece) / 4)) for piece in _TOKEN_PATTERN.findall(text))
+
+
+def count_message_tokens(message: dict) -> int:
+    """Tokens one chat message adds to a prompt"""
+    return count_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Cut a text to at most `max_tokens` tokens, marking the cut with an ellipsis
+    
+    Args:
+        text: Text to shorten
+        max_tokens: Token limit (the ellipsis is included)
+    
+    Returns:
+        The text unchanged if it fits, otherwise a shortened copy
+    """
+    if count_tokens(text) <= max_tokens:
+        return text
+    if max_tokens <= 1:
+        return ""
+    
+    encoding = load_encoding()
+    if encoding is not None:
+        return encoding.decode(encoding.encode(text)[:max_tokens - 1]).rstrip() + "…"
+    
+    used = 0
+    end = 0
+    for match in _TOKEN_PATTERN.finditer(text):
+        used += max(1, math.ceil(len(match.group()) / 4))
+        if used > max_tokens - 1:
+            break
+        end = match.end()
+    return text[:end].rstrip() + "…"
@@ -0,0 +1,162 @@
+"""Local stub of an OpenAI-compatible chat completions endpoint
+
+Serves POST /chat/completions (streaming and non-streaming) with configurable
+latency, a slow tail and injected 429/503 errors, so the LLM transport can be
+exercised without a Groq key.
+
+Usage:
+    python benchmarks/stub_llm_server.py [--port 8099] [--latency 0.2] [--slow-fraction 0.05]
+
+Then point the app at it:
+    GROQ_BASE_URL=http://127.0.0.1:8099 GROQ_API_KEY=stub uvicorn app.main:app
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPLY = (
+    "Thanks for reaching out! You can reset your password from the login page by "
+    "clicking 'Forgot password' and following the link we email you."
+)
+
+
+class StubConfig:
+    def __init__(
+        self,
+        latency: float = 0.2,
+        jitter: float = 0.05,
+        slow_fraction: float = 0.0,
+        slow_latency: float = 2.0,
+        error_rate: float = 0.0,
+        seed: int = None
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.slow_fraction = slow_fraction
+        self.slow_latency = slow_latency
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+    
+    def next_call(self):
+        """Pick (delay, error status or None) for one request"""
+        with self.lock:
+            self.requests += 1
+            if self.rng.random() < self.error_rate:
+                self.errors += 1
+                return 0.01, self.rng.choice([429, 503])
+            if self.rng.random() < self.slow_fraction:
+                return self.slow_latency, None
+            return max(0.0, self.latency + self.rng.uniform(-self.jitter, self.jitter)), None
+
+
+def make_handler(config: StubConfig):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        
+        def log_message(self, format, *args):
+            pass
+        
+        def _send_json(self, status: int, body: dict, headers: dict = None):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+        
+        def do_POST(self):
+            if self.path.rstrip("/") != "/chat/completions":
+                self._send_json(404, {"error": {"message": "not found"}})
+                return
+            
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            delay, error_status = config.next_call()
+            time.sleep(delay)
+            
+            if error_status is not None:
+                self._send_json(error_status, {"error": {"message": "stub overloaded"}}, {"Retry-After": "0"})
+                return
+            
+            model = payload.get("model", "stub")
+            if payload.get("stream"):
+                self._stream(model)
+                return
+            
+            self._send_json(200, {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion",
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": REPLY},
+                    "finish_reason": "stop"
+                }]
+            })
+        
+        def _stream(self, model: str):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            for word in REPLY.split(" "):
+                chunk = {
+                    "id": "chatcmpl-stub",
+                    "object": "chat.completion.chunk",
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": word + " "}}]
+                }
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+            self.close_connection = True
+    
+    return Handler
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+    
+    def handle_error(self, request, client_address):
+        # Clients hang up on cancelled (hedged) requests; that is expected
+        pass
+
+
+def start_stub_server(config: StubConfig, port: int = 0) -> ThreadingHTTPServer:
+    """Start the stub in a daemon thread; the bound port is server.server_address[1]"""
+    server = StubServer(("127.0.0.1", port), make_handler(config))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency", type=float, default=0.2, help="base latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.05)
+    parser.add_argument("--slow-fraction", type=float, default=0.05, help="share of requests hitting the slow tail")
+    parser.add_argument("--slow-latency", type=float, default=2.0)
+    parser.add_argument("--error-rate", type=float, default=0.05, help="share of requests answered with 429/503")
+    args = parser.parse_args()
+    
+    config = StubConfig(args.latency, args.jitter, args.slow_fraction, args.slow_latency, args.error_rate)
+    server = start_stub_server(config, args.port)
+    print(f"🧪 Stub LLM server on http://127.0.0.1:{server.server_address[1]}/chat/completions")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Export the embedding model to ONNX (plus an int8 quantized copy) for EMBEDDING_BACKEND=onnx
+
+Needs torch/transformers (installed with sentence-transformers), onnx and
+onnxruntime, on the machine doing the export only; the pods running the
+ONNX backend need just onnxruntime and tokenizers.
+
+Usage:
+    python export_onnx_model.py [--output-dir models/all-MiniLM-L6-v2-onnx] [--opset 14]
+"""
+
+import sys
+import argparse
+from pathlib import Path
+
+# Add backend to path
+sys.path.append(str(Path(__file__).parent))
+
+from app.config import settings
+
+
+def export_onnx_model(output_dir: Path, opset: int):
+    """Write model.onnx, model_int8.onnx and tokenizer.json to output_dir"""
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    
+    model_id = f"sentence-transformers/{settings.EMBEDDING_MODEL_NAME}"
+    output_dir.mkdir(parents=True, exist_ok=True)
+    
+    print(f"🔄 Exporting {model_id} to {output_dir}...")
+    tokenizer = AutoTokenizer.from_pretrained(model_id)
+    model = AutoModel.from_pretrained(model_id)
+    model.eval()
+    tokenizer.save_pretrained(output_dir)  # Writes tokenizer.json (fast tokenizer)
+    
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    dynamic = {0: "batch", 1: "sequence"}
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            (sample["input_ids"], sample["attention_mask"], sample["token_type_ids"]),
+            str(output_dir / "model.onnx"),
+            input_names=["input_ids", "attention_mask", "token_type_ids"],
+            output_names=["last_hidden_state"],
+            dynamic_axes={
+                "input_ids": dynamic,
+                "attention_mask": dynamic,
+                "token_type_ids": dynamic,
+                "last_hidden_state": dynamic
+            },
+            opset_version=opset
+        )
+    print("✅ Wrote model.onnx")
+    
+    # int8 weights, activations quantized on the fly
+    quantize_dynamic(
+        str(output_dir / "model.onnx"),
+        str(output_dir / "model_int8.onnx"),
+        weight_type=QuantType.QInt8
+    )
+    print("✅ Wrote model_int8.onnx")
+    print("ℹ️  Check agreement with: python benchmarks/bench_embedding_backends.py")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the embedding model to ONNX")
+    parser.add_argument("--output-dir", type=Path, default=Path(settings.EMBEDDING_ONNX_DIR))
+    parser.add_argument("--opset", type=int, default=14)
+    args = parser.parse_args()
+    export_onnx_model(args.output_dir, args.opset)
@@ -0,0 +1,24 @@
+"""Migration script to add routing audit columns to the messages table"""
+
+from sqlalchemy import create_engine, text
+from app.config import settings
+
+def migrate_message_routing():
+    """Add route and latency_ms columns to messages"""
+    engine = create_engine(
+        settings.DATABASE_URL,
+        pool_pre_ping=True,
+        pool_recycle=3600
+    )
+    
+    with engine.connect() as conn:
+        print("🔄 Adding routing columns to messages table...")
+        
+        conn.execute(text("ALTER TABLE messages ADD COLUMN IF NOT EXISTS route VARCHAR"))
+        conn.execute(text("ALTER TABLE messages ADD COLUMN IF NOT EXISTS latency_ms DOUBLE PRECISION"))
+        conn.commit()
+        
+        print("✅ messages.route and messages.latency_ms are in place!")
+
+if __name__ == "__main__":
+    migrate_message_routing()
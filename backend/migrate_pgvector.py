@@ -2,6 +2,7 @@
 
 from sqlalchemy import create_engine, text
 from app.config import settings
+from app.services.pgvector_index import pgvector_index
 
 def migrate_to_pgvector():
     """Add embedding column to FAQs table"""
@@ -29,5 +30,8 @@ def migrate_to_pgvector():
         
         print("✅ FAQs table recreated with embedding column!")
 
+    # ANN index for ORDER BY embedding <=> :q (kind and options from settings)
+    pgvector_index.ensure(engine)
+
 if __name__ == "__main__":
     migrate_to_pgvector()
@@ -0,0 +1,23 @@
+"""Migration script to add the rolling-summary watermark to the sessions table"""
+
+from sqlalchemy import create_engine, text
+from app.config import settings
+
+def migrate_session_summary():
+    """Add summarized_until column to sessions"""
+    engine = create_engine(
+        settings.DATABASE_URL,
+        pool_pre_ping=True,
+        pool_recycle=3600
+    )
+    
+    with engine.connect() as conn:
+        print("🔄 Adding summary watermark to sessions table...")
+        
+        conn.execute(text("ALTER TABLE sessions ADD COLUMN IF NOT EXISTS summarized_until INTEGER"))
+        conn.commit()
+        
+        print("✅ sessions.summarized_until is in place!")
+
+if __name__ == "__main__":
+    migrate_session_summary()
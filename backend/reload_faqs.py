@@ -1,18 +1,51 @@
-"""Script to reload all FAQs from faqs.json"""
+"""Script to reload all FAQs from faqs.json
+
+Embeddings of FAQ texts that haven't changed come from the on-disk
+embedding store (EMBEDDING_STORE_DIR), so only new or edited FAQs are
+encoded; a full reload then drops stored vectors no FAQ uses any more.
+
+Usage:
+    python reload_faqs.py                       # replace all FAQs, then embed them
+    python reload_faqs.py --embeddings-only     # resume embedding FAQs that have none
+    python reload_faqs.py --embeddings-only --reembed-all [--start-after-id N]
+                                                # re-encode every FAQ (e.g. new model)
+    python reload_faqs.py --rebuild-vector-index   # also rebuild the pgvector ANN index
+                                                # (retrains IVFFlat lists on the new rows)
+"""
 
 import sys
+import argparse
 from pathlib import Path
 
 # Add backend to path
 sys.path.append(str(Path(__file__).parent))
 
-from app.database import SessionLocal
+from app.database import SessionLocal, engine
 from app.models.faq import FAQ
 from app.services.faq_service import faq_service
+from app.services.embedding_store import embedding_store
+from app.services.pgvector_index import pgvector_index
 import json
 
 
-def reload_faqs():
+def generate_embeddings(args):
+    """Embed FAQs in chunks (resumable: finished chunks are committed)"""
+    db = SessionLocal()
+    try:
+        faq_service.generate_and_store_embeddings(
+            db,
+            chunk_size=args.chunk_size,
+            start_after_id=args.start_after_id,
+            reembed_all=args.reembed_all
+        )
+    finally:
+        db.close()
+    
+    # Create the ANN index if missing (IVFFlat waits for embedded rows)
+    pgvector_index.ensure(engine, rebuild=args.rebuild_vector_index)
+
+
+def reload_faqs(args):
     """Clear existing FAQs and reload from JSON"""
     print("🔄 Reloading FAQs...")
     
@@ -40,14 +73,31 @@ def reload_faqs():
         db.commit()
         print(f"✅ Loaded {len(faqs_data)} new FAQs")
         
-        # Generate embeddings
-        print("🔄 Generating embeddings...")
-        faq_service.generate_and_store_embeddings(db)
-        
     finally:
         db.close()
 
+    # Generate embeddings
+    generate_embeddings(args)
+
+    # Forget vectors of FAQ texts that are gone
+    keys = faq_service.store_keys([faq_service.faq_text(faq['question'], faq['answer']) for faq in faqs_data])
+    dropped = embedding_store.compact(keys)
+    if dropped:
+        print(f"🗑️  Dropped {dropped} unused embeddings from the embedding store")
+
 
 if __name__ == "__main__":
-    reload_faqs()
-    print("✅ FAQ reload complete!")
+    parser = argparse.ArgumentParser(description="Reload FAQs from faqs.json and generate their embeddings")
+    parser.add_argument("--embeddings-only", action="store_true", help="Keep the FAQs, only generate missing embeddings")
+    parser.add_argument("--reembed-all", action="store_true", help="Re-encode FAQs that already have an embedding")
+    parser.add_argument("--start-after-id", type=int, default=0, help="Resume after this FAQ id (last id reported)")
+    parser.add_argument("--chunk-size", type=int, default=None, help="FAQs per chunk (default from settings)")
+    parser.add_argument("--rebuild-vector-index", action="store_true", help="Rebuild the pgvector index after embedding")
+    args = parser.parse_args()
+
+    if args.embeddings_only:
+        generate_embeddings(args)
+        print("✅ Embedding generation complete!")
+    else:
+        reload_faqs(args)
+        print("✅ FAQ reload complete!")
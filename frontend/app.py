@@ -9,6 +9,10 @@ load_dotenv()
 
 # Backend API configuration
 BACKEND_URL = os.getenv("BACKEND_URL", "http://localhost:8000")
+REQUEST_TIMEOUT = 30  # seconds
+
+# Budget the backend should answer within, leaving room for the round trip
+BACKEND_DEADLINE = REQUEST_TIMEOUT - 2
 
 # Session state
 current_session_id = None
@@ -38,7 +42,8 @@ def chat(message: str, history):
                 "session_id": current_session_id,
                 "message": message
             },
-            timeout=30
+            headers={"X-Request-Timeout": str(BACKEND_DEADLINE)},
+            timeout=REQUEST_TIMEOUT
         )
         
         print(f"✓ Response status: {response.status_code}")